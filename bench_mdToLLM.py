@@ -0,0 +1,729 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks reprodutíveis do pipeline do mdToLLM_2.
+
+Gera um corpus sintético (PDF, DOCX, XLSX, HTML e imagens em tamanhos
+diferentes), sobe um servidor HTTP local que faz o papel dos sites
+capturados e um servidor que imita a API da OpenAI (Responses, Chat
+Completions, Files e Batches), e mede vazão, percentis de latência e pico
+de RSS de cada cenário — cada um em um subprocesso, para o pico de RSS
+ser só dele. O resultado é comparado com um baseline salvo em JSON.
+
+Uso:
+    python bench_mdToLLM.py                       # roda tudo e compara com bench_baseline.json
+                                                  # (na 1ª execução, sem baseline, grava um)
+    python bench_mdToLLM.py -c arquivos -c legendagem
+    python bench_mdToLLM.py --salvar-baseline     # grava o resultado como novo baseline
+    python bench_mdToLLM.py --tolerancia 0.25     # regressão aceita antes de falhar (25%)
+
+Sai com código 1 se alguma métrica piorar além da tolerância.
+"""
+import os
+import sys
+import io
+import json
+import time
+import zlib
+import random
+import struct
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import zipfile
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+base_dir = Path(__file__).resolve().parent
+
+BASELINE_PATH = base_dir / "bench_baseline.json"
+OUTPUT_PATH = base_dir / "bench_output.txt"
+SEED = 1234                      # corpus idêntico a cada execução
+DEFAULT_TOLERANCE = 0.15         # piora relativa aceita (15%)
+SITE_LATENCY_S = 0.005           # atraso artificial por resposta do site local
+API_LATENCY_S = 0.050            # atraso artificial por resposta da API falsa
+
+# tamanhos do corpus: (rótulo, escala). A escala vira páginas/parágrafos/linhas/pixels.
+TAMANHOS = [("p", 1), ("m", 8), ("g", 40)]
+REPETICOES = 3                   # cada arquivo do corpus é convertido N vezes
+
+CENARIOS = ("arquivos", "downloads", "rewrite", "legendagem", "triagem", "pipeline")
+
+LOREM = (
+    "Lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua Ut enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat"
+).split()
+
+
+# ====================== Corpus sintético ========================
+
+def _frase(rng: random.Random, n: int = 12) -> str:
+    return " ".join(rng.choice(LOREM) for _ in range(n)).capitalize() + "."
+
+
+def gerar_png(largura: int, altura: int, rng: random.Random) -> bytes:
+    """PNG RGB com faixas + ruído (comprime mais ou menos como uma foto simples)."""
+    linhas = []
+    for y in range(altura):
+        base = (y * 255 // max(altura - 1, 1))
+        linha = bytearray([0])  # filtro "None"
+        for x in range(largura):
+            r = (base + rng.randrange(32)) & 0xFF
+            linha += bytes((r, (x * 255 // max(largura - 1, 1)), (r ^ 0x55)))
+        linhas.append(bytes(linha))
+
+    def chunk(tipo: bytes, dados: bytes) -> bytes:
+        return (struct.pack(">I", len(dados)) + tipo + dados
+                + struct.pack(">I", zlib.crc32(tipo + dados) & 0xFFFFFFFF))
+
+    ihdr = struct.pack(">IIBBBBB", largura, altura, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr)
+            + chunk(b"IDAT", zlib.compress(b"".join(linhas), 6)) + chunk(b"IEND", b""))
+
+
+def gerar_pdf(paginas: int, rng: random.Random) -> bytes:
+    """PDF 1.4 mínimo (Helvetica, texto em cada página), com xref correto."""
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for _ in range(paginas):
+        linhas = [f"({_frase(rng, 10)}) Tj 0 -16 Td" for _ in range(40)]
+        stream = ("BT /F1 11 Tf 50 780 Td " + " ".join(linhas) + " ET").encode("latin-1")
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        conteudo = len(objs)
+        objs.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                    b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % conteudo)
+        kids.append(len(objs))
+    objs[1] = (b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids)
+               + b"] /Count %d >>" % len(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for n, obj in enumerate(objs, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % n + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref))
+    return out.getvalue()
+
+
+def _zip(arquivos: dict) -> bytes:
+    """ZIP com data fixa nas entradas (bytes idênticos a cada execução)."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for nome, texto in arquivos.items():
+            info = zipfile.ZipInfo(nome, date_time=(2020, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            z.writestr(info, texto)
+    return buf.getvalue()
+
+
+def gerar_docx(paragrafos: int, rng: random.Random) -> bytes:
+    """DOCX mínimo (WordprocessingML) com títulos e parágrafos."""
+    corpo = []
+    for i in range(paragrafos):
+        if i % 10 == 0:
+            corpo.append('<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr>'
+                         f'<w:r><w:t>Seção {i // 10 + 1}</w:t></w:r></w:p>')
+        corpo.append(f"<w:p><w:r><w:t>{_frase(rng, 30)}</w:t></w:r></w:p>")
+    documento = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                 '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                 f'<w:body>{"".join(corpo)}</w:body></w:document>')
+    return _zip({
+        "[Content_Types].xml":
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>',
+        "_rels/.rels":
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/officeDocument" Target="word/document.xml"/></Relationships>',
+        "word/_rels/document.xml.rels":
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"/>',
+        "word/document.xml":
+            documento,
+    })
+
+
+def gerar_xlsx(linhas: int, rng: random.Random) -> bytes:
+    """XLSX mínimo (uma planilha, strings inline + números)."""
+    def col(c):
+        return "ABCDEF"[c]
+
+    rows = []
+    for r in range(1, linhas + 1):
+        celulas = []
+        for c in range(6):
+            ref = f"{col(c)}{r}"
+            if r == 1:
+                celulas.append(f'<c r="{ref}" t="inlineStr"><is><t>Coluna {c + 1}</t></is></c>')
+            elif c % 2:
+                celulas.append(f'<c r="{ref}"><v>{rng.randrange(100000)}</v></c>')
+            else:
+                celulas.append(f'<c r="{ref}" t="inlineStr"><is><t>{_frase(rng, 3)}</t></is></c>')
+        rows.append(f'<row r="{r}">{"".join(celulas)}</row>')
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel_ns = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+    return _zip({
+        "[Content_Types].xml":
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/></Types>',
+        "_rels/.rels":
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/officeDocument" Target="xl/workbook.xml"/></Relationships>',
+        "xl/workbook.xml":
+            f'<?xml version="1.0" encoding="UTF-8"?><workbook {ns} {rel_ns}>'
+            '<sheets><sheet name="Dados" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        "xl/_rels/workbook.xml.rels":
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/worksheet" Target="worksheets/sheet1.xml"/></Relationships>',
+        "xl/worksheets/sheet1.xml":
+            f'<?xml version="1.0" encoding="UTF-8"?><worksheet {ns}>'
+            f'<sheetData>{"".join(rows)}</sheetData></worksheet>',
+    })
+
+
+def gerar_html(secoes: int, rng: random.Random, imagens: list[str] = (), extras: list[str] = ()) -> str:
+    """Página com títulos, parágrafos, tabela, imagens e (opcionalmente) CSS/JS externos."""
+    partes = ["<!doctype html><html><head><meta charset='utf-8'><title>Página sintética</title>"]
+    for ref in extras:
+        if ref.endswith(".css"):
+            partes.append(f"<link rel='stylesheet' href='{ref}'>")
+        else:
+            partes.append(f"<script src='{ref}'></script>")
+    partes.append("</head><body>")
+    for i in range(secoes):
+        partes.append(f"<h2>Seção {i + 1}</h2>")
+        partes += [f"<p>{_frase(rng, 40)}</p>" for _ in range(4)]
+        if imagens:
+            src = imagens[i % len(imagens)]
+            partes.append(f"<img src='{src}' alt='figura {i + 1}' "
+                          f"srcset='{src} 1x, {src}?2x 2x'>")
+        partes.append("<table><tr><th>A</th><th>B</th></tr>"
+                      + "".join(f"<tr><td>{_frase(rng, 2)}</td><td>{rng.randrange(999)}</td></tr>"
+                                for _ in range(5)) + "</table>")
+    partes.append("</body></html>")
+    return "".join(partes)
+
+
+def gerar_corpus(dest: Path) -> dict:
+    """
+    Gera o corpus em `dest` (sempre o mesmo, pela semente fixa).
+    Retorna {"arquivos": [...], "imagens": [...], "site": Path}.
+    """
+    rng = random.Random(SEED)
+    dest.mkdir(parents=True, exist_ok=True)
+    arquivos, imagens = [], []
+    for rotulo, escala in TAMANHOS:
+        for nome, dados in (
+            (f"doc_{rotulo}.pdf", gerar_pdf(escala, rng)),
+            (f"doc_{rotulo}.docx", gerar_docx(20 * escala, rng)),
+            (f"planilha_{rotulo}.xlsx", gerar_xlsx(50 * escala, rng)),
+            (f"pagina_{rotulo}.html", gerar_html(5 * escala, rng).encode("utf-8")),
+        ):
+            (dest / nome).write_bytes(dados)
+            arquivos.append(dest / nome)
+        lado = 64 * escala
+        img = dest / f"imagem_{rotulo}.png"
+        img.write_bytes(gerar_png(min(lado, 1600), min(lado, 1200), rng))
+        arquivos.append(img)
+        imagens.append(img)
+
+    # "site" servido pelo servidor local: páginas com imagens, CSS e JS
+    site = dest / "site"
+    (site / "img").mkdir(parents=True, exist_ok=True)
+    (site / "static").mkdir(exist_ok=True)
+    srcs = []
+    for n in range(24):
+        lado = rng.choice((32, 128, 480, 960))
+        (site / "img" / f"foto{n}.png").write_bytes(gerar_png(lado, lado * 3 // 4, rng))
+        srcs.append(f"/img/foto{n}.png")
+    extras = []
+    for n in range(6):
+        (site / "static" / f"estilo{n}.css").write_text(
+            "".join(f".c{i}{{margin:{i}px;background:url(/img/foto{i % 24}.png)}}\n" for i in range(2000)))
+        (site / "static" / f"app{n}.js").write_text("var x=" + json.dumps(_frase(rng, 4000)) + ";")
+        extras += [f"/static/estilo{n}.css", f"/static/app{n}.js"]
+    for n in range(10):
+        (site / f"pagina{n}.html").write_text(
+            gerar_html(12, rng, imagens=srcs[n % 4 * 6:(n % 4 + 1) * 6], extras=extras), encoding="utf-8")
+    return {"arquivos": arquivos, "imagens": imagens, "site": site}
+
+
+# ================ Servidores locais (site + API) ================
+
+class _SiteHandler(BaseHTTPRequestHandler):
+    """Serve `raiz` com Content-Type/Content-Length corretos e um pequeno atraso fixo."""
+    raiz: Path = Path(".")
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _arquivo(self):
+        caminho = (self.raiz / self.path.split("?")[0].lstrip("/")).resolve()
+        if self.raiz.resolve() not in caminho.parents or not caminho.is_file():
+            return None
+        return caminho
+
+    def _cabecalhos(self, caminho: Path):
+        import mimetypes
+        ctype = mimetypes.guess_type(caminho.name)[0] or "application/octet-stream"
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(caminho.stat().st_size))
+        self.end_headers()
+
+    def do_HEAD(self):
+        caminho = self._arquivo()
+        if not caminho:
+            self.send_error(404)
+            return
+        self._cabecalhos(caminho)
+
+    def do_GET(self):
+        time.sleep(SITE_LATENCY_S)
+        caminho = self._arquivo()
+        if not caminho:
+            self.send_error(404)
+            return
+        self._cabecalhos(caminho)
+        self.wfile.write(caminho.read_bytes())
+
+
+class _APIHandler(BaseHTTPRequestHandler):
+    """
+    Imita o suficiente da API da OpenAI para o app: Responses, Chat Completions,
+    Files (upload/conteúdo) e Batches (concluídos na hora). Responde sempre com
+    uma descrição fixa, depois de API_LATENCY_S.
+    """
+    protocol_version = "HTTP/1.1"
+    arquivos: dict = {}
+    lotes: dict = {}
+    _ids = iter(range(1, 10 ** 9))
+    _lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    @classmethod
+    def _novo_id(cls, prefixo: str) -> str:
+        with cls._lock:
+            return f"{prefixo}_{next(cls._ids)}"
+
+    def _json(self, dados: dict, status: int = 200):
+        corpo = json.dumps(dados).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _corpo(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    @staticmethod
+    def _response(model: str) -> dict:
+        return {
+            "id": _APIHandler._novo_id("resp"), "object": "response", "created_at": int(time.time()),
+            "model": model, "status": "completed", "parallel_tool_calls": True,
+            "tool_choice": "auto", "tools": [],
+            "output": [{
+                "type": "message", "id": _APIHandler._novo_id("msg"), "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": "Imagem sintética de teste.",
+                             "annotations": []}],
+            }],
+        }
+
+    def do_POST(self):
+        time.sleep(API_LATENCY_S)
+        caminho = self.path.split("?")[0].rstrip("/")
+        if caminho.endswith("/responses"):
+            body = json.loads(self._corpo() or b"{}")
+            self._json(self._response(body.get("model", "mock")))
+        elif caminho.endswith("/chat/completions"):
+            body = json.loads(self._corpo() or b"{}")
+            self._json({
+                "id": self._novo_id("chatcmpl"), "object": "chat.completion",
+                "created": int(time.time()), "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "Imagem sintética de teste."}}],
+            })
+        elif caminho.endswith("/files"):
+            msg = BytesParser(policy=email_policy).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self._corpo())
+            conteudo = b""
+            for parte in msg.iter_parts():
+                if parte.get_param("name", header="content-disposition") == "file":
+                    conteudo = parte.get_payload(decode=True) or b""
+            fid = self._novo_id("file")
+            self.arquivos[fid] = conteudo
+            self._json({"id": fid, "object": "file", "bytes": len(conteudo), "created_at": int(time.time()),
+                        "filename": "lote.jsonl", "purpose": "batch", "status": "processed"})
+        elif caminho.endswith("/batches"):
+            body = json.loads(self._corpo() or b"{}")
+            saida = []
+            for linha in self.arquivos.get(body.get("input_file_id"), b"").decode("utf-8").splitlines():
+                if linha.strip():
+                    pedido = json.loads(linha)
+                    saida.append(json.dumps({
+                        "id": self._novo_id("batch_req"), "custom_id": pedido["custom_id"], "error": None,
+                        "response": {"status_code": 200, "request_id": "mock",
+                                     "body": self._response(pedido["body"].get("model", "mock"))},
+                    }))
+            out_id = self._novo_id("file")
+            self.arquivos[out_id] = ("\n".join(saida) + "\n").encode("utf-8")
+            bid = self._novo_id("batch")
+            self.lotes[bid] = {
+                "id": bid, "object": "batch", "endpoint": body.get("endpoint"),
+                "input_file_id": body.get("input_file_id"), "completion_window": "24h",
+                "status": "completed", "output_file_id": out_id, "error_file_id": None,
+                "created_at": int(time.time()),
+                "request_counts": {"total": len(saida), "completed": len(saida), "failed": 0},
+            }
+            self._json(self.lotes[bid])
+        else:
+            self._json({"error": {"message": f"rota não suportada: {self.path}"}}, status=404)
+
+    def do_GET(self):
+        caminho = self.path.split("?")[0].rstrip("/")
+        partes = caminho.split("/")
+        if "batches" in partes and partes[-1] in self.lotes:
+            self._json(self.lotes[partes[-1]])
+        elif caminho.endswith("/content") and partes[-2] in self.arquivos:
+            dados = self.arquivos[partes[-2]]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+        else:
+            self._json({"error": {"message": f"rota não suportada: {self.path}"}}, status=404)
+
+
+def iniciar_servidor(handler_cls, **atributos) -> ThreadingHTTPServer:
+    """Sobe o handler em 127.0.0.1 (porta livre) numa thread daemon; a URL fica em .url."""
+    handler = type(handler_cls.__name__, (handler_cls,), atributos)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    srv.daemon_threads = True
+    srv.url = f"http://127.0.0.1:{srv.server_address[1]}"
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+# ========================= Medições =============================
+
+def _pico_rss_mb() -> float:
+    """Pico de memória residente deste processo, em MB."""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+    except ImportError:  # Windows
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+        except ImportError:
+            return 0.0
+
+
+def _estatisticas(latencias: list[float], unidades: float, segundos: float) -> dict:
+    from mdToLLM_2 import _percentil
+    return {
+        "n": len(latencias),
+        "p50_ms": round(1000 * _percentil(latencias, 50), 2),
+        "p95_ms": round(1000 * _percentil(latencias, 95), 2),
+        "p99_ms": round(1000 * _percentil(latencias, 99), 2),
+        "vazao_s": round(unidades / segundos, 3) if segundos else 0.0,
+    }
+
+
+def _medir(fn, itens, repeticoes: int = 1) -> dict:
+    latencias = []
+    t0 = time.perf_counter()
+    for _ in range(repeticoes):
+        for item in itens:
+            t = time.perf_counter()
+            fn(item)
+            latencias.append(time.perf_counter() - t)
+    return _estatisticas(latencias, len(latencias), time.perf_counter() - t0)
+
+
+def _conversor(saida: Path, **opcoes):
+    from mdToLLM_2 import ConfigConversao, ConversorMarkdown
+    # sem diário: as repetições precisam converter de novo a cada iteração
+    config = ConfigConversao(output_dir=saida, metricas="nenhum", retomar=False, **opcoes)
+    return ConversorMarkdown(config, log=lambda msg: None)
+
+
+# ========================= Cenários =============================
+
+def cenario_arquivos(corpus: dict, trabalho: Path) -> dict:
+    """`processar_arquivos` arquivo a arquivo, agrupado por formato."""
+    conv = _conversor(trabalho / "saida")
+    (trabalho / "saida").mkdir(exist_ok=True)
+    resultado = {}
+    por_ext = {}
+    for arq in corpus["arquivos"]:
+        por_ext.setdefault(arq.suffix.lower(), []).append(arq)
+    for ext, arqs in sorted(por_ext.items()):
+        resultado[f"arquivos{ext}"] = _medir(lambda a: conv.processar_arquivos([a]), arqs, REPETICOES)
+    return resultado
+
+
+def cenario_downloads(corpus: dict, trabalho: Path) -> dict:
+    """`_baixar_recursos` contra o site local: plano (só imagens) e arquivamento (tudo)."""
+    import requests
+    site = iniciar_servidor(_SiteHandler, raiz=corpus["site"])
+    try:
+        conv = _conversor(trabalho)
+        paginas = sorted(corpus["site"].glob("pagina*.html"))
+        resultado = {}
+        for modo in ("plano", "arquivamento"):
+            def baixar(pagina: Path):
+                url = f"{site.url}/{pagina.name}"
+                html = requests.get(url, timeout=30).text
+                dest = Path(tempfile.mkdtemp(dir=trabalho))
+                urls = None
+                if modo == "plano":
+                    urls = {u for u in conv._coletar_urls_recursos(url, html) if "/img/" in u}
+                conv._baixar_recursos(url, html, dest, "bench", urls=urls)
+                shutil.rmtree(dest, ignore_errors=True)
+            resultado[f"downloads.{modo}"] = _medir(baixar, paginas)
+        return resultado
+    finally:
+        site.shutdown()
+
+
+def cenario_rewrite(corpus: dict, trabalho: Path) -> dict:
+    """`_rewrite_html_with_local_assets` + `_absolutizar_html` (CPU puro) em páginas do site."""
+    conv = _conversor(trabalho)
+    base = "http://site.local/"
+    paginas = [p.read_text(encoding="utf-8") for p in sorted(corpus["site"].glob("pagina*.html"))]
+    mapa = {}
+    for html in paginas:
+        for url in conv._coletar_urls_recursos(base, html):
+            mapa[url] = str(trabalho / "assets" / Path(url).name)
+    return {
+        "rewrite.local": _medir(
+            lambda h: conv._rewrite_html_with_local_assets(h, base, mapa, trabalho / "assets"),
+            paginas, REPETICOES),
+        "rewrite.absoluto": _medir(lambda h: conv._absolutizar_html(h, base), paginas, REPETICOES),
+    }
+
+
+def cenario_legendagem(corpus: dict, trabalho: Path) -> dict:
+    """`_gerar_alt_para_imagem` (Responses) e o lote (Batch API) contra a API falsa."""
+    api = iniciar_servidor(_APIHandler)
+    os.environ["OPENAI_BASE_URL"] = api.url + "/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    try:
+        conv = _conversor(trabalho, use_openai=True, desc_mode="direct")
+        resultado = {"legendagem.direta": _medir(conv._gerar_alt_para_imagem, corpus["imagens"], REPETICOES)}
+
+        from mdToLLM_2 import LoteLegendas
+
+        def lote(_):
+            lt = LoteLegendas(trabalho, "mock", "descreva", log=lambda m: None)
+            for img in corpus["imagens"]:
+                lt.adicionar(img)
+            lt.submeter()
+            LoteLegendas.verificar_pendentes(trabalho, log=lambda m: None)
+
+        resultado["legendagem.lote"] = _medir(lote, [None], REPETICOES)
+        return resultado
+    finally:
+        api.shutdown()
+
+
+def cenario_triagem(corpus: dict, trabalho: Path) -> dict:
+    """`triar_imagens` nas imagens do site: o lote inteiro de uma vez × uma imagem por chamada."""
+    from mdToLLM_2 import triar_imagens
+    imagens = sorted((corpus["site"] / "img").glob("*.png"))
+    if triar_imagens(imagens[:1]) is None:
+        print("⚠ triagem: NumPy/Pillow ausentes; cenário sem métricas.", file=sys.stderr)
+        return {}
+    latencias = []
+    t0 = time.perf_counter()
+    for _ in range(REPETICOES):
+        t = time.perf_counter()
+        triar_imagens(imagens)
+        latencias.append(time.perf_counter() - t)
+    # vazão em imagens/s nos dois casos, para comparar o lote com a chamada avulsa
+    resultado = {"triagem.lote": _estatisticas(latencias, len(imagens) * REPETICOES, time.perf_counter() - t0)}
+    resultado["triagem.imagem"] = _medir(lambda img: triar_imagens([img]), imagens, REPETICOES)
+    return resultado
+
+
+def cenario_pipeline(corpus: dict, trabalho: Path) -> dict:
+    """
+    `capturar_converter_url` de ponta a ponta (captura estática, downloads, conversão e
+    legendagem em paralelo no `_pipeline_captura`) contra o site local e a API falsa.
+    """
+    site = iniciar_servidor(_SiteHandler, raiz=corpus["site"])
+    api = iniciar_servidor(_APIHandler)
+    os.environ["OPENAI_BASE_URL"] = api.url + "/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    try:
+        paginas = [f"{site.url}/{p.name}" for p in sorted(corpus["site"].glob("pagina*.html"))]
+        resultado = {}
+        for modo, opcoes in (("sem_legendas", {}),
+                             ("com_legendas", {"use_openai": True, "desc_mode": "direct"})):
+            saida = trabalho / modo
+            saida.mkdir()
+            conv = _conversor(saida, modo_captura="estatico", indexar=False, **opcoes)
+            resultado[f"pipeline.{modo}"] = _medir(conv.capturar_converter_url, paginas)
+        return resultado
+    finally:
+        site.shutdown()
+        api.shutdown()
+
+
+def executar_cenario(nome: str, corpus_dir: Path) -> dict:
+    """Roda um cenário neste processo e devolve as métricas (+ pico de RSS)."""
+    corpus = {
+        "arquivos": sorted(p for p in corpus_dir.iterdir() if p.is_file()),
+        "imagens": sorted(corpus_dir.glob("imagem_*.png")),
+        "site": corpus_dir / "site",
+    }
+    trabalho = Path(tempfile.mkdtemp(prefix=f"bench_{nome}_"))
+    try:
+        metricas = globals()[f"cenario_{nome}"](corpus, trabalho)
+    finally:
+        shutil.rmtree(trabalho, ignore_errors=True)
+    return {"metricas": metricas, "rss_pico_mb": round(_pico_rss_mb(), 1)}
+
+
+# ===================== Baseline / relatório =====================
+
+def comparar(atual: dict, baseline: dict, tolerancia: float) -> list[str]:
+    """Lista de regressões (latência/RSS maiores ou vazão menor além da tolerância)."""
+    regressoes = []
+    for cenario, dados in atual.items():
+        base = baseline.get(cenario)
+        if not base:
+            continue
+        if base.get("rss_pico_mb") and dados["rss_pico_mb"] > base["rss_pico_mb"] * (1 + tolerancia):
+            regressoes.append(f"{cenario}: pico de RSS {base['rss_pico_mb']} → {dados['rss_pico_mb']} MB")
+        for nome, m in dados["metricas"].items():
+            b = base["metricas"].get(nome)
+            if not b:
+                continue
+            for chave in ("p50_ms", "p95_ms"):
+                if b[chave] and m[chave] > b[chave] * (1 + tolerancia):
+                    regressoes.append(f"{nome}: {chave} {b[chave]} → {m[chave]}")
+            if b["vazao_s"] and m["vazao_s"] < b["vazao_s"] * (1 - tolerancia):
+                regressoes.append(f"{nome}: vazão {b['vazao_s']} → {m['vazao_s']} /s")
+    return regressoes
+
+
+def _delta(atual: float, antes: float | None) -> str:
+    if not antes:
+        return ""
+    return f"{100 * (atual - antes) / antes:+.0f}%"
+
+
+def formatar(resultado: dict, baseline: dict) -> str:
+    linhas = [f"{'métrica':<28}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'vazão/s':>10}"
+              f"{'Δp50':>8}{'Δvazão':>8}"]
+    for cenario, dados in resultado.items():
+        base = (baseline.get(cenario) or {}).get("metricas", {})
+        for nome, m in dados["metricas"].items():
+            b = base.get(nome) or {}
+            linhas.append(f"{nome:<28}{m['n']:>5}{m['p50_ms']:>10.1f}{m['p95_ms']:>10.1f}"
+                          f"{m['p99_ms']:>10.1f}{m['vazao_s']:>10.2f}"
+                          f"{_delta(m['p50_ms'], b.get('p50_ms')):>8}"
+                          f"{_delta(m['vazao_s'], b.get('vazao_s')):>8}")
+        b_rss = (baseline.get(cenario) or {}).get("rss_pico_mb")
+        linhas.append(f"  {cenario}: pico de RSS {dados['rss_pico_mb']} MB {_delta(dados['rss_pico_mb'], b_rss)}")
+    return "\n".join(linhas)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks do pipeline mdToLLM_2")
+    ap.add_argument("-c", "--cenario", action="append", choices=CENARIOS,
+                    help="cenário a rodar (repetível; padrão: todos)")
+    ap.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    ap.add_argument("--salvar-baseline", action="store_true", help="grava o resultado como baseline")
+    ap.add_argument("--tolerancia", type=float, default=DEFAULT_TOLERANCE)
+    ap.add_argument("--corpus", type=Path, help="pasta do corpus (padrão: temporária)")
+    ap.add_argument("--_executar", help=argparse.SUPPRESS)  # uso interno: roda 1 cenário e imprime JSON
+    args = ap.parse_args()
+
+    if args._executar:
+        print(json.dumps(executar_cenario(args._executar, args.corpus)))
+        return 0
+
+    corpus_dir = args.corpus or Path(tempfile.mkdtemp(prefix="bench_corpus_"))
+    try:
+        gerar_corpus(corpus_dir)
+        resultado = {}
+        for nome in args.cenario or CENARIOS:
+            # um subprocesso por cenário: o pico de RSS medido é só daquele cenário
+            proc = subprocess.run(
+                [sys.executable, __file__, "--_executar", nome, "--corpus", str(corpus_dir)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"✗ cenário {nome} falhou:\n{proc.stderr}", file=sys.stderr)
+                return 2
+            resultado[nome] = json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        if not args.corpus:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    ambiente = f"{platform.platform()} • Python {platform.python_version()}"
+    relatorio = f"{ambiente}\n{formatar(resultado, baseline)}"
+    regressoes = comparar(resultado, baseline, args.tolerancia)
+    if not baseline:
+        # 1ª execução nesta máquina: não há com o que comparar, então o resultado vira o baseline
+        args.salvar_baseline = True
+        relatorio += f"\n\nSem baseline em {args.baseline.name}: nada comparado; este resultado será o baseline."
+    else:
+        novos = [nome for nome in resultado if nome not in baseline]
+        if novos:
+            relatorio += ("\n\nSem baseline para: " + ", ".join(novos)
+                          + " (não comparados; grave com --salvar-baseline)")
+    if regressoes:
+        relatorio += "\n\nRegressões (tolerância {:.0%}):\n".format(args.tolerancia)
+        relatorio += "\n".join(f"  ✗ {r}" for r in regressoes)
+    print(relatorio)
+    OUTPUT_PATH.write_text(relatorio + "\n", encoding="utf-8")
+
+    if args.salvar_baseline:
+        baseline.update(resultado)
+        args.baseline.write_text(json.dumps(baseline, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Baseline salvo em {args.baseline}")
+        return 0
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
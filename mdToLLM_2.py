@@ -1,627 +1,4927 @@
-# -*- coding: utf-8 -*-
-import os
-import re
-import time
-import base64
-import shutil
-import mimetypes
-import tempfile
-import requests
-from datetime import datetime
-from pathlib import Path
-from urllib.parse import urljoin, urlparse
-
-# --- GUI ---
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-from tkinterdnd2 import DND_FILES, TkinterDnD
-
-# --- Conversão / LLM ---
-from markitdown import MarkItDown
-from openai import OpenAI
-
-# --- Selenium (Firefox/Gecko) ---
-from selenium import webdriver
-from selenium.webdriver.firefox.service import Service as FirefoxService
-from selenium.webdriver.firefox.options import Options as FirefoxOptions
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.common.exceptions import TimeoutException, WebDriverException
-
-# ================== Configurações & Constantes ==================
-
-base_dir = Path(__file__).resolve().parent
-
-DOC_FORMATS = {".html", ".htm", ".docx", ".xlsx", ".pdf"}
-IMG_FORMATS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".tiff", ".tif", ".svg"}
-TARGET_FORMATS = DOC_FORMATS | IMG_FORMATS
-
-DEFAULT_MODEL = "gpt-4o-mini"  # custo/benefício para captioning
-DEFAULT_PROMPT = (
-    "Descreva a imagem em PT-BR para acessibilidade (ALT). "
-    "Seja objetiva, cite texto visível e contexto; não invente."
-)
-
-# Tipos a baixar da página
-RESOURCE_TAG_ATTRS = [
-    ("img", "src"),
-    ("script", "src"),
-    ("link", "href"),         # CSS principalmente
-    ("source", "src"),        # <picture>, <video>, <audio>
-]
-
-# Limites para download de assets
-MAX_ASSET_BYTES = 8 * 1024 * 1024  # 8 MB
-ALLOWED_MIME_PREFIXES = (
-    "image/", "text/css", "application/javascript", "text/javascript", "application/x-javascript"
-)
-
-# ================== OPENAI KEY LOADER ===========================
-
-def load_openai_key_from_file():
-    """
-    Lê a OPENAI_API_KEY do arquivo OPENAI_API_KEY.txt (no mesmo diretório
-    do script) e joga em os.environ["OPENAI_API_KEY"].
-
-    Aceita:
-        OPENAI_API_KEY = "minha_chave"
-    ou só:
-        minha_chave
-    """
-    key_path = base_dir / "OPENAI_API_KEY.txt"
-    if not key_path.exists():
-        return
-
-    text = key_path.read_text(encoding="utf-8").strip()
-
-    # Tenta formato: OPENAI_API_KEY = "chave"
-    m = re.search(r'OPENAI_API_KEY\s*=\s*["\'](.+?)["\']', text)
-    if m:
-        key = m.group(1).strip()
-    else:
-        # Senão, assume que o arquivo contém só a chave (com ou sem aspas)
-        key = text.strip().strip('"').strip("'")
-
-    if key:
-        os.environ["OPENAI_API_KEY"] = key
-
-
-# ========================= Aplicação ============================
-
-class MarkItDownApp(TkinterDnD.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("Conversor p/ Markdown • MarkItDown + OpenAI + Selenium")
-        self.geometry("760x720")
-
-        # saída: mesma pasta do programa
-        self.output_dir = base_dir
-
-        # Estado OpenAI / MarkItDown
-        self.use_openai = tk.BooleanVar(value=False)
-        self.model_name = tk.StringVar(value=DEFAULT_MODEL)
-        self.prompt_text = tk.StringVar(value=DEFAULT_PROMPT)
-        self.desc_mode = tk.StringVar(value="markitdown")  # "markitdown" | "direct"
-
-        # Estado Selenium (Firefox portátil por padrão)
-        self.url_text = tk.StringVar(value="")
-        self.gecko_path = tk.StringVar(value=str(base_dir / "firefox" / "geckodriver.exe"))
-        self.firefox_bin = tk.StringVar(value=str(base_dir / "firefox" / "firefox.exe"))
-        self.headless = tk.BooleanVar(value=True)
-
-        self.md = self._build_markitdown()  # instancia o conversor
-        self._criar_interface()
-
-    # ----------------------------- UI ---------------------------------
-
-    def _criar_interface(self):
-        info = (
-            "Arraste arquivos abaixo ou use 'Escolher arquivos'.\n"
-            f"Extensões: {', '.join(sorted(TARGET_FORMATS))}\n"
-            f"Saída (.md): {self.output_dir}"
-        )
-        tk.Label(self, text=info, justify="center").pack(pady=8)
-
-        # Área de drop
-        self.drop_area = tk.Label(self, text="⬇ Arraste arquivos aqui ⬇",
-                                  relief="ridge", borderwidth=2, width=70, height=4)
-        self.drop_area.pack(pady=6, padx=20, fill="x")
-        self.drop_area.drop_target_register(DND_FILES)
-        self.drop_area.dnd_bind("<<Drop>>", self._on_drop)
-
-        # File picker
-        row_btn = tk.Frame(self); row_btn.pack(pady=4)
-        tk.Button(row_btn, text="Escolher arquivos…", command=self._selecionar_arquivos)\
-            .pack(side="left", padx=5)
-
-        # Painel OpenAI
-        p_ai = tk.LabelFrame(self, text="Descrição de imagens (OpenAI)")
-        p_ai.pack(padx=10, pady=8, fill="x")
-
-        tk.Checkbutton(p_ai, text="Descrever imagens (OpenAI)",
-                       variable=self.use_openai,
-                       command=self._on_openai_toggle).pack(anchor="w", padx=8, pady=4)
-
-        r1 = tk.Frame(p_ai); r1.pack(fill="x", padx=8, pady=2)
-        tk.Label(r1, text="Modelo:").pack(side="left")
-        tk.Entry(r1, textvariable=self.model_name, width=20).pack(side="left", padx=6)
-
-        tk.Label(r1, text="Modo:").pack(side="left", padx=(10,0))
-        mode = ttk.Combobox(r1, state="readonly", width=30,
-                            values=["MarkItDown + OpenAI (recomendado)",
-                                    "OpenAI direto (Responses API)"])
-        mode.current(0)
-        mode.bind("<<ComboboxSelected>>", lambda e: self._set_desc_mode(mode.current()))
-        mode.pack(side="left", padx=6)
-
-        r2 = tk.Frame(p_ai); r2.pack(fill="x", padx=8, pady=6)
-        tk.Label(r2, text="Prompt:").pack(anchor="w")
-        tk.Entry(r2, textvariable=self.prompt_text).pack(fill="x")
-
-        # Painel Selenium / URL
-        p_sel = tk.LabelFrame(self, text="Capturar página com Selenium (Firefox)")
-        p_sel.pack(padx=10, pady=8, fill="x")
-
-        r3 = tk.Frame(p_sel); r3.pack(fill="x", padx=8, pady=4)
-        tk.Label(r3, text="URL:").pack(side="left")
-        tk.Entry(r3, textvariable=self.url_text).pack(side="left", fill="x", expand=True, padx=6)
-        tk.Button(r3, text="Capturar & Converter URL", command=self._capturar_converter_url)\
-            .pack(side="left", padx=6)
-
-        r4 = tk.Frame(p_sel); r4.pack(fill="x", padx=8, pady=4)
-        tk.Label(r4, text="GeckoDriver:").pack(side="left")
-        tk.Entry(r4, textvariable=self.gecko_path, width=45).pack(side="left", padx=6)
-        tk.Label(r4, text="Firefox bin:").pack(side="left", padx=(10,0))
-        tk.Entry(r4, textvariable=self.firefox_bin, width=34).pack(side="left", padx=6)
-
-        tk.Checkbutton(p_sel, text="Headless (sem janela)", variable=self.headless)\
-            .pack(anchor="w", padx=10, pady=4)
-
-        # Log
-        self.log = tk.Text(self, height=16, state="disabled")
-        self.log.pack(padx=10, pady=10, fill="both", expand=True)
-
-    def _set_desc_mode(self, idx: int):
-        self.desc_mode.set("markitdown" if idx == 0 else "direct")
-        self.md = self._build_markitdown()
-
-    def _on_openai_toggle(self):
-        self.md = self._build_markitdown()
-
-    # ------------------------ Infra / Helpers --------------------------
-
-    def _build_markitdown(self) -> MarkItDown:
-        """
-        Cria o MarkItDown. Se 'Descrever imagens' estiver ON e modo 'markitdown',
-        passamos llm_client/model/prompt para que a descrição seja gerada quando
-        a entrada for uma *imagem* isolada (PNG/JPG etc.).
-        """
-        if self.use_openai.get() and self.desc_mode.get() == "markitdown":
-            if not os.getenv("OPENAI_API_KEY"):
-                self._log("⚠ OPENAI_API_KEY não definido; descrição via MarkItDown desativada.")
-                return MarkItDown()
-            client = OpenAI()
-            return MarkItDown(
-                llm_client=client,
-                llm_model=self.model_name.get().strip() or DEFAULT_MODEL,
-                llm_prompt=self.prompt_text.get().strip() or DEFAULT_PROMPT,
-            )
-        return MarkItDown()
-
-    def _log(self, msg: str):
-        self.log.configure(state="normal")
-        ts = datetime.now().strftime("%H:%M:%S")
-        self.log.insert("end", f"[{ts}] {msg}\n")
-        self.log.see("end")
-        self.log.configure(state="disabled")
-
-    # ------------------------ Fluxos de Arquivo ------------------------
-
-    def _on_drop(self, event):
-        files = self.tk.splitlist(event.data)
-        caminhos = [Path(f) for f in files if f]
-        self._processar_arquivos(caminhos)
-
-    def _selecionar_arquivos(self):
-        tipos = [
-            ("Todos suportados", " ".join(f"*{ext}" for ext in sorted(TARGET_FORMATS))),
-            ("Imagens", "*.png *.jpg *.jpeg *.gif *.webp *.bmp *.tiff *.tif *.svg"),
-            ("HTML", "*.html *.htm"),
-            ("Word", "*.docx"),
-            ("Excel", "*.xlsx"),
-            ("PDF", "*.pdf"),
-            ("Todos os arquivos", "*.*"),
-        ]
-        paths = filedialog.askopenfilenames(title="Escolher arquivos para converter",
-                                            filetypes=tipos)
-        if not paths: 
-            return
-        self._processar_arquivos([Path(p) for p in paths])
-
-    def _processar_arquivos(self, caminhos: list[Path]):
-        if not caminhos: 
-            return
-        ok = 0
-        for caminho in caminhos:
-            if not caminho.is_file():
-                self._log(f"Ignorando (não é arquivo): {caminho}")
-                continue
-            ext = caminho.suffix.lower()
-            if ext not in TARGET_FORMATS:
-                self._log(f"Ignorando (extensão não suportada): {caminho.name}")
-                continue
-            try:
-                if ext in IMG_FORMATS and self.use_openai.get() and self.desc_mode.get() == "direct":
-                    markdown = self._descrever_imagem_via_openai(caminho)
-                else:
-                    markdown = self.md.convert(caminho).markdown
-                out = self.output_dir / f"{caminho.stem}.md"
-                out.write_text(markdown, encoding="utf-8")
-                self._log(f"✓ Convertido {caminho.name} → {out.name}")
-                ok += 1
-            except Exception as e:
-                self._log(f"✗ Erro convertendo {caminho.name}: {e}")
-
-        messagebox.showinfo("Concluído", f"Conversão finalizada. {ok} arquivo(s) gerado(s).")
-
-    # --------------------------- Selenium ------------------------------
-
-    def _capturar_converter_url(self):
-        url = self.url_text.get().strip()
-        if not url:
-            messagebox.showwarning("URL vazia", "Informe uma URL.")
-            return
-
-        tmpdir = Path(tempfile.mkdtemp(prefix="mkd_snap_"))
-        self._log(f"Capturando: {url}\nTemporários em: {tmpdir}")
-
-        # Configura Selenium (Firefox)
-        options = FirefoxOptions()
-        if self.firefox_bin.get().strip():
-            options.binary_location = self.firefox_bin.get().strip()
-        if self.headless.get():
-            options.add_argument("--headless")
-
-        # Preferências de download (usamos requests, mas isso não atrapalha)
-        options.set_preference("browser.download.folderList", 2)
-        options.set_preference("browser.download.dir", str(tmpdir))
-        options.set_preference("browser.download.manager.showWhenStarting", False)
-        options.set_preference(
-            "browser.helperApps.neverAsk.saveToDisk",
-            "application/pdf,application/octet-stream,application/vnd.ms-excel"
-        )
-
-        gecko = self.gecko_path.get().strip() or None
-        service = FirefoxService(executable_path=gecko) if gecko else FirefoxService()
-
-        driver = None
-        try:
-            driver = webdriver.Firefox(service=service, options=options)
-            driver.set_page_load_timeout(60)
-            driver.get(url)
-
-            WebDriverWait(driver, 30).until(
-                lambda d: d.execute_script("return document.readyState") == "complete"
-            )
-            # auto-scroll para carregar lazy content
-            self._auto_scroll(driver, pause=0.8, max_steps=20)
-
-            # user-agent para requests
-            ua = driver.execute_script("return navigator.userAgent") or "Mozilla/5.0"
-
-            # salva HTML bruto
-            html = driver.page_source
-            html_path = tmpdir / "index.html"
-            html_path.write_text(html, encoding="utf-8")
-            self._log(f"• HTML salvo: {html_path.name}")
-
-            # baixa recursos referenciados (img/css/js)
-            assets_dir = tmpdir / "assets"
-            assets_dir.mkdir(exist_ok=True)
-            images = self._baixar_recursos(driver.current_url, html, assets_dir, ua, driver=driver)
-            self._log(f"• Recursos baixados: {len(images['all'])} (imagens: {len(images['imgs'])})")
-
-            # move assets para pasta definitiva ao lado do .md
-            slug = self._slugify_url(driver.current_url)
-            final_assets_dir = self.output_dir / f"{slug}_assets"
-            final_assets_dir.mkdir(exist_ok=True)
-
-            # Atualiza mapa e lista de imagens para apontar para o destino final
-            updated_img_list = []
-            for src_path in images["all"]:
-                src = Path(src_path)
-                tgt = final_assets_dir / src.name
-                i = 1
-                while tgt.exists():
-                    stem, ext = os.path.splitext(src.name)
-                    tgt = final_assets_dir / f"{stem}_{i}{ext}"
-                    i += 1
-                shutil.copy2(src, tgt)
-
-                # Atualiza map URL → caminho final
-                for k, v in list(images["map"].items()):
-                    if v == str(src):
-                        images["map"][k] = str(tgt)
-
-                # Atualiza lista de imagens
-                if src.suffix.lower() in IMG_FORMATS:
-                    updated_img_list.append(str(tgt))
-
-            images["imgs"] = updated_img_list
-
-            # reescreve HTML (no tmp) para apontar pros assets locais (relativos ao output_dir)
-            html_rewritten = self._rewrite_html_with_local_assets(
-                html=html,
-                base_url=driver.current_url,
-                url_map=images["map"],
-                final_assets_dir=final_assets_dir
-            )
-            html_path.write_text(html_rewritten, encoding="utf-8")
-
-            # converte HTML → Markdown (MarkItDown)
-            md_text = self.md.convert(html_path).markdown
-
-            # (opcional) gerar descrições para as imagens capturadas
-            if self.use_openai.get() and images["imgs"]:
-                if not os.getenv("OPENAI_API_KEY"):
-                    load_openai_key_from_file()
-                if not os.getenv("OPENAI_API_KEY"):
-                    self._log("⚠ OPENAI_API_KEY não definido; pulando descrição de imagens.")
-                else:
-                    descricoes = []
-                    for img_path in images["imgs"]:
-                        try:
-                            descr = self._gerar_alt_para_imagem(Path(img_path))
-                            descricoes.append((img_path, descr))
-                        except Exception as e:
-                            self._log(f"Erro descrevendo {Path(img_path).name}: {e}")
-
-                    if descricoes:
-                        md_text += "\n\n## Descrições de imagens (captura Selenium)\n"
-                        for pth, txt in descricoes:
-                            md_text += f"- `{Path(pth).name}` — {txt}\n"
-
-            # nome de saída baseado na URL
-            out_name = slug + ".md"
-            out_path = self.output_dir / out_name
-            out_path.write_text(md_text, encoding="utf-8")
-            self._log(f"✓ URL convertida → {out_name}")
-
-            messagebox.showinfo("Concluído", f"Gerei {out_name} na pasta do programa.")
-        except (TimeoutException, WebDriverException) as e:
-            self._log(f"✗ Selenium/Firefox: {e}")
-            messagebox.showerror("Erro Selenium", str(e))
-        except Exception as e:
-            self._log(f"✗ Erro na captura/conversão: {e}")
-            messagebox.showerror("Erro", str(e))
-        finally:
-            try:
-                if driver:
-                    driver.quit()
-            except Exception:
-                pass
-            # limpa temporários
-            shutil.rmtree(tmpdir, ignore_errors=True)
-            self._log("• Temporários removidos.")
-
-    # --------------------------- Helpers Selenium/Assets ----------------
-
-    def _baixar_recursos(self, base_url: str, html: str, dest: Path, user_agent: str, driver=None):
-        """
-        Percorre o DOM (via BeautifulSoup) e baixa recursos-chave.
-        Transfere cookies do Selenium (se houver).
-        Aplica limites de MIME/tamanho.
-        Retorna dict com: 'all' (todos salvos), 'imgs' (apenas imagens) e 'map' (URL -> caminho local).
-        """
-        from bs4 import BeautifulSoup
-
-        session = requests.Session()
-        session.headers.update({"User-Agent": user_agent})
-        if driver:
-            self._attach_cookies_from_driver(driver, session)
-
-        soup = BeautifulSoup(html, "html.parser")
-        found_urls = set()
-        url_to_local = {}
-
-        def _save(url: str):
-            try:
-                r = session.get(url, timeout=30, stream=True)
-                r.raise_for_status()
-
-                ctype = r.headers.get("Content-Type", "")
-                if not any(ctype.startswith(p) for p in ALLOWED_MIME_PREFIXES):
-                    return None
-
-                size = r.headers.get("Content-Length")
-                if size and int(size) > MAX_ASSET_BYTES:
-                    return None
-
-                parsed = urlparse(url)
-                fname = Path(parsed.path).name or "index"
-                if not os.path.splitext(fname)[1]:
-                    # tenta inferir pela resposta
-                    ext = mimetypes.guess_extension(ctype, strict=False) or ""
-                    fname = fname + ext
-
-                target = dest / fname
-                i = 1
-                while target.exists():
-                    stem, ext = os.path.splitext(fname)
-                    target = dest / f"{stem}_{i}{ext}"
-                    i += 1
-
-                total = 0
-                with open(target, "wb") as f:
-                    for chunk in r.iter_content(8192):
-                        if not chunk:
-                            continue
-                        total += len(chunk)
-                        if total > MAX_ASSET_BYTES:
-                            f.close()
-                            try:
-                                os.remove(target)
-                            except Exception:
-                                pass
-                            return None
-                        f.write(chunk)
-
-                url_to_local[url] = str(target)
-                return str(target)
-            except Exception:
-                return None
-
-        # coleta URLs dos atributos alvo
-        for tag, attr in RESOURCE_TAG_ATTRS:
-            for node in soup.find_all(tag):
-                val = node.get(attr)
-                if not val:
-                    continue
-                abs_url = urljoin(base_url, val)
-                found_urls.add(abs_url)
-
-        # tratamento básico de srcset (pega o primeiro candidato)
-        for node in soup.find_all("img"):
-            srcset = node.get("srcset")
-            if srcset:
-                candidate = srcset.split(",")[0].strip().split(" ")[0]
-                abs_url = urljoin(base_url, candidate)
-                found_urls.add(abs_url)
-
-        saved_all, saved_imgs = [], []
-        for u in sorted(found_urls):
-            local = _save(u)
-            if local:
-                saved_all.append(local)
-                if Path(local).suffix.lower() in IMG_FORMATS:
-                    saved_imgs.append(local)
-
-        return {"all": saved_all, "imgs": saved_imgs, "map": url_to_local}
-
-    def _rewrite_html_with_local_assets(self, html: str, base_url: str, url_map: dict, final_assets_dir: Path) -> str:
-        """
-        Reescreve o HTML para referenciar os assets locais (em final_assets_dir),
-        usando caminhos relativos ao diretório de saída (self.output_dir).
-        """
-        from bs4 import BeautifulSoup
-
-        soup = BeautifulSoup(html, "html.parser")
-
-        def rel_for(url: str):
-            local = url_map.get(url)
-            if not local:
-                return None
-            # caminho relativo a partir do local do .md (output_dir)
-            return os.path.relpath(local, start=self.output_dir)
-
-        targets = [
-            ("img", "src"),
-            ("source", "src"),
-            ("script", "src"),
-            ("link", "href"),
-        ]
-
-        for tag, attr in targets:
-            for node in soup.find_all(tag):
-                val = node.get(attr)
-                if not val:
-                    continue
-                abs_url = urljoin(base_url, val)
-                new_rel = rel_for(abs_url)
-                if new_rel:
-                    node[attr] = new_rel.replace("\\", "/")  # normaliza separador p/ Markdown
-
-        return str(soup)
-
-    def _attach_cookies_from_driver(self, driver, session: requests.Session):
-        """Copia cookies do Selenium para a sessão requests (útil p/ páginas autenticadas)."""
-        try:
-            cookies = driver.get_cookies()
-        except Exception:
-            cookies = []
-        for c in cookies:
-            try:
-                session.cookies.set(
-                    c.get("name"), c.get("value"),
-                    domain=c.get("domain"), path=c.get("path", "/")
-                )
-            except Exception:
-                pass
-
-    def _auto_scroll(self, driver, pause=0.8, max_steps=20):
-        """Rola a página até estabilizar a altura (ou atingir max_steps)."""
-        last_h = 0
-        for _ in range(max_steps):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(pause)
-            h = driver.execute_script("return document.body.scrollHeight") or 0
-            if h == last_h:
-                break
-            last_h = h
-
-    def _slugify_url(self, url: str) -> str:
-        parsed = urlparse(url)
-        text = f"{parsed.netloc}{parsed.path}"
-        text = re.sub(r"[^a-zA-Z0-9_-]+", "_", text).strip("_")
-        return text or "pagina"
-
-    # ------------------ OpenAI direto (Responses API) ------------------
-
-    def _gerar_alt_para_imagem(self, img_path: Path) -> str:
-        """Gera **apenas** o texto ALT (string) via Responses API."""
-        model = self.model_name.get().strip() or DEFAULT_MODEL
-        prompt = self.prompt_text.get().strip() or DEFAULT_PROMPT
-        client = OpenAI()
-
-        mime, _ = mimetypes.guess_type(img_path.name)
-        mime = mime or "image/png"
-        b64 = base64.b64encode(img_path.read_bytes()).decode("utf-8")
-        data_url = f"data:{mime};base64,{b64}"
-
-        try:
-            resp = client.responses.create(
-                model=model,
-                input=[{
-                    "role": "user",
-                    "content": [
-                        {"type": "input_text", "text": prompt},
-                        {"type": "input_image", "image_url": data_url},
-                    ],
-                }],
-            )
-            return (resp.output_text or "").strip()
-        except Exception as e:
-            self._log(f"OpenAI erro: {e}")
-            return ""
-
-    def _descrever_imagem_via_openai(self, file_path: Path) -> str:
-        """
-        Constrói um Markdown simples com ALT + legenda para uma
-        *imagem isolada*, usando a Responses API com data URL Base64.
-        """
-        if not os.getenv("OPENAI_API_KEY"):
-            raise RuntimeError("OPENAI_API_KEY não definido.")
-
-        alt = self._gerar_alt_para_imagem(file_path)
-
-        # garante que a imagem exista ao lado do .md (para o link)
-        target_img = self.output_dir / file_path.name
-        if not target_img.exists():
-            shutil.copy2(file_path, target_img)
-
-        md = []
-        md.append(f"![{alt}]({target_img.name})\n")
-        md.append("**Descrição:** " + (alt or "(sem descrição)") + "\n")
-        md.append(f"\n<sub>Gerado por {self.model_name.get()} em "
-                  f"{datetime.now().isoformat(timespec='seconds')}</sub>\n")
-        return "".join(md)
-
-
-def main():
-    # carrega a chave da OpenAI do arquivo, antes de criar a UI
-    load_openai_key_from_file()
-
-    app = MarkItDownApp()
-    app.mainloop()
-
-if __name__ == "__main__":
-    main()
+# -*- coding: utf-8 -*-
+import os
+import re
+import time
+import argparse
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import math
+import shutil
+import mimetypes
+import tempfile
+import threading
+import uuid
+import html as html_lib
+import itertools
+import queue
+import socket
+import sqlite3
+import struct
+import tarfile
+import zipfile
+import requests
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path, PurePosixPath
+from types import SimpleNamespace
+from urllib.parse import parse_qs, unquote_plus, urljoin, urlparse
+
+# --- GUI ---
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+from tkinterdnd2 import DND_FILES, TkinterDnD
+
+# --- Conversão / LLM ---
+from markitdown import MarkItDown
+from openai import OpenAI
+
+# --- Selenium (Firefox/Gecko) ---
+from selenium import webdriver
+from selenium.webdriver.firefox.service import Service as FirefoxService
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+# ================== Configurações & Constantes ==================
+
+base_dir = Path(__file__).resolve().parent
+
+DOC_FORMATS = {".html", ".htm", ".docx", ".xlsx", ".pdf"}
+IMG_FORMATS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".tiff", ".tif", ".svg"}
+TARGET_FORMATS = DOC_FORMATS | IMG_FORMATS
+# Compactados: cada membro suportado vira um .md em output_dir/<nome do arquivo>/, espelhando as pastas
+ARCHIVE_FORMATS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ARCHIVE_MAX_MEMBER_BYTES = 512 * 1024 * 1024  # membro maior que isso (ou bomba de compressão) é pulado
+ARCHIVE_CHUNK_BYTES = 1024 * 1024             # cópia do stream do membro para o temporário
+
+DEFAULT_MODEL = "gpt-4o-mini"  # custo/benefício para captioning
+DEFAULT_PROMPT = (
+    "Descreva a imagem em PT-BR para acessibilidade (ALT). "
+    "Seja objetiva, cite texto visível e contexto; não invente."
+)
+
+# Tipos a baixar da página
+RESOURCE_TAG_ATTRS = [
+    ("img", "src"),
+    ("script", "src"),
+    ("link", "href"),         # CSS principalmente
+    ("source", "src"),        # <picture>, <video>, <audio>
+]
+
+# Limites para download de assets
+MAX_ASSET_BYTES = 8 * 1024 * 1024  # 8 MB
+ALLOWED_MIME_PREFIXES = (
+    "image/", "text/css", "application/javascript", "text/javascript", "application/x-javascript"
+)
+GENERIC_MIME_TYPES = {"", "application/octet-stream", "binary/octet-stream"}  # decide pelo conteúdo
+DOWNLOAD_CHUNK_BYTES = 256 * 1024  # blocos lidos da rede (ConfigConversao.download_chunk_bytes)
+SNIFF_BYTES = 64 * 1024            # início do arquivo guardado para MIME real e dimensões
+MIN_CAPTION_PX = 32                # imagens menores que isso (ícones, pixels, espaçadores) não são descritas
+
+# Resolução de recursos: srcset/sizes e url() de CSS
+IMG_TARGET_WIDTH = 1024   # do srcset, baixa o menor candidato com pelo menos esta largura
+VIEWPORT_WIDTH = 1366     # viewport usado para avaliar `sizes` e `media` (vw, min/max-width)
+CSS_MAX_DEPTH = 2         # níveis de CSS seguidos no arquivamento (@import dentro de @import…)
+FONT_EXTS = {".woff", ".woff2", ".ttf", ".otf", ".eot"}
+CSS_URL_RE = re.compile(r"""url\(\s*(?:"([^"]*)"|'([^']*)'|([^)'"\s]*))\s*\)""", re.I)
+CSS_IMPORT_RE = re.compile(r"""@import\s+(?:"([^"]+)"|'([^']+)')""", re.I)
+STYLE_ATTR_RE = re.compile(r"""\sstyle\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.I)
+STYLE_BLOCK_RE = re.compile(r"<style\b[^>]*>(.*?)</style>", re.I | re.S)
+MEDIA_WIDTH_RE = re.compile(r"\(\s*(min|max)-width\s*:\s*([\d.]+)(px|r?em)\s*\)", re.I)
+
+# Pipeline da captura (asyncio): conversão, downloads e legendagem sobrepostos
+CAPTURE_DOWNLOAD_WORKERS = 6  # downloads de assets simultâneos por página
+CAPTURE_QUEUE_SIZE = 32       # itens em espera entre dois estágios (fila cheia segura o anterior)
+
+# Jobs em segundo plano (captura/conversão fora do loop do Tk)
+JOB_WORKERS = 2          # jobs executados em paralelo; os demais aguardam na fila
+EVENT_POLL_MS = 100      # intervalo de leitura da fila de eventos pela UI
+
+# Governador de recursos: limites compartilhados por todos os jobs/workers do processo
+GOV_MAX_CONVERSOES = 2                      # conversões do MarkItDown ao mesmo tempo
+GOV_MAX_BYTES_EM_VOO = 4 * MAX_ASSET_BYTES  # downloads de assets em andamento, somados
+GOV_MAX_CHAMADAS_API = 4                    # chamadas de legendagem simultâneas
+GOV_FRACAO_RAM = 0.7         # limite de RSS padrão: 70% da RAM da máquina (5,6 GB num worker de 8 GB)
+GOV_LATENCIA_ALVO_S = 8.0    # média móvel das chamadas de API acima disso → menos chamadas em paralelo
+GOV_INTERVALO_AJUSTE_S = 2.0 # reavaliação dos limites no máximo a cada N segundos
+
+# Backends de descrição de imagens (ALT)
+CAPTION_BACKENDS = ("openai", "servidor-local", "modelo-local")
+LOCAL_SERVER_URL = "http://localhost:11434/v1"  # servidor compatível c/ OpenAI (Ollama, llama.cpp, vLLM…)
+LOCAL_CAPTION_MODEL = "Salesforce/blip-image-captioning-base"  # transformers, roda em CPU
+OCR_LANG = "por+eng"                  # idiomas do Tesseract no caminho OCR
+OCR_MIME_TYPES = {"image/png", "image/bmp", "image/gif", "image/tiff", "image/webp"}
+OCR_MIN_CHARS = 20                    # OCR com menos texto que isso cai no backend configurado
+
+# Triagem de imagens antes da legendagem (NumPy + Pillow; sem eles, tudo segue para a legenda)
+TRIAGE_THUMB_PX = 192          # miniatura quadrada das métricas (menor que isso, texto vira borrão)
+TRIAGE_BATCH = 32              # miniaturas processadas por vez (uma matriz N×192×192×3)
+TRIAGE_MIN_VARIACAO = 4.0      # desvio-padrão médio dos canais abaixo disso: bloco de cor lisa
+TRIAGE_MIN_ENTROPIA = 1.0      # bits (histograma de 32 níveis de luminância): ≤ 2 tons, sem conteúdo
+TRIAGE_MAX_ASPECTO = 10.0      # barras, divisórias, faixas de gradiente
+TRIAGE_MAX_SAT_TEXTO = 24.0    # croma médio (0-255) de um print de texto: quase sem cor
+TRIAGE_MIN_BORDAS_TEXTO = 0.03 # fração de pixels com transição forte (traços de letras)
+
+# Legendas em lote (OpenAI Batch API): pedidos em JSONL, resultado mesclado depois nos .md
+BATCH_DIR_NAME = "_lotes_openai"           # manifestos e JSONL ficam em output_dir/<isto>
+BATCH_ENDPOINT = "/v1/responses"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_SECONDS = 30
+BATCH_MAX_REQUESTS = 50_000                # limites por arquivo de entrada da Batch API
+BATCH_MAX_BYTES = 190 * 1024 * 1024
+ALT_PLACEHOLDER_RE = re.compile(r"\{\{ALT:([A-Za-z0-9_-]+)\}\}")
+
+# Métricas por execução (spans por etapa, bytes, contagens, latências de API)
+METRICS_DIR_NAME = "_metricas"        # em output_dir: metricas.jsonl e prom/*.prom
+METRICS_FORMATS = ("jsonl", "prometheus", "ambos", "nenhum")
+
+# Diário de jobs (SQLite): estado de cada entrada para retomar lotes interrompidos
+JOURNAL_FILE_NAME = "_diario_jobs.sqlite3"   # em output_dir
+JOURNAL_STATES = ("pendente", "convertido", "legendado", "falhou")
+
+# Serviço HTTP local (python mdToLLM_2.py servir): conversores "quentes" reaproveitados
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_WORKERS = 2                   # conversores prontos (MarkItDown + clientes já criados)
+SERVICE_QUEUE = 8                     # pedidos aguardando além dos em execução; acima disso → 503
+SERVICE_QUEUE_WAIT_S = 120            # espera máxima por um conversor livre
+SERVICE_RETRY_AFTER_S = 5
+SERVICE_MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+SERVICE_CHUNK_BYTES = 64 * 1024       # blocos do upload (disco) e da resposta (chunked)
+
+# Recaptura incremental: trechos do DOM que mudam a cada carga e não contam como mudança
+DOM_VOLATILE_RE = re.compile(
+    r"<script\b.*?</script>|<style\b.*?</style>|<noscript\b.*?</noscript>|<!--.*?-->"
+    r"|\s(?:nonce|integrity|data-csrf[\w-]*|csrf[\w-]*)=\"[^\"]*\"",
+    re.S | re.I,
+)
+URL_LIST_SPLIT_RE = re.compile(r"[\s,;]+")
+
+# Captura sem navegador: páginas renderizadas no servidor vêm por HTTP, sem abrir o Firefox
+CAPTURE_MODES = ("auto", "estatico", "selenium")  # auto: HTTP e, se a página depender de JS, Firefox
+STATIC_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:128.0) Gecko/20100101 Firefox/128.0"
+STATIC_POOL_SIZE = 8              # conexões keep-alive por host na sessão HTTP do conversor
+STATIC_MAX_HTML_BYTES = 16 * 1024 * 1024
+STATIC_MIN_TEXT_CHARS = 400       # menos texto visível que isso, com <script>, indica página montada por JS
+STATIC_LAZY_MIN_IMGS = 3          # imagens só com data-src (lazy-load por JS) a partir das quais usar o Firefox
+META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.I)
+SPA_ROOT_RE = re.compile(
+    r"<div\b[^>]*\bid=[\"'](?:root|app|__next|__nuxt|___gatsby|svelte)[\"'][^>]*>\s*</div>"
+    r"|<app-root\b[^>]*>\s*</app-root>",
+    re.I,
+)
+NOSCRIPT_RE = re.compile(r"<noscript\b[^>]*>(.*?)</noscript>", re.S | re.I)
+JS_AVISO_RE = re.compile(r"(?:enable|habilite|ative|activate|turn on|requires?|precisa)\W+(?:\w+\W+){0,3}javascript", re.I)
+DESAFIO_BOT_RE = re.compile(r"challenge-platform|cf-browser-verification|<title>\s*Just a moment", re.I)
+IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.I)
+TAG_RE = re.compile(r"<[^>]+>")
+
+# Fila distribuída (python mdToLLM_2.py enfileirar / worker / fila)
+QUEUE_LEASE_S = 600          # prazo do arrendamento; renovado enquanto o worker trabalha
+QUEUE_IDLE_S = 5             # espera do worker quando a fila está vazia
+QUEUE_MAX_ATTEMPTS = 3       # tentativas por item antes de ir para 'falhou'
+QUEUE_RETRY_BACKOFF_S = 30   # espera antes de repetir (dobra a cada tentativa)
+
+# Pós-processamento do Markdown (depois do MarkItDown, em arquivos e capturas)
+POSTPROC_MODES = ("nenhum", "basico", "compacto")
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "igshid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "ref_src", "vero_id", "spm",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_", "hsa_")
+# [texto](url "título"); a URL aceita um nível de parênteses (void(0), Foo_(bar)). Sem grupos de
+# espaço opcionais sobrepostos: cada caractere tem um só caminho, então o casamento é linear.
+MD_LINK_RE = re.compile(
+    r'(!?)\[([^\[\]\n]*)\]\(<?([^\s()<>]*(?:\([^\s()<>]*\)[^\s()<>]*)*)>?( +"[^"\n]*")?\)')
+MD_CODE_TICKS_RE = re.compile(r"`+")
+ESPACOS_RE = re.compile(r"\s+")
+MD_LIST_ITEM_RE = re.compile(r"(?:[-*+]|\d{1,9}[.)])(?:\s|$)")
+TABLE_SEP_CELL_RE = re.compile(r"\s*(:?)-+(:?)\s*")
+TABLE_PIPE_RE = re.compile(r"(?<!\\)\|")  # divisória de células (\| é um pipe literal)
+INVISIBLE_CHARS = {0x200B: None, 0x200C: None, 0x200D: None, 0x2060: None, 0xFEFF: None, 0x00A0: " "}
+
+# Índice de busca (SQLite FTS5) sobre os .md gerados
+INDEX_FILE_NAME = "_indice_busca.sqlite3"  # em output_dir
+INDEX_CHUNK_CHARS = 1500       # trechos indexados: seções cortadas em parágrafos até ~este tamanho
+INDEX_CHUNK_BITS = 20          # rowid do trecho = (id do documento << 20) | nº do trecho
+MD_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+# Alvos de links no Markdown gerado: ![alt](url "título") / [texto](url)
+MD_LINK_TARGET_RE = re.compile(r'\]\(\s*<?([^\s()<>]+)>?')
+
+# ================== OPENAI KEY LOADER ===========================
+
+def load_openai_key_from_file():
+    """
+    Lê a OPENAI_API_KEY do arquivo OPENAI_API_KEY.txt (no mesmo diretório
+    do script) e joga em os.environ["OPENAI_API_KEY"].
+
+    Aceita:
+        OPENAI_API_KEY = "minha_chave"
+    ou só:
+        minha_chave
+    """
+    key_path = base_dir / "OPENAI_API_KEY.txt"
+    if not key_path.exists():
+        return
+
+    text = key_path.read_text(encoding="utf-8").strip()
+
+    # Tenta formato: OPENAI_API_KEY = "chave"
+    m = re.search(r'OPENAI_API_KEY\s*=\s*["\'](.+?)["\']', text)
+    if m:
+        key = m.group(1).strip()
+    else:
+        # Senão, assume que o arquivo contém só a chave (com ou sem aspas)
+        key = text.strip().strip('"').strip("'")
+
+    if key:
+        os.environ["OPENAI_API_KEY"] = key
+
+
+# ============ Gravação atômica & diário de jobs ==================
+
+def gravar_atomico(destino: Path, conteudo: str | bytes):
+    """
+    Grava em um temporário na mesma pasta e troca por rename: quem lê (ou um
+    lote retomado depois de uma queda) nunca encontra o arquivo pela metade.
+    """
+    tmp = destino.with_name(f".{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    dados = conteudo.encode("utf-8") if isinstance(conteudo, str) else conteudo
+    try:
+        with open(tmp, "wb") as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, destino)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+class DiarioJobs:
+    """
+    Diário persistente (SQLite, em output_dir) do estado de cada entrada de um lote:
+    pendente → convertido | legendado | falhou, junto com o .md gerado.
+    A chave é o caminho absoluto; tamanho + mtime detectam entradas alteradas,
+    que voltam a ser convertidas. Vários jobs podem usar o mesmo arquivo (WAL).
+    """
+
+    def __init__(self, caminho: Path):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(caminho), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entradas ("
+            " entrada TEXT PRIMARY KEY, tamanho INTEGER, mtime_ns INTEGER,"
+            " estado TEXT NOT NULL, saida TEXT, erro TEXT,"
+            " tentativas INTEGER NOT NULL DEFAULT 0, atualizado TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entradas_saida ON entradas (saida)")
+        # recaptura incremental: última captura de cada slug e seus assets
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS capturas ("
+            " slug TEXT PRIMARY KEY, url TEXT, dom_hash TEXT, opcoes TEXT, capturado TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS capturas_assets ("
+            " slug TEXT, url TEXT, arquivo TEXT, sha256 TEXT, descricao TEXT,"
+            " etag TEXT, modificado TEXT, PRIMARY KEY (slug, url))"
+        )
+        # diários anteriores aos validadores HTTP (ETag / Last-Modified)
+        colunas = {c[1] for c in self._db.execute("PRAGMA table_info(capturas_assets)")}
+        for coluna in ("etag", "modificado"):
+            if coluna not in colunas:
+                self._db.execute(f"ALTER TABLE capturas_assets ADD COLUMN {coluna} TEXT")
+        self._db.commit()
+
+    def concluida(self, entrada: Path, saida: Path) -> bool:
+        """A entrada (inalterada) já foi convertida e o .md continua lá?"""
+        st = entrada.stat()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT tamanho, mtime_ns, estado, saida FROM entradas WHERE entrada = ?",
+                (str(entrada.resolve()),)).fetchone()
+        return bool(row and row[2] in ("convertido", "legendado")
+                    and (row[0], row[1]) == (st.st_size, st.st_mtime_ns)
+                    and row[3] == str(saida) and saida.exists())
+
+    def marcar(self, entrada: Path, estado: str, saida: Path | None = None, erro: str | None = None):
+        """Registra o estado da entrada; cada passagem por 'pendente' conta uma tentativa."""
+        assert estado in JOURNAL_STATES, estado
+        st = entrada.stat()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO entradas (entrada, tamanho, mtime_ns, estado, saida, erro, tentativas, atualizado)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(entrada) DO UPDATE SET tamanho = excluded.tamanho,"
+                " mtime_ns = excluded.mtime_ns, estado = excluded.estado,"
+                " saida = COALESCE(excluded.saida, entradas.saida), erro = excluded.erro,"
+                " tentativas = entradas.tentativas + excluded.tentativas, atualizado = excluded.atualizado",
+                (str(entrada.resolve()), st.st_size, st.st_mtime_ns, estado,
+                 str(saida) if saida else None, erro, 1 if estado == "pendente" else 0,
+                 datetime.now().isoformat(timespec="seconds")))
+
+    def marcar_legendados(self, saidas: list[str]):
+        """Descrições do lote (Batch API) mescladas nesses .md."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE entradas SET estado = 'legendado', atualizado = ? WHERE saida = ? AND estado = 'convertido'",
+                [(datetime.now().isoformat(timespec="seconds"), str(s)) for s in saidas])
+
+    def captura(self, slug: str) -> dict | None:
+        """Última captura do slug: dom_hash, opcoes e assets {url: {arquivo, sha256, descricao, etag, modificado}}."""
+        with self._lock:
+            row = self._db.execute("SELECT dom_hash, opcoes FROM capturas WHERE slug = ?", (slug,)).fetchone()
+            if not row:
+                return None
+            assets = {
+                url: {"arquivo": arquivo, "sha256": sha, "descricao": descricao, "etag": etag, "modificado": modificado}
+                for url, arquivo, sha, descricao, etag, modificado in self._db.execute(
+                    "SELECT url, arquivo, sha256, descricao, etag, modificado FROM capturas_assets WHERE slug = ?",
+                    (slug,))
+            }
+        return {"dom_hash": row[0], "opcoes": row[1], "assets": assets}
+
+    def gravar_captura(self, slug: str, url: str, dom_hash: str, opcoes: str, assets: dict):
+        """Troca o estado do slug pelo da captura atual (numa única transação)."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO capturas (slug, url, dom_hash, opcoes, capturado) VALUES (?, ?, ?, ?, ?)",
+                (slug, url, dom_hash, opcoes, datetime.now().isoformat(timespec="seconds")))
+            self._db.execute("DELETE FROM capturas_assets WHERE slug = ?", (slug,))
+            self._db.executemany(
+                "INSERT INTO capturas_assets (slug, url, arquivo, sha256, descricao, etag, modificado)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(slug, u, a["arquivo"], a["sha256"], a.get("descricao"), a.get("etag"), a.get("modificado"))
+                 for u, a in assets.items()])
+
+    def contagem(self) -> dict:
+        with self._lock:
+            return dict(self._db.execute("SELECT estado, COUNT(*) FROM entradas GROUP BY estado"))
+
+    def fechar(self):
+        with self._lock:
+            self._db.close()
+
+
+# ================ Índice de busca (SQLite FTS5) ==================
+
+def trechos_markdown(texto: str) -> list[tuple[str, int, int]]:
+    """
+    Divide o Markdown em trechos (título da seção, início, fim), com offsets em
+    caracteres do texto. Cada cabeçalho abre um trecho; seções longas são cortadas
+    em linhas em branco perto de INDEX_CHUNK_CHARS (ou à força, no dobro disso).
+    Cabeçalhos dentro de blocos de código não contam. Uma passada, tempo linear.
+    """
+    trechos = []
+    titulos: list[str] = []  # pilha de cabeçalhos: "Capítulo › Seção"
+    titulo_atual = ""
+    inicio = pos = 0
+    cerca = None
+
+    def fechar(fim: int):
+        nonlocal inicio
+        if texto[inicio:fim].strip():
+            trechos.append((titulo_atual, inicio, fim))
+        inicio = fim
+
+    for linha in texto.splitlines(keepends=True):
+        marca = linha.lstrip()[:3]
+        if cerca:
+            cerca = None if marca == cerca else cerca
+        elif marca in ("```", "~~~"):
+            cerca = marca
+        elif linha.startswith("#") and (m := MD_HEADING_RE.match(linha.rstrip("\r\n"))):
+            fechar(pos)
+            nivel = len(m.group(1))
+            titulos[nivel - 1:] = []
+            titulos += [""] * (nivel - 1 - len(titulos)) + [m.group(2)]
+            titulo_atual = " › ".join(t for t in titulos if t)
+        pos += len(linha)
+        tamanho = pos - inicio
+        if tamanho >= 2 * INDEX_CHUNK_CHARS or (tamanho >= INDEX_CHUNK_CHARS and not linha.strip() and not cerca):
+            fechar(pos)
+    fechar(pos)
+    return trechos
+
+
+class IndiceMarkdown:
+    """
+    Índice invertido (SQLite FTS5) dos .md gerados em output_dir, atualizado a cada
+    gravação: documentos (md relativo, origem = arquivo ou URL, hash) e trechos
+    (título da seção, texto, offsets). Reindexar um .md inalterado não faz nada;
+    alterado, troca só os trechos dele. `buscar()` responde com os trechos mais
+    relevantes (bm25, título com peso maior) e um recorte destacando os termos.
+    """
+
+    def __init__(self, pasta: Path):
+        self.pasta = pasta
+        self.caminho = pasta / INDEX_FILE_NAME
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.caminho), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS documentos ("
+                " id INTEGER PRIMARY KEY, md TEXT UNIQUE NOT NULL, origem TEXT, tipo TEXT,"
+                " sha256 TEXT, n_trechos INTEGER, atualizado TEXT)"
+            )
+            existe = self._db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'trechos'").fetchone()
+            if not existe:
+                # sem FTS5 compilado no SQLite, levanta sqlite3.OperationalError aqui
+                self._db.execute(
+                    "CREATE VIRTUAL TABLE trechos USING fts5("
+                    " titulo, texto, inicio UNINDEXED, fim UNINDEXED,"
+                    " tokenize = 'unicode61 remove_diacritics 2')"
+                )
+                self._db.execute("INSERT INTO trechos (trechos, rank) VALUES ('rank', 'bm25(3.0, 1.0)')")
+
+    def _relativo(self, md: Path) -> str:
+        try:
+            return Path(md).resolve().relative_to(self.pasta.resolve()).as_posix()
+        except ValueError:
+            return str(Path(md).resolve())
+
+    def indexar(self, md: Path, texto: str, origem: str | None = None, tipo: str | None = None) -> int:
+        """(Re)indexa um .md. Retorna quantos trechos foram gravados (0 se nada mudou)."""
+        rel = self._relativo(md)
+        sha = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT id, sha256 FROM documentos WHERE md = ?", (rel,)).fetchone()
+            if row and row[1] == sha:
+                if origem:
+                    self._db.execute("UPDATE documentos SET origem = ?, tipo = ? WHERE id = ?",
+                                     (origem, tipo, row[0]))
+                return 0
+            trechos = trechos_markdown(texto)[: 1 << INDEX_CHUNK_BITS]
+            agora = datetime.now().isoformat(timespec="seconds")
+            if row:
+                doc = row[0]
+                self._apagar_trechos(doc)
+                self._db.execute(
+                    "UPDATE documentos SET origem = COALESCE(?, origem), tipo = COALESCE(?, tipo),"
+                    " sha256 = ?, n_trechos = ?, atualizado = ? WHERE id = ?",
+                    (origem, tipo, sha, len(trechos), agora, doc))
+            else:
+                doc = self._db.execute(
+                    "INSERT INTO documentos (md, origem, tipo, sha256, n_trechos, atualizado) VALUES (?, ?, ?, ?, ?, ?)",
+                    (rel, origem, tipo, sha, len(trechos), agora)).lastrowid
+            self._db.executemany(
+                "INSERT INTO trechos (rowid, titulo, texto, inicio, fim) VALUES (?, ?, ?, ?, ?)",
+                [((doc << INDEX_CHUNK_BITS) | n, titulo, texto[ini:fim], ini, fim)
+                 for n, (titulo, ini, fim) in enumerate(trechos)])
+        return len(trechos)
+
+    def _apagar_trechos(self, doc: int):
+        # intervalo de rowid: apaga os trechos do documento sem varrer o índice
+        self._db.execute("DELETE FROM trechos WHERE rowid BETWEEN ? AND ?",
+                         (doc << INDEX_CHUNK_BITS, ((doc + 1) << INDEX_CHUNK_BITS) - 1))
+
+    def remover(self, md: Path):
+        with self._lock, self._db:
+            row = self._db.execute("SELECT id FROM documentos WHERE md = ?", (self._relativo(md),)).fetchone()
+            if row:
+                self._apagar_trechos(row[0])
+                self._db.execute("DELETE FROM documentos WHERE id = ?", (row[0],))
+
+    def reindexar_pasta(self, log=None) -> tuple[int, int]:
+        """
+        Indexa todos os .md da pasta (ex.: saídas anteriores ao índice) e tira do
+        índice os que não existem mais. Retorna (documentos atualizados, removidos).
+        """
+        log = log or print
+        atualizados = 0
+        for md in sorted(self.pasta.rglob("*.md")):
+            if self.indexar(md, md.read_text(encoding="utf-8", errors="replace")):
+                atualizados += 1
+        with self._lock:
+            todos = [r[0] for r in self._db.execute("SELECT md FROM documentos")]
+        sumidos = [rel for rel in todos if not (self.pasta / rel).exists()]
+        for rel in sumidos:
+            self.remover(self.pasta / rel)
+        log(f"• Índice: {atualizados} documento(s) atualizado(s), {len(sumidos)} removido(s).")
+        return atualizados, len(sumidos)
+
+    def buscar(self, consulta: str, limite: int = 20) -> list[dict]:
+        """
+        Trechos que casam com a consulta (sintaxe FTS5: termos, "frase", prefixo*,
+        OR/NOT, titulo:termo). Se a sintaxe for inválida, busca os termos literalmente.
+        """
+        sql = (
+            "SELECT d.md, d.origem, d.tipo, trechos.titulo, trechos.inicio, trechos.fim,"
+            " snippet(trechos, 1, '**', '**', '…', 16), trechos.rank"
+            " FROM trechos JOIN documentos d ON d.id = (trechos.rowid >> ?)"
+            " WHERE trechos MATCH ? ORDER BY trechos.rank LIMIT ?"
+        )
+        with self._lock:
+            try:
+                linhas = self._db.execute(sql, (INDEX_CHUNK_BITS, consulta, limite)).fetchall()
+            except sqlite3.OperationalError:
+                literal = " ".join('"' + t.replace('"', '""') + '"' for t in consulta.split())
+                if not literal:
+                    return []
+                linhas = self._db.execute(sql, (INDEX_CHUNK_BITS, literal, limite)).fetchall()
+        return [
+            {"md": md, "origem": origem, "tipo": tipo, "titulo": titulo, "inicio": ini, "fim": fim,
+             "trecho": trecho, "pontuacao": round(-rank, 4)}
+            for md, origem, tipo, titulo, ini, fim, trecho, rank in linhas
+        ]
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            docs, trechos = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(n_trechos), 0) FROM documentos").fetchone()
+        return {"documentos": docs, "trechos": trechos}
+
+    def fechar(self):
+        with self._lock:
+            self._db.close()
+
+
+# ================ Arquivos compactados (ZIP/TAR) =================
+
+def formato_compactado(caminho: Path) -> str | None:
+    """Extensão de compactado reconhecida ('.tar.gz', '.zip'…) ou None."""
+    nome = caminho.name.lower()
+    return next((ext for ext in ARCHIVE_FORMATS if nome.endswith(ext)), None)
+
+
+def membros_compactados(caminho: Path):
+    """
+    Gera (nome, tamanho, leitor) de cada arquivo dentro do ZIP/TAR, sem extrair nada.
+    O TAR é lido como stream (modo 'r|*', também comprimido): cada membro precisa ser
+    consumido antes de pedir o próximo. Links, diretórios e dispositivos são pulados.
+    """
+    if formato_compactado(caminho) == ".zip":
+        with zipfile.ZipFile(caminho) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                with zf.open(info) as leitor:
+                    yield info.filename, info.file_size, leitor
+        return
+    with tarfile.open(caminho, mode="r|*") as tf:
+        for info in tf:
+            if not info.isfile():
+                continue
+            leitor = tf.extractfile(info)
+            if leitor is not None:
+                with leitor:
+                    yield info.name, info.size, leitor
+
+
+def caminho_seguro_membro(nome: str) -> Path | None:
+    """Caminho relativo do membro para espelhar na saída; None se tentar sair da pasta (../, absoluto)."""
+    partes = [p for p in PurePosixPath(nome.replace("\\", "/")).parts if p not in ("/", ".")]
+    if not partes or ".." in partes or re.match(r"^[A-Za-z]:$", partes[0]):
+        return None
+    return Path(*(re.sub(r'[<>:"|?*\x00-\x1f]', "_", p) for p in partes))
+
+
+def copiar_limitado(leitor, destino: Path, limite: int = ARCHIVE_MAX_MEMBER_BYTES) -> int:
+    """Copia o stream em blocos; passa do limite (tamanho declarado falso, bomba) → ValueError."""
+    total = 0
+    with open(destino, "wb") as f:
+        while bloco := leitor.read(ARCHIVE_CHUNK_BYTES):
+            total += len(bloco)
+            if total > limite:
+                raise ValueError(f"membro maior que {limite // (1024 * 1024)} MB")
+            f.write(bloco)
+    return total
+
+
+# ================= Captura estática (sem navegador) ==============
+
+def motivo_para_navegador(html: str) -> str | None:
+    """
+    Heurística barata (só regex) para páginas que dependem de JavaScript.
+    Retorna o motivo para abrir o Firefox, ou None se o HTML servido já basta.
+    """
+    if DESAFIO_BOT_RE.search(html):
+        return "desafio anti-robô"
+    if SPA_ROOT_RE.search(html):
+        return "contêiner de SPA vazio"
+    texto = " ".join(TAG_RE.sub(" ", DOM_VOLATILE_RE.sub(" ", html)).split())
+    tem_script = re.search(r"<script\b", html, re.I) is not None
+    if tem_script and len(texto) < STATIC_MIN_TEXT_CHARS:
+        return f"pouco texto sem JS ({len(texto)} caracteres)"
+    if len(texto) < 4 * STATIC_MIN_TEXT_CHARS and any(
+            "javascript" in bloco.lower() and JS_AVISO_RE.search(TAG_RE.sub(" ", bloco))
+            for bloco in NOSCRIPT_RE.findall(html)):
+        return "aviso de <noscript> pedindo JavaScript"
+    preguicosas = sum(1 for tag in IMG_TAG_RE.findall(html)
+                      if re.search(r"\sdata-(?:src|lazy-src|original)=", tag, re.I)
+                      and not re.search(r"\ssrc=[\"'](?!data:)[^\"']", tag, re.I))
+    if preguicosas >= STATIC_LAZY_MIN_IMGS:
+        return f"{preguicosas} imagens carregadas por JS (lazy-load)"
+    return None
+
+
+def ler_lista_urls(caminho: Path) -> list[str]:
+    """URLs de um arquivo texto (uma por linha; linhas vazias e '#' ignoradas), sem repetir."""
+    urls = []
+    for linha in caminho.read_text(encoding="utf-8").splitlines():
+        linha = linha.strip()
+        if linha and not linha.startswith("#") and linha not in urls:
+            urls.append(linha)
+    return urls
+
+
+# ============== Metadados de assets (no streaming) ==============
+
+def sniff_mime(cabeca: bytes) -> str | None:
+    """MIME real pelos primeiros bytes (assinaturas dos formatos de imagem)."""
+    if cabeca.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if cabeca.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if cabeca[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if cabeca[:4] == b"RIFF" and cabeca[8:12] == b"WEBP":
+        return "image/webp"
+    if cabeca[:2] == b"BM":
+        return "image/bmp"
+    if cabeca[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    inicio = cabeca[:2048].lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if inicio.startswith(b"<svg") or (inicio.startswith(b"<?xml") and b"<svg" in inicio):
+        return "image/svg+xml"
+    return None
+
+
+def dimensoes_imagem(cabeca: bytes, mime: str | None) -> tuple[int, int] | None:
+    """(largura, altura) lidas do cabeçalho da imagem, sem decodificá-la; None se não der."""
+    try:
+        if mime == "image/png" and cabeca[12:16] == b"IHDR":
+            return struct.unpack(">II", cabeca[16:24])
+        if mime == "image/gif":
+            return struct.unpack("<HH", cabeca[6:10])
+        if mime == "image/bmp":
+            w, h = struct.unpack("<ii", cabeca[18:26])
+            return abs(w), abs(h)
+        if mime == "image/webp":
+            tipo = cabeca[12:16]
+            if tipo == b"VP8 ":
+                w, h = struct.unpack("<HH", cabeca[26:30])
+                return w & 0x3FFF, h & 0x3FFF
+            if tipo == b"VP8L":
+                b = int.from_bytes(cabeca[21:25], "little")
+                return (b & 0x3FFF) + 1, ((b >> 14) & 0x3FFF) + 1
+            if tipo == b"VP8X":
+                return int.from_bytes(cabeca[24:27], "little") + 1, int.from_bytes(cabeca[27:30], "little") + 1
+        if mime == "image/jpeg":
+            # percorre os segmentos até o SOF (Start Of Frame)
+            i = 2
+            while i + 9 < len(cabeca) and cabeca[i] == 0xFF:
+                marcador = cabeca[i + 1]
+                if 0xC0 <= marcador <= 0xCF and marcador not in (0xC4, 0xC8, 0xCC):
+                    h, w = struct.unpack(">HH", cabeca[i + 5:i + 9])
+                    return w, h
+                i += 2 + struct.unpack(">H", cabeca[i + 2:i + 4])[0]
+    except struct.error:
+        pass
+    return None
+
+
+def pequena_demais(meta: dict | None) -> bool:
+    """Ícones, pixels de rastreamento e espaçadores: não vale a pena descrever."""
+    dims = (meta or {}).get("dimensoes")
+    return bool(dims) and min(dims) < MIN_CAPTION_PX
+
+
+# ========= Resolução de recursos (srcset / sizes / url()) ========
+
+def parse_srcset(valor: str) -> list[tuple[str, float, str]]:
+    """
+    Candidatos de um srcset: (url, valor, 'w' | 'x'); sem descritor vale 1x.
+    Segue o algoritmo do HTML: a URL vai até o espaço (vírgulas dentro dela são válidas).
+    """
+    cands, i, n = [], 0, len(valor)
+    while i < n:
+        while i < n and (valor[i].isspace() or valor[i] == ","):
+            i += 1
+        j = i
+        while j < n and not valor[j].isspace():
+            j += 1
+        url, i, desc = valor[i:j], j, ""
+        if url.endswith(","):
+            url = url.rstrip(",")
+        else:
+            k = valor.find(",", i)
+            k = n if k < 0 else k
+            desc, i = valor[i:k].strip(), k + 1
+        if not url:
+            continue
+        m = re.fullmatch(r"(\d+(?:\.\d+)?)([wx])", desc.split()[0].lower()) if desc else None
+        if m:
+            cands.append((url, float(m.group(1)), m.group(2)))
+        elif not desc:
+            cands.append((url, 1.0, "x"))
+    return cands
+
+
+def media_casa(media: str, largura: int = VIEWPORT_WIDTH) -> bool:
+    """Avalia media queries simples de largura; o que não sabemos avaliar não casa."""
+    media = media.strip().lower()
+    if media in ("", "all", "screen"):
+        return True
+    conds = MEDIA_WIDTH_RE.findall(media)
+    resto = re.sub(r"\b(and|only|screen|all)\b", "", MEDIA_WIDTH_RE.sub("", media)).strip()
+    if not conds or resto:
+        return False
+    for tipo, valor, unidade in conds:
+        px = float(valor) * (16 if unidade.endswith("em") else 1)
+        if (tipo == "min" and largura < px) or (tipo == "max" and largura > px):
+            return False
+    return True
+
+
+def _dividir_virgulas(texto: str) -> list[str]:
+    """Divide por vírgulas fora de parênteses (min(), calc()…)."""
+    partes, nivel, atual = [], 0, []
+    for c in texto:
+        if c == "," and nivel == 0:
+            partes.append("".join(atual))
+            atual = []
+            continue
+        nivel += (c == "(") - (c == ")")
+        atual.append(c)
+    partes.append("".join(atual))
+    return [p.strip() for p in partes if p.strip()]
+
+
+def largura_de_sizes(sizes: str, viewport: int = VIEWPORT_WIDTH) -> float | None:
+    """Largura (px) do slot pelo atributo `sizes`; calc()/auto e afins viram o viewport."""
+    for entrada in _dividir_virgulas(sizes or ""):
+        if entrada.endswith(")") and re.search(r"(calc|min|max|clamp)\(", entrada):
+            pos = re.search(r"(calc|min|max|clamp)\(", entrada).start()
+            cond, comp = entrada[:pos].strip(), None
+        else:
+            partes = entrada.rsplit(None, 1)
+            cond, comp = (partes[0], partes[1]) if len(partes) == 2 else ("", partes[0])
+        if cond and not media_casa(cond, viewport):
+            continue
+        m = re.fullmatch(r"([\d.]+)(px|vw|r?em)", (comp or "").lower())
+        if not m:
+            return float(viewport)
+        v, unidade = float(m.group(1)), m.group(2)
+        return v * viewport / 100 if unidade == "vw" else v * (16 if unidade.endswith("em") else 1)
+    return None
+
+
+def escolher_candidato(cands: list[tuple[str, float, str]], largura_alvo: float) -> str | None:
+    """Menor candidato que atinge a largura alvo (ou 1x); sem nenhum, o maior disponível."""
+    ws = sorted((v, u) for u, v, t in cands if t == "w")
+    if ws:
+        return next((u for v, u in ws if v >= largura_alvo), ws[-1][1])
+    xs = sorted((v, u) for u, v, t in cands if t == "x")
+    if xs:
+        return next((u for v, u in xs if v >= 1), xs[-1][1])
+    return None
+
+
+def _url_css(m: re.Match) -> str:
+    return next(g for g in m.groups() if g is not None).strip()
+
+
+def urls_css(texto: str, base_url: str) -> list[str]:
+    """URLs absolutas de url(...) e @import de um CSS (sem data:, âncoras e fontes), em ordem."""
+    urls = []
+    for m in itertools.chain(CSS_URL_RE.finditer(texto), CSS_IMPORT_RE.finditer(texto)):
+        val = _url_css(m)
+        if not val or val.startswith(("data:", "#")):
+            continue
+        absoluta = urljoin(base_url, val)
+        if Path(urlparse(absoluta).path).suffix.lower() in FONT_EXTS:
+            continue
+        if absoluta not in urls:
+            urls.append(absoluta)
+    return urls
+
+
+def reescrever_urls_css(texto: str, base_url: str, local_para) -> str:
+    """Troca cada url(...) cujo destino `local_para(url_absoluta)` conhece pelo caminho local."""
+    def _sub(m):
+        val = _url_css(m)
+        if not val or val.startswith(("data:", "#")):
+            return m.group(0)
+        local = local_para(urljoin(base_url, val))
+        return f'url("{local}")' if local else m.group(0)
+
+    def _sub_import(m):
+        local = local_para(urljoin(base_url, _url_css(m)))
+        return f'@import "{local}"' if local else m.group(0)
+
+    return CSS_IMPORT_RE.sub(_sub_import, CSS_URL_RE.sub(_sub, texto))
+
+
+def imagens_de_fundo(html: str, base_url: str) -> set:
+    """url() em atributos style e blocos <style> do HTML (imagens de fundo, banners…)."""
+    urls = set()
+    for m in STYLE_ATTR_RE.finditer(html):
+        urls.update(urls_css(html_lib.unescape(m.group(1) or m.group(2) or ""), base_url))
+    for m in STYLE_BLOCK_RE.finditer(html):
+        urls.update(u for u in urls_css(m.group(1), base_url)
+                    if not u.lower().split("?")[0].endswith(".css"))  # @import fica p/ o arquivamento
+    return urls
+
+
+# ========== Pós-processamento do Markdown (modo compacto) ========
+
+def limpar_url_rastreamento(url: str) -> str:
+    """
+    Remove parâmetros de rastreamento (utm_*, fbclid, gclid…) da query string.
+    Os demais pares ficam como estavam no texto original (sem recodificar %20, + etc.).
+    """
+    sem_fragmento, cerquilha, fragmento = url.partition("#")
+    base, interrogacao, query = sem_fragmento.partition("?")
+    if not interrogacao:
+        return url
+    pares = query.split("&")
+    limpos = [p for p in pares if not _param_rastreamento(unquote_plus(p.partition("=")[0]).lower())]
+    if len(limpos) == len(pares):
+        return url
+    return base + ("?" + "&".join(limpos) if limpos else "") + cerquilha + fragmento
+
+
+def _param_rastreamento(chave: str) -> bool:
+    return chave in TRACKING_PARAMS or chave.startswith(TRACKING_PREFIXES)
+
+
+def trechos_codigo(texto: str) -> list[tuple[int, int]]:
+    """
+    Intervalos (início, fim) dos code spans da linha (`x`, ``a ` b``): uma sequência de
+    crases fecha na próxima de mesmo tamanho; sem par, as crases são literais.
+    Linear: cada tamanho de sequência tem um ponteiro que só avança.
+    """
+    seqs = [m.span() for m in MD_CODE_TICKS_RE.finditer(texto)]
+    por_tamanho: dict[int, list[int]] = {}
+    for i, (a, b) in enumerate(seqs):
+        por_tamanho.setdefault(b - a, []).append(i)
+    ponteiros = dict.fromkeys(por_tamanho, 0)
+    trechos = []
+    i = 0
+    while i < len(seqs):
+        n = seqs[i][1] - seqs[i][0]
+        candidatos, k = por_tamanho[n], ponteiros[n]
+        while k < len(candidatos) and candidatos[k] <= i:
+            k += 1
+        ponteiros[n] = k
+        if k == len(candidatos):
+            i += 1
+            continue
+        j = candidatos[k]
+        trechos.append((seqs[i][0], seqs[j][1]))
+        i = j + 1
+    return trechos
+
+
+_tokenizador = None
+
+
+def contar_tokens(texto: str) -> int:
+    """Tokens pelo tiktoken (o200k_base), se instalado; senão a estimativa de ~4 caracteres por token."""
+    global _tokenizador
+    if _tokenizador is None:
+        try:
+            import tiktoken
+            _tokenizador = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _tokenizador = False
+    if _tokenizador:
+        return len(_tokenizador.encode(texto, disallowed_special=()))
+    return math.ceil(len(texto) / 4)
+
+
+class PosProcessadorMarkdown:
+    """
+    Limpeza do Markdown gerado, linha a linha (tempo linear no tamanho do texto):
+      'basico'   — espaços e linhas em branco normalizados, data URIs e parâmetros
+                   de rastreamento removidos;
+      'compacto' — também remove links vazios/javascript:, títulos de links e
+                   compacta tabelas (colunas e linhas vazias, preenchimento; tabela
+                   de uma coluna só vira texto).
+    Blocos de código cercados (``` ou ~~~) ou indentados, `code spans` e a quebra
+    forçada (dois espaços no fim da linha) passam intactos.
+    """
+
+    def __init__(self, modo: str = "basico"):
+        self.modo = modo
+        self.compacto = modo == "compacto"
+
+    def processar(self, texto: str) -> str:
+        if self.modo == "nenhum":
+            return texto
+        saida: list[str] = []
+        tabela: list[str] = []
+        cerca = None  # delimitador do bloco de código aberto
+
+        def emitir(linha: str):
+            if linha or (saida and saida[-1]):  # no máximo uma linha em branco seguida
+                saida.append(linha)
+
+        for bruta in texto.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+            sem_recuo = bruta.lstrip()
+            marca = sem_recuo[:3]
+            if cerca:
+                saida.append(bruta)
+                if marca == cerca:
+                    cerca = None
+                continue
+            if marca in ("```", "~~~"):
+                for linha in self._tabela(tabela):
+                    emitir(linha)
+                tabela = []
+                cerca = marca
+                saida.append(bruta.rstrip())
+                continue
+            if self.compacto and sem_recuo[:1] == "|":
+                tabela.append(bruta)
+                continue
+            if tabela:
+                for linha in self._tabela(tabela):
+                    emitir(linha)
+                tabela = []
+            emitir(self._linha(bruta))
+        for linha in self._tabela(tabela):
+            emitir(linha)
+
+        while saida and not saida[-1]:
+            saida.pop()
+        return "\n".join(saida) + "\n" if saida else ""
+
+    def _linha(self, linha: str) -> str:
+        if not linha or linha.isspace():
+            return ""
+        if linha[0] in " \t":
+            corpo = linha.lstrip(" ")
+            recuo = linha[:len(linha) - len(corpo)]  # recuo de listas aninhadas é preservado
+            if (len(recuo) >= 4 or corpo[0] == "\t") and not MD_LIST_ITEM_RE.match(corpo.lstrip()):
+                return linha  # bloco de código indentado: passa intacto
+        else:
+            corpo, recuo = linha, ""
+        if not corpo.isascii():
+            corpo = corpo.translate(INVISIBLE_CHARS)
+        quebra = "  " if corpo.endswith("  ") and corpo[0] != "#" else ""  # quebra forçada
+        if "`" not in corpo:
+            # caso comum, sem code spans: nada a proteger
+            if "](" in corpo:
+                corpo = MD_LINK_RE.sub(self._link, corpo)
+            corpo = " ".join(corpo.split())
+            return recuo + corpo + quebra if corpo else ""
+        codigo = trechos_codigo(corpo)
+        if "](" in corpo:
+            inicios = [a for a, _ in codigo]
+
+            def link(m: re.Match) -> str:
+                k = bisect.bisect_right(inicios, m.start()) - 1
+                if k >= 0 and m.start() < codigo[k][1]:
+                    return m.group(0)  # dentro de `código`: não é link
+                return self._link(m)
+            novo = MD_LINK_RE.sub(link, corpo)
+            if novo != corpo:  # um link mudou: as posições dos code spans também
+                corpo, codigo = novo, trechos_codigo(novo)
+        # espaços colapsados só fora dos code spans
+        partes, pos = [], 0
+        for a, b in codigo:
+            partes += [ESPACOS_RE.sub(" ", corpo[pos:a]), corpo[a:b]]
+            pos = b
+        partes.append(ESPACOS_RE.sub(" ", corpo[pos:]))
+        corpo = "".join(partes).strip()
+        return recuo + corpo + quebra if corpo else ""
+
+    def _link(self, m: re.Match) -> str:
+        imagem, texto, url, titulo = m.group(1), m.group(2), m.group(3), m.group(4) or ""
+        if url.startswith("data:"):
+            return texto.strip()  # a imagem embutida some; o texto alternativo fica
+        url = limpar_url_rastreamento(url)
+        if self.compacto:
+            if not texto.strip() and not imagem:
+                return ""
+            if not imagem and (not url or url == "#" or url.startswith("javascript:")):
+                return texto
+            titulo = ""
+        return f"{imagem}[{texto}]({url}{titulo})"
+
+    def _celula(self, celula: str) -> str:
+        """Célula de tabela: só passa pela limpeza completa se tiver link, código ou caractere invisível."""
+        if celula.isascii() and "`" not in celula and "](" not in celula:
+            return " ".join(celula.split())
+        return self._linha(celula.strip())
+
+    def _tabela(self, linhas: list[str]) -> list[str]:
+        """Tabela GFM compactada; se não for uma tabela válida, só limpa as linhas."""
+        if not linhas:
+            return []
+        celulas = []
+        for linha in linhas:
+            partes = TABLE_PIPE_RE.split(linha.strip())
+            if partes and not partes[0].strip():
+                partes = partes[1:]
+            if partes and not partes[-1].strip():
+                partes = partes[:-1]
+            celulas.append(partes)
+        if len(celulas) < 2 or not all(TABLE_SEP_CELL_RE.fullmatch(c) for c in celulas[1]) or not celulas[1]:
+            return [self._linha(l) for l in linhas]
+
+        ncol = max(len(r) for r in celulas)
+        alinhamentos = [TABLE_SEP_CELL_RE.fullmatch(c).groups() for c in celulas[1]]
+        alinhamentos += [("", "")] * (ncol - len(alinhamentos))
+        linhas_dados = [[self._celula(c) for c in r] + [""] * (ncol - len(r))
+                        for i, r in enumerate(celulas) if i != 1]
+        manter = [c for c in range(ncol) if any(r[c] for r in linhas_dados)]
+        if not manter:
+            return []
+        cabecalho, corpo = linhas_dados[0], [r for r in linhas_dados[1:] if any(r[c] for c in manter)]
+        if len(manter) == 1:
+            # tabela de layout com uma coluna só: vira texto, um parágrafo por linha
+            # (sem a linha em branco, o Markdown juntaria tudo num parágrafo só)
+            c = manter[0]
+            paragrafos = [r[c] for r in [cabecalho] + corpo if r[c]]
+            return [linha for p in paragrafos for linha in ("", p)] + [""]
+        sep = [f"{a or '-'}-{b or '-'}" for a, b in (alinhamentos[c] for c in manter)]
+        return ["|" + "|".join(r[c] for c in manter) + "|" for r in [cabecalho]] + \
+               ["|" + "|".join(sep) + "|"] + \
+               ["|" + "|".join(r[c] for c in manter) + "|" for r in corpo]
+
+
+# =================== Jobs em segundo plano ======================
+
+class JobCancelado(Exception):
+    """Levantada dentro de um job quando o cancelamento foi pedido."""
+
+
+class Job:
+    """
+    Unidade de trabalho executada por um GerenciadorJobs.
+    O pipeline chama `checar()` entre etapas (cancelamento cooperativo) e
+    `progresso()` para alimentar a barra de progresso da UI.
+    Sem fila de eventos (uso direto, fora da UI) o progresso é ignorado.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, titulo: str, fn=None, args=(), eventos: queue.Queue | None = None):
+        self.id = next(Job._ids)
+        self.titulo = titulo
+        self.fn = fn
+        self.args = args
+        self.ao_concluir = None  # callback (na thread da UI) com o resultado
+        self._eventos = eventos
+        self._cancel = threading.Event()
+
+    def emitir(self, tipo: str, dado=None):
+        if self._eventos is not None:
+            self._eventos.put((tipo, self, dado))
+
+    def cancelar(self):
+        self._cancel.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._cancel.is_set()
+
+    def checar(self):
+        if self._cancel.is_set():
+            raise JobCancelado(self.titulo)
+
+    def progresso(self, atual: int, total: int, texto: str = ""):
+        self.emitir("progresso", (atual, total, texto))
+
+
+class GerenciadorJobs:
+    """
+    Fila de jobs atendida por `workers` threads em segundo plano.
+    Nada aqui toca no Tk: todo retorno vai pela fila `eventos` como
+    (tipo, job, dado), com tipo em "estado" | "progresso" | "fim" | "erro" | "cancelado".
+    """
+
+    def __init__(self, eventos: queue.Queue, workers: int = JOB_WORKERS):
+        self.eventos = eventos
+        self.jobs: dict[int, Job] = {}
+        self._fila = queue.Queue()
+        self._threads = []
+        for n in range(max(1, workers)):
+            t = threading.Thread(target=self._loop, name=f"job-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submeter(self, titulo: str, fn, *args) -> Job:
+        """Enfileira `fn(*args, job=job)` e devolve o Job."""
+        job = Job(titulo, fn, args, eventos=self.eventos)
+        self.jobs[job.id] = job
+        self._fila.put(job)
+        job.emitir("estado", "na fila")
+        return job
+
+    def cancelar(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job:
+            job.cancelar()
+
+    def cancelar_todos(self):
+        for job in list(self.jobs.values()):
+            job.cancelar()
+
+    def encerrar(self):
+        self.cancelar_todos()
+        for _ in self._threads:
+            self._fila.put(None)
+
+    def _loop(self):
+        while True:
+            job = self._fila.get()
+            if job is None:
+                return
+            try:
+                job.checar()
+                job.emitir("estado", "executando")
+                resultado = job.fn(*job.args, job=job)
+            except JobCancelado:
+                job.emitir("cancelado")
+            except Exception as e:
+                job.emitir("erro", e)
+            else:
+                job.emitir("fim", resultado)
+            finally:
+                self.jobs.pop(job.id, None)
+
+
+# ================ Métricas / relatório de execução ==============
+
+_metricas_lock = threading.Lock()  # vários jobs podem gravar no mesmo metricas.jsonl
+
+
+def _percentil(valores: list, p: float) -> float:
+    """Percentil por posição mais próxima (p em 0–100); 0.0 para lista vazia."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[k]
+
+
+class RegistroExecucao:
+    """
+    Métricas de uma execução (uma captura ou um lote de arquivos):
+    spans de tempo por etapa, contadores (bytes, assets…) e latências de API.
+    Thread-safe; ao final vira JSON lines e/ou arquivo Prometheus (textfile) e
+    um resumo legível no log.
+    """
+
+    def __init__(self, tipo: str, alvo: str):
+        self.tipo = tipo
+        self.alvo = alvo
+        self.id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{tipo}"
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: list[dict] = []
+        self.contadores: Counter = Counter()
+        self.latencias: dict[str, list[float]] = defaultdict(list)
+        self.status = "executando"
+        self.recursos: dict | None = None  # estado do governador de recursos ao final
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def etapa(self, nome: str, **attrs):
+        """`with registro.etapa("driver.get"):` mede a duração da etapa (mesmo se falhar)."""
+        t0 = time.perf_counter()
+        erro = None
+        try:
+            yield
+        except BaseException as e:
+            erro = type(e).__name__
+            raise
+        finally:
+            span = {"etapa": nome, "inicio_ms": round(1000 * (t0 - self._t0), 1),
+                    "ms": round(1000 * (time.perf_counter() - t0), 1)}
+            if attrs:
+                span["attrs"] = attrs
+            if erro:
+                span["erro"] = erro
+            with self._lock:
+                self.spans.append(span)
+
+    def contar(self, nome: str, n: int = 1):
+        with self._lock:
+            self.contadores[nome] += n
+
+    def latencia(self, api: str, segundos: float):
+        with self._lock:
+            self.latencias[api].append(segundos)
+
+    def _por_etapa(self) -> dict:
+        totais = defaultdict(float)
+        for sp in self.spans:
+            totais[sp["etapa"]] += sp["ms"]
+        return dict(sorted(totais.items(), key=lambda kv: -kv[1]))
+
+    def resumo(self) -> dict:
+        with self._lock:
+            return {
+                "run": self.id,
+                "tipo": self.tipo,
+                "alvo": self.alvo,
+                "host": socket.gethostname(),
+                "inicio": datetime.fromtimestamp(self.inicio).isoformat(timespec="seconds"),
+                "status": self.status,
+                "total_ms": round(1000 * (time.perf_counter() - self._t0), 1),
+                "etapas_ms": {k: round(v, 1) for k, v in self._por_etapa().items()},
+                "contadores": dict(self.contadores),
+                "apis": {
+                    api: {"chamadas": len(v),
+                          "p50_ms": round(1000 * _percentil(v, 50), 1),
+                          "p95_ms": round(1000 * _percentil(v, 95), 1),
+                          "max_ms": round(1000 * max(v), 1)}
+                    for api, v in self.latencias.items()
+                },
+                **({"recursos": self.recursos} if self.recursos else {}),
+            }
+
+    def relatorio(self, resumo: dict | None = None) -> str:
+        """Resumo legível: tempo total, etapas mais lentas, contadores e APIs."""
+        r = resumo or self.resumo()
+        total = r["total_ms"] or 1.0
+        linhas = [f"Relatório {r['tipo']} {r['alvo']} — {r['status']}, {total / 1000:.1f} s"]
+        for etapa, ms in r["etapas_ms"].items():
+            linhas.append(f"   {etapa:<34} {ms / 1000:8.2f} s  {100 * ms / total:5.1f}%")
+        if r["contadores"]:
+            linhas.append("   " + ", ".join(f"{k}={v}" for k, v in sorted(r["contadores"].items())))
+        for api, st in r["apis"].items():
+            linhas.append(f"   API {api}: {st['chamadas']} chamada(s), p50 {st['p50_ms']:.0f} ms, "
+                          f"p95 {st['p95_ms']:.0f} ms")
+        rec = r.get("recursos")
+        if rec:
+            cotas = ", ".join(f"{nome} {c['limite']}/{c['maximo']} (pico {c['pico']}, esperas {c['esperas']})"
+                              for nome, c in rec["cotas"].items() if nome != "bytes_download")
+            b = rec["cotas"]["bytes_download"]
+            linhas.append(f"   Recursos: RSS {rec['rss_mb'] or 0:.0f} MB (pico {rec['rss_pico_mb']:.0f}"
+                          + (f" / limite {rec['limite_rss_mb']:.0f}" if rec["limite_rss_mb"] else "")
+                          + f" MB); {cotas}; downloads {b['limite'] // (1024 * 1024)}/"
+                            f"{b['maximo'] // (1024 * 1024)} MB em voo")
+            for ajuste in rec["ajustes"][-3:]:
+                linhas.append(f"   ajuste: {ajuste}")
+        return "\n".join(linhas)
+
+    def gravar(self, pasta: Path, formato: str = "jsonl", resumo: dict | None = None):
+        """Grava os spans + resumo (JSON lines) e/ou o arquivo Prometheus deste alvo."""
+        if formato == "nenhum":
+            return
+        r = resumo or self.resumo()
+        pasta.mkdir(parents=True, exist_ok=True)
+        if formato in ("jsonl", "ambos"):
+            with self._lock:
+                linhas = [json.dumps({"registro": "span", "run": self.id, **sp}, ensure_ascii=False)
+                          for sp in self.spans]
+            linhas.append(json.dumps({"registro": "resumo", **r}, ensure_ascii=False))
+            with _metricas_lock, open(pasta / "metricas.jsonl", "a", encoding="utf-8") as f:
+                f.write("\n".join(linhas) + "\n")
+        if formato in ("prometheus", "ambos"):
+            prom = pasta / "prom"
+            prom.mkdir(exist_ok=True)
+            nome = re.sub(r"[^a-zA-Z0-9_-]+", "_", f"{self.tipo}_{self.alvo}")[:120]
+            # o textfile collector nunca lê um arquivo pela metade
+            gravar_atomico(prom / f"{nome}.prom", self._prometheus(r))
+
+    def _prometheus(self, r: dict) -> str:
+        def esc(v):
+            return str(v).replace("\\", "\\\\").replace('"', '\\"')
+
+        base = f'tipo="{esc(r["tipo"])}",alvo="{esc(r["alvo"])}"'
+        out = [
+            "# HELP mdtollm_execucao_segundos Duração total da última execução.",
+            "# TYPE mdtollm_execucao_segundos gauge",
+            f'mdtollm_execucao_segundos{{{base},status="{esc(r["status"])}"}} {r["total_ms"] / 1000:.3f}',
+            "# HELP mdtollm_etapa_segundos Tempo gasto por etapa na última execução.",
+            "# TYPE mdtollm_etapa_segundos gauge",
+        ]
+        for etapa, ms in r["etapas_ms"].items():
+            out.append(f'mdtollm_etapa_segundos{{{base},etapa="{esc(etapa)}"}} {ms / 1000:.3f}')
+        out += ["# HELP mdtollm_contador Contadores da última execução (bytes, assets, imagens…).",
+                "# TYPE mdtollm_contador gauge"]
+        for k, v in sorted(r["contadores"].items()):
+            out.append(f'mdtollm_contador{{{base},nome="{esc(k)}"}} {v}')
+        out += ["# HELP mdtollm_api_latencia_segundos Latência das chamadas de API na última execução.",
+                "# TYPE mdtollm_api_latencia_segundos gauge"]
+        for api, st in r["apis"].items():
+            for q in ("p50", "p95", "max"):
+                out.append(f'mdtollm_api_latencia_segundos{{{base},api="{esc(api)}",quantil="{q}"}} '
+                           f'{st[q + "_ms"] / 1000:.3f}')
+        rec = r.get("recursos")
+        if rec:
+            out += ["# HELP mdtollm_recurso_limite Limite atual de cada cota do governador de recursos.",
+                    "# TYPE mdtollm_recurso_limite gauge"]
+            for nome, c in rec["cotas"].items():
+                out.append(f'mdtollm_recurso_limite{{{base},cota="{nome}"}} {c["limite"]}')
+            if rec["rss_pico_mb"]:
+                out += ["# HELP mdtollm_rss_pico_mb Pico de memória residente do processo (MB).",
+                        "# TYPE mdtollm_rss_pico_mb gauge",
+                        f"mdtollm_rss_pico_mb{{{base}}} {rec['rss_pico_mb']}"]
+        out.append(f"mdtollm_execucao_timestamp_segundos{{{base}}} {self.inicio:.0f}")
+        return "\n".join(out) + "\n"
+
+
+# ================== Governador de recursos ======================
+
+def rss_atual_mb() -> float | None:
+    """Memória residente atual deste processo, em MB (None se não der para medir)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def ram_total_mb() -> float | None:
+    try:
+        import psutil
+        return psutil.virtual_memory().total / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _Cota:
+    """
+    Semáforo com limite ajustável em tempo de execução (entre `minimo` e `maximo`).
+    `adquirir(n)` reserva n unidades (1 conversão, N bytes…); um pedido maior que o
+    limite inteiro passa quando nada mais estiver em uso, para não travar para sempre.
+    """
+
+    def __init__(self, maximo: int, minimo: int = 1):
+        self.maximo = self.limite = max(minimo, maximo)
+        self.minimo = minimo
+        self.em_uso = 0
+        self.pico = 0
+        self.esperas = 0
+        self._cond = threading.Condition()
+
+    def adquirir(self, n: int = 1, job: Job | None = None):
+        with self._cond:
+            esperou = False
+            while self.em_uso and self.em_uso + n > self.limite:
+                esperou = True
+                self._cond.wait(0.5)
+                if job:
+                    job.checar()  # cancelamento também enquanto espera a vez
+            self.esperas += esperou
+            self.em_uso += n
+            self.pico = max(self.pico, self.em_uso)
+
+    def liberar(self, n: int = 1):
+        with self._cond:
+            self.em_uso -= n
+            self._cond.notify_all()
+
+    def ajustar(self, limite: int):
+        with self._cond:
+            self.limite = min(self.maximo, max(self.minimo, int(limite)))
+            self._cond.notify_all()
+
+    def redefinir(self, maximo: int):
+        with self._cond:
+            self.maximo = self.limite = max(self.minimo, maximo)
+            self._cond.notify_all()
+
+
+class GovernadorRecursos:
+    """
+    Limites de recursos do pipeline, compartilhados por todos os jobs do processo:
+      conversoes      conversões do MarkItDown simultâneas
+      bytes_download  bytes de assets sendo baixados ao mesmo tempo (Content-Length,
+                      ou MAX_ASSET_BYTES quando o servidor não informa)
+      chamadas_api    chamadas de legendagem simultâneas
+    Os limites se adaptam (AIMD): com o RSS acima de 90% do limite, caem pela metade;
+    abaixo de 70%, voltam a subir aos poucos até o máximo configurado. A média móvel da
+    latência das chamadas de API faz o mesmo com `chamadas_api`. `estado()` vai para o
+    relatório de cada execução.
+    """
+
+    def __init__(self, conversoes: int = GOV_MAX_CONVERSOES, bytes_em_voo: int = GOV_MAX_BYTES_EM_VOO,
+                 chamadas_api: int = GOV_MAX_CHAMADAS_API, limite_rss_mb: float = 0):
+        self.cotas = {
+            "conversoes": _Cota(conversoes),
+            "bytes_download": _Cota(bytes_em_voo, minimo=MAX_ASSET_BYTES),
+            "chamadas_api": _Cota(chamadas_api),
+        }
+        self.limite_rss_mb = limite_rss_mb or self._limite_padrao()
+        self.latencia_alvo_s = GOV_LATENCIA_ALVO_S
+        self.latencia_media_s: float | None = None
+        self.rss_pico_mb = 0.0
+        self.reducoes = 0
+        self.ajustes: deque = deque(maxlen=10)  # últimas mudanças de limite, para o relatório
+        self._ultimo_ajuste = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _limite_padrao() -> float:
+        total = ram_total_mb()
+        return round(total * GOV_FRACAO_RAM) if total else 0
+
+    def configurar(self, conversoes: int, bytes_em_voo: int, chamadas_api: int, limite_rss_mb: float = 0):
+        """Aplica os máximos da configuração (mudam só se forem diferentes dos atuais)."""
+        for nome, maximo in (("conversoes", conversoes), ("bytes_download", bytes_em_voo),
+                             ("chamadas_api", chamadas_api)):
+            if self.cotas[nome].maximo != maximo:
+                self.cotas[nome].redefinir(maximo)
+        self.limite_rss_mb = limite_rss_mb or self._limite_padrao()
+
+    @contextmanager
+    def reservar(self, recurso: str, n: int = 1, job: Job | None = None):
+        """`with governador.reservar("conversoes"):` espera a vez e libera ao sair."""
+        self._ajustar()
+        cota = self.cotas[recurso]
+        cota.adquirir(n, job)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            cota.liberar(n)
+            if recurso == "chamadas_api":
+                self._registrar_latencia(time.perf_counter() - t0)
+            self._ajustar()
+
+    def _registrar_latencia(self, segundos: float):
+        with self._lock:
+            media = self.latencia_media_s
+            self.latencia_media_s = segundos if media is None else 0.8 * media + 0.2 * segundos
+
+    def _mudar(self, nome: str, novo: int, motivo: str):
+        cota = self.cotas[nome]
+        antes = cota.limite
+        cota.ajustar(novo)
+        if cota.limite != antes:
+            fmt = (lambda v: f"{v // (1024 * 1024)} MB") if nome == "bytes_download" else str
+            self.ajustes.append(f"{datetime.now():%H:%M:%S} {nome} {fmt(antes)}→{fmt(cota.limite)} ({motivo})")
+
+    def _ajustar(self):
+        """Reavalia os limites (no máximo a cada GOV_INTERVALO_AJUSTE_S)."""
+        agora = time.monotonic()
+        if agora - self._ultimo_ajuste < GOV_INTERVALO_AJUSTE_S or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._ultimo_ajuste = agora
+            rss = rss_atual_mb()
+            if rss:
+                self.rss_pico_mb = max(self.rss_pico_mb, rss)
+            if rss and self.limite_rss_mb:
+                motivo = f"RSS {rss:.0f} MB de {self.limite_rss_mb:.0f} MB"
+                if rss > 0.9 * self.limite_rss_mb:
+                    self.reducoes += 1
+                    for nome, cota in self.cotas.items():
+                        self._mudar(nome, cota.limite // 2, motivo)
+                elif rss < 0.7 * self.limite_rss_mb:
+                    for nome, cota in self.cotas.items():
+                        if nome != "chamadas_api":
+                            passo = 1 if nome == "conversoes" else cota.maximo // 8
+                            self._mudar(nome, cota.limite + passo, motivo)
+            media = self.latencia_media_s
+            if media is not None:
+                api = self.cotas["chamadas_api"]
+                motivo = f"latência média {media:.1f} s"
+                if media > self.latencia_alvo_s:
+                    self._mudar("chamadas_api", api.limite - 1, motivo)
+                elif media < self.latencia_alvo_s / 2 and not (
+                        rss and self.limite_rss_mb and rss > 0.7 * self.limite_rss_mb):
+                    self._mudar("chamadas_api", api.limite + 1, motivo)
+        finally:
+            self._lock.release()
+
+    def estado(self) -> dict:
+        rss = rss_atual_mb()
+        return {
+            "rss_mb": round(rss, 1) if rss else None,
+            "rss_pico_mb": round(max(self.rss_pico_mb, rss or 0), 1),
+            "limite_rss_mb": self.limite_rss_mb or None,
+            "latencia_api_media_ms": (round(1000 * self.latencia_media_s, 1)
+                                      if self.latencia_media_s is not None else None),
+            "reducoes": self.reducoes,
+            "cotas": {
+                nome: {"limite": c.limite, "maximo": c.maximo, "em_uso": c.em_uso,
+                       "pico": c.pico, "esperas": c.esperas}
+                for nome, c in self.cotas.items()
+            },
+            "ajustes": list(self.ajustes),
+        }
+
+
+governador = GovernadorRecursos()  # um por processo: UI, serviço e workers dividem os mesmos limites
+
+
+# ================ Legendas em lote (Batch API) ==================
+
+def _data_url(dados: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(dados).decode('utf-8')}"
+
+
+def montar_pedido_alt(img_path: Path, model: str, prompt: str, dados: bytes | None = None,
+                      mime: str | None = None) -> dict:
+    """Corpo do `responses.create` que pede o ALT de uma imagem (data URL Base64)."""
+    if mime is None:
+        mime, _ = mimetypes.guess_type(img_path.name)
+    mime = mime or "image/png"
+    data_url = _data_url(img_path.read_bytes() if dados is None else dados, mime)
+    return {
+        "model": model,
+        "input": [{
+            "role": "user",
+            "content": [
+                {"type": "input_text", "text": prompt},
+                {"type": "input_image", "image_url": data_url},
+            ],
+        }],
+    }
+
+
+def _texto_da_resposta(body: dict) -> str:
+    """Extrai o texto de um objeto Response serializado (linha de saída da Batch API)."""
+    if body.get("output_text"):
+        return body["output_text"].strip()
+    partes = []
+    for item in body.get("output") or []:
+        for c in item.get("content") or []:
+            if c.get("type") == "output_text":
+                partes.append(c.get("text", ""))
+    return "".join(partes).strip()
+
+
+class LoteLegendas:
+    """
+    Legendas via OpenAI Batch API (mais barata, assíncrona; ideal p/ rodadas noturnas).
+
+    Durante a conversão, `adicionar()` devolve um marcador `{{ALT:id}}` que vai
+    no .md no lugar do ALT. `submeter()` grava os pedidos em JSONL, envia e salva
+    um manifesto em `output_dir/_lotes_openai/`. Depois, `verificar_pendentes()`
+    consulta os lotes e, quando concluídos, troca os marcadores pelos textos.
+
+    O cliente OpenAI respeita OPENAI_BASE_URL, o que permite apontar para um
+    servidor local que imite a API (testes).
+    """
+
+    def __init__(self, output_dir: Path, model: str, prompt: str, log=None):
+        self.dir = output_dir / BATCH_DIR_NAME
+        self.model = model
+        self.prompt = prompt
+        self._log = log or print
+        self.nome = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.itens: dict[str, str] = {}      # custom_id -> imagem
+        self._por_imagem: dict[str, str] = {}
+        self.markdowns: list[str] = []
+
+    def adicionar(self, img_path: Path) -> str:
+        """Registra a imagem (uma vez só) e devolve o marcador a usar no Markdown."""
+        chave = str(Path(img_path).resolve())
+        cid = self._por_imagem.get(chave)
+        if cid is None:
+            cid = f"img-{len(self.itens) + 1:06d}"
+            self.itens[cid] = chave
+            self._por_imagem[chave] = cid
+        return "{{ALT:" + cid + "}}"
+
+    def registrar_markdown(self, md_path: Path):
+        if str(md_path) not in self.markdowns:
+            self.markdowns.append(str(md_path))
+
+    def _escrever_jsonl(self) -> list[Path]:
+        """Grava os pedidos em um ou mais JSONL, respeitando os limites da Batch API."""
+        partes, f, n, tam = [], None, 0, 0
+        try:
+            for cid, img in self.itens.items():
+                corpo = montar_pedido_alt(Path(img), self.model, self.prompt)
+                linha = json.dumps({"custom_id": cid, "method": "POST",
+                                    "url": BATCH_ENDPOINT, "body": corpo}) + "\n"
+                dados = linha.encode("utf-8")
+                if f is None or n >= BATCH_MAX_REQUESTS or tam + len(dados) > BATCH_MAX_BYTES:
+                    if f:
+                        f.close()
+                    partes.append(self.dir / f"{self.nome}_{len(partes) + 1}.jsonl")
+                    f = open(partes[-1], "wb")
+                    n, tam = 0, 0
+                f.write(dados)
+                n += 1
+                tam += len(dados)
+        finally:
+            if f:
+                f.close()
+        return partes
+
+    def submeter(self, client=None) -> Path | None:
+        """Envia os pedidos acumulados e grava o manifesto. Retorna o caminho do manifesto."""
+        if not self.itens:
+            return None
+        client = client or OpenAI()
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        lotes = []
+        for jsonl in self._escrever_jsonl():
+            with open(jsonl, "rb") as fh:
+                arquivo = client.files.create(file=fh, purpose="batch")
+            lote = client.batches.create(
+                input_file_id=arquivo.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=BATCH_COMPLETION_WINDOW,
+                metadata={"origem": "mdToLLM", "manifesto": self.nome},
+            )
+            lotes.append({"id": lote.id, "arquivo": jsonl.name, "status": lote.status})
+
+        manifesto = self.dir / f"{self.nome}.json"
+        gravar_atomico(manifesto, json.dumps({
+            "criado": datetime.now().isoformat(timespec="seconds"),
+            "modelo": self.model,
+            "lotes": lotes,
+            "itens": self.itens,
+            "markdowns": self.markdowns,
+            "concluido": False,
+        }, ensure_ascii=False, indent=2))
+        self._log(f"• Lote OpenAI enviado: {len(self.itens)} imagem(ns) em {len(lotes)} lote(s) "
+                  f"→ {manifesto.name}")
+        return manifesto
+
+    @staticmethod
+    def verificar_pendentes(output_dir: Path, client=None, log=None) -> tuple[int, int]:
+        """
+        Consulta todos os manifestos pendentes; mescla os concluídos nos .md.
+        Retorna (manifestos mesclados, manifestos ainda pendentes).
+        """
+        log = log or print
+        pasta = output_dir / BATCH_DIR_NAME
+        if not pasta.is_dir():
+            return 0, 0
+        client = client or OpenAI()
+        mesclados, pendentes = 0, 0
+        for manifesto in sorted(pasta.glob("*.json")):
+            dados = json.loads(manifesto.read_text(encoding="utf-8"))
+            if dados.get("concluido"):
+                continue
+
+            finais = {"completed", "failed", "expired", "cancelled"}
+            for lote in dados["lotes"]:
+                if lote["status"] not in finais:
+                    info = client.batches.retrieve(lote["id"])
+                    lote["status"] = info.status
+                    lote["output_file_id"] = info.output_file_id
+                    lote["error_file_id"] = info.error_file_id
+
+            if any(l["status"] not in finais for l in dados["lotes"]):
+                gravar_atomico(manifesto, json.dumps(dados, ensure_ascii=False, indent=2))
+                pendentes += 1
+                continue
+
+            textos = {}
+            for lote in dados["lotes"]:
+                if lote["status"] != "completed":
+                    log(f"⚠ Lote {lote['id']} terminou como '{lote['status']}'.")
+                if lote.get("output_file_id"):
+                    conteudo = client.files.content(lote["output_file_id"]).text
+                    for linha in conteudo.splitlines():
+                        if not linha.strip():
+                            continue
+                        res = json.loads(linha)
+                        body = ((res.get("response") or {}).get("body")) or {}
+                        textos[res["custom_id"]] = _texto_da_resposta(body)
+
+            LoteLegendas._mesclar(dados["markdowns"], textos, log)
+            if (output_dir / INDEX_FILE_NAME).exists():
+                indice = IndiceMarkdown(output_dir)
+                try:
+                    for md in map(Path, dados["markdowns"]):
+                        if md.exists():
+                            indice.indexar(md, md.read_text(encoding="utf-8"))
+                finally:
+                    indice.fechar()
+            diario_path = output_dir / JOURNAL_FILE_NAME
+            if diario_path.exists():
+                diario = DiarioJobs(diario_path)
+                try:
+                    diario.marcar_legendados(dados["markdowns"])
+                finally:
+                    diario.fechar()
+            falhas = len(dados["itens"]) - sum(1 for t in textos.values() if t)
+            dados["concluido"] = True
+            gravar_atomico(manifesto, json.dumps(dados, ensure_ascii=False, indent=2))
+            log(f"✓ Lote {manifesto.stem} mesclado: {len(dados['itens']) - falhas} descrição(ões)"
+                + (f", {falhas} sem resposta" if falhas else ""))
+            mesclados += 1
+        return mesclados, pendentes
+
+    @staticmethod
+    def _mesclar(markdowns: list[str], textos: dict, log):
+        """Troca os marcadores {{ALT:id}} pelo texto (em uma linha, sem colchetes)."""
+        def _sub(m):
+            txt = textos.get(m.group(1)) or "(sem descrição)"
+            return " ".join(txt.split()).replace("[", "(").replace("]", ")")
+
+        for md in markdowns:
+            path = Path(md)
+            if not path.exists():
+                log(f"⚠ {path.name} não existe mais; descrições descartadas.")
+                continue
+            texto = path.read_text(encoding="utf-8")
+            gravar_atomico(path, ALT_PLACEHOLDER_RE.sub(_sub, texto))
+
+
+# ================== Legendadores (backends de ALT) ==============
+
+class Legendador:
+    """
+    Backend de descrição de imagens: recebe bytes + MIME, devolve o ALT.
+    `legendar()` mede latência e vazão de cada backend para o relatório do job.
+    """
+    nome = "base"
+
+    def __init__(self):
+        self.chamadas = 0
+        self.falhas = 0
+        self.segundos = 0.0
+        self._lock = threading.Lock()
+
+    def legendar(self, dados: bytes, mime: str) -> str:
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            texto = self._legendar(dados, mime)
+            ok = True
+            return texto
+        finally:
+            with self._lock:
+                self.chamadas += 1
+                self.falhas += 0 if ok else 1
+                self.segundos += time.perf_counter() - t0
+
+    def _legendar(self, dados: bytes, mime: str) -> str:
+        raise NotImplementedError
+
+    def resumo(self) -> str:
+        if not self.chamadas:
+            return f"{self.nome}: nenhuma imagem"
+        media_ms = 1000 * self.segundos / self.chamadas
+        vazao = self.chamadas / self.segundos if self.segundos else 0.0
+        falhas = f", {self.falhas} falha(s)" if self.falhas else ""
+        return (f"{self.nome}: {self.chamadas} imagem(ns), {media_ms:.0f} ms/imagem, "
+                f"{vazao:.2f} imagens/s{falhas}")
+
+
+class LegendadorOpenAI(Legendador):
+    """OpenAI Responses API (o comportamento original do app)."""
+    nome = "openai"
+
+    def __init__(self, model: str, prompt: str):
+        super().__init__()
+        self.model = model
+        self.prompt = prompt
+        self.client = OpenAI()
+
+    def _legendar(self, dados: bytes, mime: str) -> str:
+        pedido = montar_pedido_alt(Path("imagem"), self.model, self.prompt, dados=dados, mime=mime)
+        resp = self.client.responses.create(**pedido)
+        return (resp.output_text or "").strip()
+
+
+class LegendadorServidorLocal(Legendador):
+    """
+    Servidor local compatível com a API da OpenAI (Ollama, llama.cpp, vLLM, LM Studio…).
+    Usa Chat Completions, que é o que esses servidores costumam implementar.
+    """
+    nome = "servidor-local"
+
+    def __init__(self, model: str, prompt: str, base_url: str = LOCAL_SERVER_URL):
+        super().__init__()
+        self.model = model
+        self.prompt = prompt
+        self.client = OpenAI(base_url=base_url, api_key=os.getenv("OPENAI_API_KEY") or "local")
+
+    def _legendar(self, dados: bytes, mime: str) -> str:
+        resp = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": self.prompt},
+                    {"type": "image_url", "image_url": {"url": _data_url(dados, mime)}},
+                ],
+            }],
+        )
+        return (resp.choices[0].message.content or "").strip()
+
+
+class LegendadorModeloLocal(Legendador):
+    """
+    Modelo de legendagem local em CPU (transformers, image-to-text).
+    O pipeline é carregado uma vez por processo; a saída costuma vir em inglês.
+    Requer: pip install transformers torch pillow
+    """
+    nome = "modelo-local"
+    _pipelines: dict = {}
+    _carga = threading.Lock()
+
+    def __init__(self, model: str = LOCAL_CAPTION_MODEL):
+        super().__init__()
+        self.model = model
+
+    def _pipeline(self):
+        with LegendadorModeloLocal._carga:
+            pipe = LegendadorModeloLocal._pipelines.get(self.model)
+            if pipe is None:
+                from transformers import pipeline
+                pipe = pipeline("image-to-text", model=self.model, device=-1)
+                LegendadorModeloLocal._pipelines[self.model] = pipe
+            return pipe
+
+    def _legendar(self, dados: bytes, mime: str) -> str:
+        import io
+        from PIL import Image
+
+        img = Image.open(io.BytesIO(dados)).convert("RGB")
+        saida = self._pipeline()(img)
+        return (saida[0].get("generated_text", "") if saida else "").strip()
+
+
+class LegendadorOCR(Legendador):
+    """
+    Caminho rápido para capturas de tela que são basicamente texto: só OCR (Tesseract).
+    Requer: pip install pytesseract pillow (e o binário do Tesseract instalado).
+    """
+    nome = "ocr"
+
+    def __init__(self, lang: str = OCR_LANG):
+        super().__init__()
+        self.lang = lang
+
+    def _legendar(self, dados: bytes, mime: str) -> str:
+        import io
+        import pytesseract
+        from PIL import Image
+
+        texto = pytesseract.image_to_string(Image.open(io.BytesIO(dados)), lang=self.lang)
+        texto = " ".join(texto.split())
+        return f"Captura de tela com o texto: “{texto}”" if len(texto) >= OCR_MIN_CHARS else ""
+
+
+def parece_captura_de_texto(dados: bytes, mime: str) -> bool:
+    """
+    Heurística barata para "imagem que é basicamente texto" (print de tela, documento):
+    fundo dominante quase uniforme + traços de alto contraste, poucos tons intermediários.
+    Sem Pillow (ou com formato não suportado) responde False.
+    """
+    if mime not in OCR_MIME_TYPES:
+        return False
+    try:
+        import io
+        from PIL import Image
+
+        g = Image.open(io.BytesIO(dados)).convert("L")
+        g.thumbnail((256, 256))
+        hist = g.histogram()
+    except Exception:
+        return False
+    n = sum(hist) or 1
+    fundo = max(range(256), key=hist.__getitem__)
+    perto_fundo = sum(hist[max(0, fundo - 12):fundo + 13]) / n
+    contraste = sum(h for v, h in enumerate(hist) if abs(v - fundo) > 96) / n
+    return perto_fundo > 0.6 and contraste > 0.03 and perto_fundo + contraste > 0.85
+
+
+# ============ Triagem de imagens (antes da legendagem) ===========
+
+def metricas_miniaturas(rgb) -> dict:
+    """
+    Métricas de um lote de miniaturas RGB (array uint8 N×L×L×3), todas vetorizadas:
+    variação de cor, entropia da luminância, saturação e indícios de texto
+    (fundo dominante + traços de alto contraste + muitas bordas, quase sem cor).
+    """
+    import numpy as np
+
+    n = rgb.shape[0]
+    # canais na frente (3×N×L×L, contíguo): reduções sobre o eixo de tamanho 3 são lentas
+    r, g, b = rgb.transpose(3, 0, 1, 2).astype(np.float32)
+    lum = 0.299 * r + 0.587 * g + 0.114 * b  # N×L×L
+    plano = lum.reshape(n, -1)
+    variacao = (r.reshape(n, -1).std(axis=1) + g.reshape(n, -1).std(axis=1)
+                + b.reshape(n, -1).std(axis=1)) / 3
+    saturacao = (np.maximum(np.maximum(r, g), b) - np.minimum(np.minimum(r, g), b)).reshape(n, -1).mean(axis=1)
+
+    # histograma de 32 níveis por imagem, todos de uma vez (bincount com deslocamento)
+    niveis = plano.clip(0, 255).astype(np.int64) >> 3
+    niveis += 32 * np.arange(n)[:, None]
+    hist = np.bincount(niveis.ravel(), minlength=32 * n).reshape(n, 32) / plano.shape[1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropia = -np.where(hist > 0, hist * np.log2(hist), 0.0).sum(axis=1)
+
+    fundo = hist.argmax(axis=1)
+    vizinhos = fundo[:, None] + np.arange(3)[None, :]  # nível dominante ±1 (no histograma com borda)
+    perto_fundo = np.take_along_axis(np.pad(hist, ((0, 0), (1, 1))), vizinhos, axis=1).sum(axis=1)
+    contraste = (np.abs(plano - (fundo * 8 + 4)[:, None]) > 64).mean(axis=1)
+    bordas = (np.abs(np.diff(lum, axis=2)) > 32).reshape(n, -1).mean(axis=1)
+    texto = ((perto_fundo > 0.55) & (contraste > 0.03) & (perto_fundo + contraste > 0.8)
+             & (saturacao < TRIAGE_MAX_SAT_TEXTO) & (bordas > TRIAGE_MIN_BORDAS_TEXTO))
+    return {"variacao": variacao, "entropia": entropia, "saturacao": saturacao,
+            "bordas": bordas, "texto": texto}
+
+
+def triar_imagens(caminhos: list[Path], dimensoes: dict | None = None,
+                  lote: int = TRIAGE_BATCH) -> list[tuple[str, str]] | None:
+    """
+    Classifica cada imagem antes da legendagem: ("pular" | "ocr" | "legendar", motivo).
+    Pula blocos de cor lisa, imagens com 1–2 tons e barras muito alongadas; prints
+    de texto vão só para o OCR; o resto (e o que não der para abrir, como SVG) vai
+    para a legenda. As miniaturas são carregadas em lotes e medidas de uma vez.
+    `dimensoes` ({caminho: (largura, altura)}, do download) evita reabrir o cabeçalho.
+    Sem NumPy/Pillow devolve None.
+    """
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError:
+        return None
+
+    def miniatura(caminho: Path):
+        with Image.open(caminho) as img:
+            dims = img.size
+            img.draft("RGB", (TRIAGE_THUMB_PX * 2, TRIAGE_THUMB_PX * 2))  # JPEG: reduz já na decodificação
+            if img.mode in ("RGBA", "LA", "P", "PA"):
+                # transparência sobre branco, como a página costuma mostrar
+                img = img.convert("RGBA")
+                img.thumbnail((TRIAGE_THUMB_PX * 2, TRIAGE_THUMB_PX * 2))
+                img = Image.alpha_composite(Image.new("RGBA", img.size, (255, 255, 255, 255)), img)
+            img = img.convert("RGB").resize((TRIAGE_THUMB_PX, TRIAGE_THUMB_PX), Image.BILINEAR)
+            return np.asarray(img, dtype=np.uint8), dims
+
+    dimensoes = dimensoes or {}
+    saida: list[tuple[str, str]] = []
+    for i in range(0, len(caminhos), lote):
+        parte = caminhos[i:i + lote]
+        decisoes = [("legendar", "ilegivel")] * len(parte)
+        abertas, miniaturas, aspectos = [], [], []
+        for j, caminho in enumerate(parte):
+            try:
+                arr, dims = miniatura(caminho)
+            except Exception:
+                continue  # SVG, formato desconhecido, arquivo truncado: a legenda decide
+            largura, altura = dimensoes.get(str(caminho)) or dims
+            abertas.append(j)
+            miniaturas.append(arr)
+            aspectos.append(max(largura, altura) / max(1, min(largura, altura)))
+        if abertas:
+            m = metricas_miniaturas(np.stack(miniaturas))
+            motivos = np.select(
+                [m["variacao"] < TRIAGE_MIN_VARIACAO, m["texto"],
+                 np.array(aspectos) > TRIAGE_MAX_ASPECTO, m["entropia"] < TRIAGE_MIN_ENTROPIA],
+                ["lisa", "texto", "proporcao", "pouca_informacao"], default="conteudo")
+            for j, motivo in zip(abertas, motivos.tolist()):
+                decisao = {"texto": "ocr", "conteudo": "legendar"}.get(motivo, "pular")
+                decisoes[j] = (decisao, motivo)
+        saida += decisoes
+    return saida
+
+
+class ClienteLLMLegendador:
+    """
+    Imita `client.chat.completions.create` (a única chamada que o MarkItDown faz
+    ao LLM) e a encaminha para o backend de legendagem escolhido pelo conversor.
+    """
+
+    def __init__(self, conversor: "ConversorMarkdown"):
+        self._conversor = conversor
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model=None, messages=None, **_):
+        texto, dados, mime = "", b"", "image/png"
+        for parte in (messages or [{}])[0].get("content", []):
+            if parte.get("type") == "image_url":
+                url = parte["image_url"]["url"]
+                cabecalho, _, b64 = url.partition(",")
+                mime = cabecalho[5:].split(";")[0] or mime
+                dados = base64.b64decode(b64)
+        if dados:
+            texto = self._conversor._legendar_bytes(dados, mime)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=texto))])
+
+
+# ================ Download de assets (thread-safe) ===============
+
+def validadores_http(cabecalhos) -> dict:
+    """ETag e Last-Modified da resposta, para a revalidação condicional na próxima captura."""
+    return {"etag": cabecalhos.get("ETag"), "modificado": cabecalhos.get("Last-Modified")}
+
+
+class _BaixadorAssets:
+    """
+    Downloads de assets de uma página para `dest`, com o estado que eles compartilham:
+    mapa URL → arquivo, metadados e deduplicação por hash. `baixar()` pode ser chamado
+    de várias threads ao mesmo tempo (o pipeline da captura baixa em paralelo).
+    Nada depende da ordem em que os downloads terminam: os nomes de arquivo são
+    reservados na ordem do plano (`reservar`) e, entre URLs com o mesmo conteúdo,
+    o arquivo fica com a primeira do plano (`consolidar`, no fim).
+    """
+
+    def __init__(self, dest: Path, session, registro: RegistroExecucao, chunk_bytes: int, job=None):
+        self.dest = dest
+        self.session = session
+        self.registro = registro
+        self.chunk_bytes = max(8192, chunk_bytes)
+        self.job = job
+        self.url_to_local: dict[str, str] = {}
+        self.meta: dict[str, dict] = {}
+        self.validadores: dict[str, dict] = {}  # URL → {etag, modificado} da última resposta
+        self._reservas: dict[str, tuple[int, str]] = {}  # URL → (posição no plano, nome)
+        self._nomes: set[str] = set()      # nomes reservados
+        self._radicais: set[str] = set()   # e seus radicais (sem extensão)
+        self._sem_ext: set[str] = set()    # nomes sem extensão: a do MIME entra no fim
+        self._final: dict[str, str] = {}   # URL → nome do arquivo, já com a extensão
+        self._por_hash: dict[str, str] = {}
+        self._urls_por_hash: dict[str, list[str]] = defaultdict(list)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def reservar(self, urls):
+        """Reserva, na ordem dada, o nome de arquivo de cada URL (o sufixo _1, _2… vem daqui)."""
+        with self._lock:
+            for url in urls:
+                if url in self._reservas:
+                    continue
+                stem, ext = os.path.splitext(Path(urlparse(url).path).name or "index")
+                for i in itertools.count():
+                    radical = f"{stem}_{i}" if i else stem
+                    nome = radical + ext
+                    # sem extensão, o nome ganha a do MIME no fim: nenhum outro pode ter o mesmo radical
+                    if ext:
+                        livre = nome not in self._nomes and radical not in self._sem_ext
+                    else:
+                        livre = radical not in self._radicais
+                    if livre and not (self.dest / nome).exists():
+                        break
+                self._nomes.add(nome)
+                self._radicais.add(radical)
+                if not ext:
+                    self._sem_ext.add(radical)
+                self._reservas[url] = (len(self._reservas), nome)
+
+    def baixar(self, url: str) -> str | None:
+        """
+        Baixa uma URL respeitando os limites de MIME/tamanho. Numa única passada pelo stream
+        calcula SHA-256, MIME real e dimensões (imagens); conteúdo repetido (mesmo hash sob
+        outra URL) é descartado na hora e aponta para o 1º arquivo.
+        Devolve o caminho salvo, ou None (recusada, falhou ou duplicata).
+        """
+        self.reservar([url])
+        parcial = None
+        try:
+            with self.session.get(url, timeout=30, stream=True) as r:
+                r.raise_for_status()
+
+                ctype = r.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                generico = ctype in GENERIC_MIME_TYPES
+                if not generico and not ctype.startswith(ALLOWED_MIME_PREFIXES):
+                    return None
+
+                size = r.headers.get("Content-Length")
+                if size and int(size) > MAX_ASSET_BYTES:
+                    return None
+
+                # uma passada só: grava, calcula o hash e guarda o início para o sniff
+                h = hashlib.sha256()
+                cabeca = bytearray()
+                total = 0
+                parcial = self.dest / f".{next(self._seq)}.part"
+                # reserva o tamanho anunciado (sem Content-Length, o pior caso) no governador
+                reserva = int(size) if size else MAX_ASSET_BYTES
+                with governador.reservar("bytes_download", reserva, job=self.job), open(parcial, "wb") as f:
+                    for chunk in r.iter_content(self.chunk_bytes):
+                        if not chunk:
+                            continue
+                        total += len(chunk)
+                        if total > MAX_ASSET_BYTES:
+                            return None
+                        if len(cabeca) < SNIFF_BYTES:
+                            cabeca += chunk[:SNIFF_BYTES - len(cabeca)]
+                        h.update(chunk)
+                        f.write(chunk)
+            self.registro.contar("bytes_baixados", total)
+
+            mime = sniff_mime(bytes(cabeca)) or (None if generico else ctype)
+            if mime is None:
+                return None  # octet-stream que não é imagem
+
+            sha = h.hexdigest()
+            fname = self._reservas[url][1]
+            if fname in self._sem_ext:
+                # tenta inferir pelo conteúdo / pela resposta
+                fname += mimetypes.guess_extension(mime, strict=False) or ""
+            with self._lock:
+                self._final[url] = fname
+                self.validadores[url] = validadores_http(r.headers)
+                self._urls_por_hash[sha].append(url)
+                if sha in self._por_hash:
+                    # mesmo conteúdo sob outra URL (cache-busting, CDN espelho…)
+                    self.registro.contar("assets_duplicados")
+                    self.url_to_local[url] = self._por_hash[sha]
+                    return None
+                target = self.dest / fname
+                os.replace(parcial, target)
+
+                local = str(target)
+                self._por_hash[sha] = local
+                self.url_to_local[url] = local
+                self.meta[local] = {
+                    "url": url, "sha256": sha, "mime": mime, "bytes": total,
+                    "dimensoes": dimensoes_imagem(bytes(cabeca), mime) if mime.startswith("image/") else None,
+                }
+            return local
+        except Exception:
+            return None
+        finally:
+            if parcial is not None and parcial.exists():
+                parcial.unlink()
+
+    def revalidar(self, url: str, anterior: dict) -> dict | None:
+        """
+        GET condicional (If-None-Match / If-Modified-Since) com os validadores guardados na
+        captura anterior. Devolve os validadores atuais se o servidor responder 304 (asset
+        inalterado); None se mudou, se não há validadores ou em erro — aí ele é baixado de novo.
+        """
+        cabecalhos = {}
+        if anterior.get("etag"):
+            cabecalhos["If-None-Match"] = anterior["etag"]
+        if anterior.get("modificado"):
+            cabecalhos["If-Modified-Since"] = anterior["modificado"]
+        if not cabecalhos:
+            return None
+        try:
+            # stream: numa resposta 200 o corpo não é lido (o download normal vem em seguida)
+            with self.session.get(url, headers=cabecalhos, timeout=30, stream=True) as r:
+                if r.status_code != 304:
+                    return None
+                atuais = validadores_http(r.headers)
+        except Exception:
+            return None
+        return {chave: atuais[chave] or anterior.get(chave) for chave in atuais}
+
+    def consolidar(self) -> dict[str, str]:
+        """
+        Depois de todos os downloads: cada conteúdo repetido fica no arquivo da primeira URL
+        do plano, qualquer que tenha sido a que terminou antes. Devolve {caminho antigo: novo}
+        dos arquivos renomeados (para quem guardou caminhos durante os downloads).
+        """
+        renomeados = {}
+        with self._lock:
+            for sha, local in list(self._por_hash.items()):
+                dono = min(self._urls_por_hash[sha], key=lambda u: self._reservas[u][0])
+                novo = str(self.dest / self._final[dono])
+                if novo == local:
+                    continue
+                os.replace(local, novo)
+                self.meta[novo] = {**self.meta.pop(local), "url": dono}
+                self._por_hash[sha] = novo
+                for u in self._urls_por_hash[sha]:
+                    self.url_to_local[u] = novo
+                renomeados[local] = novo
+        return renomeados
+
+    def e_imagem(self, local: str) -> bool:
+        return self.meta[local]["mime"].startswith("image/") or Path(local).suffix.lower() in IMG_FORMATS
+
+    def resultado(self) -> dict:
+        """No formato de `_baixar_recursos`: 'all', 'imgs', 'map' e 'meta' (em ordem de URL)."""
+        with self._lock:
+            salvos = sorted(self.meta, key=lambda local: self.meta[local]["url"])
+        return {"all": salvos, "imgs": [local for local in salvos if self.e_imagem(local)],
+                "map": self.url_to_local, "meta": self.meta, "validadores": self.validadores}
+
+
+# ==================== Pipeline de conversão =====================
+
+@dataclass
+class ConfigConversao:
+    """Retrato das opções da UI no momento em que o job foi enfileirado."""
+    output_dir: Path = base_dir
+    use_openai: bool = False
+    model: str = DEFAULT_MODEL
+    prompt: str = DEFAULT_PROMPT
+    desc_mode: str = "markitdown"  # "markitdown" | "direct" | "batch"
+    caption_backend: str = "openai"  # ver CAPTION_BACKENDS
+    caption_base_url: str = LOCAL_SERVER_URL
+    ocr_screenshots: bool = False    # prints de tela com muito texto vão para o OCR
+    triagem_imagens: bool = True     # captura: não legenda ícones/blocos lisos (ver triar_imagens)
+    gecko_path: str = ""
+    firefox_bin: str = ""
+    headless: bool = True
+    archive_assets: bool = False
+    metricas: str = "jsonl"  # ver METRICS_FORMATS
+    retomar: bool = True     # diário de jobs: pula o que um lote anterior já converteu
+    download_chunk_bytes: int = DOWNLOAD_CHUNK_BYTES
+    largura_imagem: int = IMG_TARGET_WIDTH  # srcset: menor candidato com pelo menos esta largura
+    pos_processamento: str = "basico"       # ver POSTPROC_MODES
+    incremental: bool = False  # recaptura: pula páginas sem mudança, reaproveita assets/legendas
+    modo_captura: str = "auto"  # ver CAPTURE_MODES
+    # governador de recursos (limites do processo; ver GovernadorRecursos)
+    max_conversoes: int = GOV_MAX_CONVERSOES
+    max_mb_download: int = GOV_MAX_BYTES_EM_VOO // (1024 * 1024)
+    max_chamadas_api: int = GOV_MAX_CHAMADAS_API
+    limite_rss_mb: int = 0  # 0: GOV_FRACAO_RAM da RAM da máquina
+    indexar: bool = True    # índice de busca (FTS5) atualizado a cada .md gravado
+
+
+class ConversorMarkdown:
+    """
+    Conversão de arquivos e captura de URLs, sem dependência da UI.
+    Roda dentro dos jobs em segundo plano: fala com o mundo apenas via
+    `log` (callable thread-safe) e via `job` (progresso/cancelamento).
+    """
+
+    def __init__(self, config: ConfigConversao, log=None, md: MarkItDown | None = None):
+        self.config = config
+        self.output_dir = config.output_dir
+        self._log = log or print
+        self._legendadores: dict[str, Legendador] = {}
+        self._legendadores_lock = threading.Lock()
+        self.registro = RegistroExecucao("conversor", "-")  # trocado a cada execução
+        self.md = md or self._build_markitdown()
+        self._md_injetado = md is not None  # instância do chamador: usada também pelos workers
+        self._lote: LoteLegendas | None = None  # só no modo "batch"
+        self._http: requests.Session | None = None  # captura estática (pool de conexões)
+        self._indice: IndiceMarkdown | None = None   # aberto no 1º .md gravado
+        self._indice_lock = threading.Lock()         # membros de compactados gravam em paralelo
+        self._indice_desativado = False              # após um erro do SQLite, nesta instância
+        governador.configurar(config.max_conversoes, config.max_mb_download * 1024 * 1024,
+                              config.max_chamadas_api, config.limite_rss_mb)
+
+    def _build_markitdown(self) -> MarkItDown:
+        """
+        Cria o MarkItDown. Se 'Descrever imagens' estiver ON e modo 'markitdown',
+        passamos llm_client/model/prompt para que a descrição seja gerada quando
+        a entrada for uma *imagem* isolada (PNG/JPG etc.).
+        """
+        if self.config.use_openai and self.config.desc_mode == "markitdown":
+            if not self._legendagem_disponivel():
+                self._log("⚠ OPENAI_API_KEY não definido; descrição via MarkItDown desativada.")
+                return MarkItDown()
+            # o MarkItDown fala com o backend de legendagem escolhido (OpenAI, local, OCR)
+            return MarkItDown(
+                llm_client=ClienteLLMLegendador(self),
+                llm_model=self.config.model.strip() or DEFAULT_MODEL,
+                llm_prompt=self.config.prompt.strip() or DEFAULT_PROMPT,
+            )
+        return MarkItDown()
+
+    def _nova_execucao(self, tipo: str, alvo: str) -> RegistroExecucao:
+        self.registro = RegistroExecucao(tipo, alvo)
+        return self.registro
+
+    def _finalizar_execucao(self, reg: RegistroExecucao):
+        """Grava as métricas da execução (formato em config.metricas) e loga o relatório."""
+        if reg.status == "executando":
+            reg.status = "erro"
+        reg.recursos = governador.estado()
+        resumo = reg.resumo()
+        try:
+            reg.gravar(self.output_dir / METRICS_DIR_NAME, self.config.metricas, resumo)
+        except Exception as e:
+            self._log(f"⚠ Não consegui gravar métricas: {e}")
+        self._log(reg.relatorio(resumo))
+
+    # ------------------------ Fluxos de Arquivo ------------------------
+
+    def processar_arquivos(self, caminhos: list[Path], job: Job | None = None,
+                           falhas: dict | None = None) -> int:
+        """
+        Converte cada arquivo suportado em `output_dir/<stem>.md`. Retorna quantos gerou.
+        Com `config.retomar`, o diário de jobs guarda o estado de cada entrada: numa nova
+        execução, o que já foi convertido (e não mudou) é pulado.
+        Se `falhas` for informado, recebe {caminho: mensagem} dos arquivos que deram erro.
+        """
+        job = job or Job("processar_arquivos")
+        reg = self._nova_execucao("arquivos", f"{len(caminhos)}_arquivos")
+        diario = DiarioJobs(self.output_dir / JOURNAL_FILE_NAME) if self.config.retomar else None
+        aguardando_lote: list[tuple[Path, Path]] = []  # viram 'convertido' só após o envio do lote
+        ok = 0
+        total = len(caminhos)
+        try:
+            pendentes = []
+            for caminho in caminhos:
+                if not caminho.is_file():
+                    self._log(f"Ignorando (não é arquivo): {caminho}")
+                    continue
+                if caminho.suffix.lower() not in TARGET_FORMATS and not formato_compactado(caminho):
+                    self._log(f"Ignorando (extensão não suportada): {caminho.name}")
+                    reg.contar("arquivos_ignorados")
+                    continue
+                out = self.saida_de(caminho)
+                if diario and diario.concluida(caminho, out):
+                    reg.contar("arquivos_retomados")
+                    continue
+                if diario:
+                    diario.marcar(caminho, "pendente", out)
+                pendentes.append((caminho, out))
+
+            retomados = reg.contadores.get("arquivos_retomados", 0)
+            if retomados:
+                self._log(f"↷ {retomados} arquivo(s) já convertido(s) em execução anterior (diário).")
+
+            for n, (caminho, out) in enumerate(pendentes, start=total - len(pendentes)):
+                job.checar()
+                job.progresso(n, total, caminho.name)
+                ext = caminho.suffix.lower()
+                if formato_compactado(caminho):
+                    gerados, erros = self._converter_compactado(caminho, out, job, (n, total))
+                    ok += gerados
+                    if erros:
+                        reg.contar("arquivos_erro")
+                        msg = f"{erros} membro(s) com erro"
+                        self._log(f"✗ {caminho.name}: {msg}; {gerados} convertido(s) → {out.name}/")
+                        if falhas is not None:
+                            falhas[caminho] = msg
+                        if diario:
+                            diario.marcar(caminho, "falhou", erro=msg)
+                    else:
+                        reg.contar("arquivos_ok")
+                        self._log(f"✓ Convertido {caminho.name} → {out.name}/ ({gerados} arquivo(s))")
+                        if diario:
+                            diario.marcar(caminho, "convertido", out)
+                    continue
+                try:
+                    markdown = self.converter_arquivo(caminho, out)
+                    with reg.etapa("gravar_md"):
+                        gravar_atomico(out, markdown)
+                    reg.contar("bytes_saida", len(markdown.encode("utf-8")))
+                    self._indexar(out, markdown, str(caminho.resolve()), "arquivo")
+                    self._log(f"✓ Convertido {caminho.name} → {out.name}")
+                    reg.contar("arquivos_ok")
+                    ok += 1
+                except Exception as e:
+                    reg.contar("arquivos_erro")
+                    self._log(f"✗ Erro convertendo {caminho.name}: {e}")
+                    if falhas is not None:
+                        falhas[caminho] = str(e) or type(e).__name__
+                    if diario:
+                        diario.marcar(caminho, "falhou", erro=str(e))
+                    continue
+                if diario:
+                    legendou = ext in IMG_FORMATS and self.config.use_openai and self._legendagem_disponivel()
+                    if legendou and self.config.desc_mode == "batch":
+                        aguardando_lote.append((caminho, out))
+                    else:
+                        diario.marcar(caminho, "legendado" if legendou else "convertido", out)
+
+            with reg.etapa("lote.submeter"):
+                self._submeter_lote()
+            if diario:
+                for caminho, out in aguardando_lote:
+                    diario.marcar(caminho, "convertido", out)  # 'legendado' quando o lote for mesclado
+                estados = diario.contagem()
+                self._log("• Diário: " + ", ".join(f"{e}={estados.get(e, 0)}" for e in JOURNAL_STATES))
+            self._relatar_legendadores()
+            job.progresso(total, total, "concluído")
+            reg.status = "ok"
+            return ok
+        except JobCancelado:
+            reg.status = "cancelado"
+            raise
+        finally:
+            if diario:
+                diario.fechar()
+            self._finalizar_execucao(reg)
+
+    def saida_de(self, caminho: Path) -> Path:
+        """Destino da entrada: `<stem>.md`, ou a pasta `<nome sem extensão>/` de um compactado."""
+        fmt = formato_compactado(caminho)
+        return self.output_dir / (caminho.name[:-len(fmt)] if fmt else f"{caminho.stem}.md")
+
+    def _converter_compactado(self, caminho: Path, destino: Path, job: Job,
+                              posicao: tuple[int, int] = (0, 1)) -> tuple[int, int]:
+        """
+        Converte os membros suportados de um ZIP/TAR para `destino/`, espelhando as pastas.
+        O compactado é lido como stream: cada membro vai para um temporário e segue para
+        um pool de `config.max_conversoes` threads; no máximo o dobro disso fica no disco
+        ao mesmo tempo (cada um limitado a ARCHIVE_MAX_MEMBER_BYTES), então disco e
+        memória não crescem com o tamanho do compactado. Retorna (gerados, com erro).
+        """
+        reg = self.registro
+        # o lote da Batch API não é thread-safe: nesse modo, um membro por vez
+        workers = 1 if self.config.desc_mode == "batch" else max(1, self.config.max_conversoes)
+        vagas = threading.BoundedSemaphore(2 * workers)
+        tmpdir = Path(tempfile.mkdtemp(prefix="mkd_arq_"))
+        contagem = Counter()
+        lock = threading.Lock()
+        usados: set[Path] = set()
+        origem = caminho.resolve()
+        # um MarkItDown por worker: os conversores guardam estado (sessão HTTP, detector de
+        # tipo) e não são garantidamente thread-safe
+        locais = threading.local()
+
+        def converter(rel: Path, tmp: Path, out: Path):
+            try:
+                job.checar()
+                out.parent.mkdir(parents=True, exist_ok=True)
+                if not hasattr(locais, "md"):
+                    locais.md = self.md if self._md_injetado else self._build_markitdown()
+                markdown = self.converter_arquivo(tmp, out, md=locais.md)
+                gravar_atomico(out, markdown)
+                reg.contar("bytes_saida", len(markdown.encode("utf-8")))
+                self._indexar(out, markdown, f"{origem}!/{rel.as_posix()}", "compactado")
+                with lock:
+                    contagem["ok"] += 1
+            except JobCancelado:
+                pass
+            except Exception as e:
+                self._log(f"✗ Erro convertendo {caminho.name}!/{rel.as_posix()}: {e}")
+                with lock:
+                    contagem["erro"] += 1
+            finally:
+                shutil.rmtree(tmp.parent, ignore_errors=True)
+                vagas.release()
+
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compactado")
+        try:
+            with reg.etapa("compactado", arquivo=caminho.name):
+                for seq, (nome, tamanho, leitor) in enumerate(membros_compactados(caminho)):
+                    job.checar()
+                    rel = caminho_seguro_membro(nome)
+                    if rel is None or rel.suffix.lower() not in TARGET_FORMATS:
+                        contagem["ignorado"] += 1
+                        continue
+                    if tamanho > ARCHIVE_MAX_MEMBER_BYTES:
+                        self._log(f"Ignorando {caminho.name}!/{nome}: {tamanho} bytes")
+                        contagem["ignorado"] += 1
+                        continue
+                    out = destino / rel.parent / f"{rel.stem}.md"
+                    if out in usados:  # relatorio.pdf e relatorio.docx na mesma pasta
+                        out = destino / rel.parent / f"{rel.name}.md"
+                    usados.add(out)
+                    while not vagas.acquire(timeout=0.5):
+                        job.checar()
+                    pasta = tmpdir / str(seq)
+                    pasta.mkdir()
+                    tmp = pasta / rel.name
+                    try:
+                        reg.contar("bytes_extraidos", copiar_limitado(leitor, tmp))
+                    except (OSError, ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+                        self._log(f"✗ Erro lendo {caminho.name}!/{nome}: {e}")
+                        contagem["erro"] += 1
+                        shutil.rmtree(pasta, ignore_errors=True)
+                        vagas.release()
+                        continue
+                    job.progresso(*posicao, f"{caminho.name}: {rel.as_posix()}")
+                    pool.submit(converter, rel, tmp, out)
+                pool.shutdown(wait=True)
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            self._log(f"✗ Compactado inválido ou truncado {caminho.name}: {e}")
+            contagem["erro"] += 1
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        job.checar()
+        reg.contar("membros_convertidos", contagem["ok"])
+        reg.contar("membros_ignorados", contagem["ignorado"])
+        reg.contar("membros_erro", contagem["erro"])
+        return contagem["ok"], contagem["erro"]
+
+    def converter_arquivo(self, caminho: Path, out: Path | None = None, md: MarkItDown | None = None) -> str:
+        """
+        Converte um único arquivo e devolve o Markdown (sem gravar).
+        `out` é o .md de destino, necessário só no modo de legendas em lote;
+        `md` é o MarkItDown a usar (padrão: self.md; o pool de compactados passa o do worker).
+        """
+        reg = self.registro
+        ext = caminho.suffix.lower()
+        reg.contar("bytes_entrada", caminho.stat().st_size)
+        if ext in IMG_FORMATS and self.config.use_openai and self.config.desc_mode == "direct":
+            with reg.etapa("legendagem", arquivo=caminho.name):
+                return self._descrever_imagem_via_openai(caminho, out.parent if out else None)
+        if ext in IMG_FORMATS and self.config.use_openai and self.config.desc_mode == "batch":
+            return self._descrever_imagem_em_lote(caminho, out or self.output_dir / f"{caminho.stem}.md")
+        with governador.reservar("conversoes"), reg.etapa("md.convert", arquivo=caminho.name, ext=ext):
+            markdown = (md or self.md).convert(caminho).markdown
+        return self._pos_processar(markdown, caminho.name)
+
+    def _pos_processar(self, markdown: str, nome: str) -> str:
+        """Etapa comum a arquivos e capturas: limpa o Markdown e reporta a redução."""
+        modo = self.config.pos_processamento
+        if modo == "nenhum":
+            return markdown
+        reg = self.registro
+        with reg.etapa("pos_processamento", modo=modo):
+            novo = PosProcessadorMarkdown(modo).processar(markdown)
+        with reg.etapa("contar_tokens"):
+            antes_t, depois_t = contar_tokens(markdown), contar_tokens(novo)
+        antes_b, depois_b = len(markdown.encode("utf-8")), len(novo.encode("utf-8"))
+        reg.contar("bytes_md_bruto", antes_b)
+        reg.contar("bytes_md_final", depois_b)
+        reg.contar("tokens_md_bruto", antes_t)
+        reg.contar("tokens_md_final", depois_t)
+
+        def pct(a, d):
+            return f"{100 * (d - a) / a:+.0f}%" if a else "—"
+
+        self._log(f"• Markdown {modo} ({nome}): {antes_b / 1024:.1f} KB → {depois_b / 1024:.1f} KB "
+                  f"({pct(antes_b, depois_b)}), ≈ {antes_t} → {depois_t} tokens ({pct(antes_t, depois_t)})")
+        return novo
+
+    def _indexar(self, md: Path, texto: str, origem: str, tipo: str):
+        """Atualiza o índice de busca com o .md recém-gravado (falha aqui não derruba a conversão)."""
+        if not self.config.indexar or self._indice_desativado:
+            return
+        try:
+            with self._indice_lock:
+                if self._indice is None:
+                    self._indice = IndiceMarkdown(self.output_dir)
+            with self.registro.etapa("indexar"):
+                n = self._indice.indexar(md, texto, origem, tipo)
+            self.registro.contar("trechos_indexados", n)
+        except sqlite3.Error as e:
+            self._log(f"⚠ Índice de busca desativado: {e}")
+            self._indice_desativado = True  # a config é do chamador (e de outros jobs): não muda
+
+    def buscar(self, consulta: str, limite: int = 20) -> list[dict]:
+        """Consulta o índice de busca de output_dir (ver IndiceMarkdown.buscar)."""
+        if self._indice is None:
+            self._indice = IndiceMarkdown(self.output_dir)
+        return self._indice.buscar(consulta, limite)
+
+    def converter_avulso(self, caminho: Path) -> str:
+        """Converte um arquivo com métricas próprias e devolve o Markdown, sem gravar .md."""
+        reg = self._nova_execucao("servico", caminho.name)
+        try:
+            markdown = self.converter_arquivo(caminho)
+            reg.contar("bytes_saida", len(markdown.encode("utf-8")))
+            reg.status = "ok"
+            return markdown
+        finally:
+            self._finalizar_execucao(reg)
+
+    def aquecer(self):
+        """Cria de antemão o cliente/modelo de legendagem (evita o custo no 1º pedido)."""
+        if not (self.config.use_openai and self._legendagem_disponivel()):
+            return
+        leg = self._legendador(self.config.caption_backend)
+        if isinstance(leg, LegendadorModeloLocal):
+            leg._pipeline()
+
+    # --------------------------- Selenium ------------------------------
+
+    def _criar_driver(self, download_dir: Path):
+        """Firefox configurado (binário, headless, pasta de download) conforme a config."""
+        options = FirefoxOptions()
+        if self.config.firefox_bin.strip():
+            options.binary_location = self.config.firefox_bin.strip()
+        if self.config.headless:
+            options.add_argument("--headless")
+
+        # Preferências de download (usamos requests, mas isso não atrapalha)
+        options.set_preference("browser.download.folderList", 2)
+        options.set_preference("browser.download.dir", str(download_dir))
+        options.set_preference("browser.download.manager.showWhenStarting", False)
+        options.set_preference(
+            "browser.helperApps.neverAsk.saveToDisk",
+            "application/pdf,application/octet-stream,application/vnd.ms-excel"
+        )
+
+        gecko = self.config.gecko_path.strip() or None
+        service = FirefoxService(executable_path=gecko) if gecko else FirefoxService()
+        driver = webdriver.Firefox(service=service, options=options)
+        driver.set_page_load_timeout(60)
+        return driver
+
+    def capturar_converter_url(self, url: str, job: Job | None = None, driver=None,
+                               obter_driver=None) -> str:
+        """
+        Captura a URL (HTTP direto ou Selenium, conforme `config.modo_captura`), baixa
+        os assets usados e gera `<slug>.md`.
+        Retorna o nome do .md gerado; erros são registrados no log e propagados.
+        Se `driver` for informado (sessão já aberta), ele é reaproveitado e não é fechado;
+        `obter_driver` faz o mesmo, mas só é chamado se a página precisar do navegador.
+        Com `config.incremental`, uma página sem mudança desde a última captura é pulada.
+        """
+        if driver is not None:
+            obter_driver = lambda: driver
+        diario = DiarioJobs(self.output_dir / JOURNAL_FILE_NAME) if self.config.incremental else None
+        try:
+            return self._capturar(url, job, obter_driver, diario)[0]
+        finally:
+            if diario:
+                diario.fechar()
+
+    def capturar_urls(self, urls: list[str], job: Job | None = None) -> dict:
+        """
+        Captura várias URLs com uma única sessão do Firefox, aberta só quando alguma
+        página precisar dela (ex.: a recaptura semanal).
+        Retorna quantas páginas ficaram inalteradas, alteradas, novas ou com erro.
+        """
+        job = job or Job("capturar_urls")
+        diario = DiarioJobs(self.output_dir / JOURNAL_FILE_NAME) if self.config.incremental else None
+        contagem = {"inalterada": 0, "alterada": 0, "nova": 0, "erro": 0}
+        tmpdir = Path(tempfile.mkdtemp(prefix="mkd_drv_"))
+        driver = None
+
+        def obter_driver():
+            nonlocal driver
+            if driver is None:
+                driver = self._criar_driver(tmpdir)
+            return driver
+
+        try:
+            for url in urls:
+                job.checar()
+                try:
+                    _, situacao = self._capturar(url, job, obter_driver, diario)
+                except JobCancelado:
+                    raise
+                except Exception as e:
+                    contagem["erro"] += 1
+                    if isinstance(e, WebDriverException) and driver:
+                        # sessão pode ter morrido: a próxima URL abre outra
+                        try:
+                            driver.quit()
+                        except Exception:
+                            pass
+                        driver = None
+                    continue
+                contagem[situacao] += 1
+            self._log("• Recaptura: " + ", ".join(f"{n} {s}(s)" for s, n in contagem.items()))
+            return contagem
+        finally:
+            if driver:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            if diario:
+                diario.fechar()
+
+    def _capturar(self, url: str, job: Job | None, obter_driver, diario: DiarioJobs | None) -> tuple[str, str]:
+        """
+        Corpo da captura. Retorna (nome do .md, situação: 'inalterada' | 'alterada' | 'nova').
+        `obter_driver()` devolve uma sessão do Firefox emprestada (ou None: abre e fecha a própria).
+        """
+        job = job or Job("capturar_converter_url")
+        reg = self._nova_execucao("captura", urlparse(url).netloc or url)
+        etapas = 6
+        tmpdir = Path(tempfile.mkdtemp(prefix="mkd_snap_"))
+        self._log(f"Capturando: {url}\nTemporários em: {tmpdir}")
+
+        driver, driver_proprio = None, False
+        try:
+            html = None
+            if self.config.modo_captura != "selenium":
+                job.progresso(0, etapas, "baixando HTML")
+                with reg.etapa("http.get"):
+                    html, base_url, motivo = self._buscar_estatico(url)
+                if html is not None:
+                    reg.contar("capturas_estaticas")
+                    ua = self._sessao_http().headers["User-Agent"]
+                    self._log("• HTML obtido por HTTP (sem navegador).")
+                elif self.config.modo_captura == "estatico":
+                    raise RuntimeError(f"a página precisa do navegador ({motivo})")
+                else:
+                    reg.contar("capturas_com_navegador")
+                    self._log(f"• Usando o Firefox: {motivo}.")
+
+            if html is None:
+                job.progresso(0, etapas, "abrindo Firefox")
+                driver = obter_driver() if obter_driver else None
+                if driver is None:
+                    driver_proprio = True
+                    with reg.etapa("firefox.start"):
+                        driver = self._criar_driver(tmpdir)
+                with reg.etapa("driver.get"):
+                    driver.get(url)
+
+                with reg.etapa("readyState"):
+                    WebDriverWait(driver, 30).until(
+                        lambda d: d.execute_script("return document.readyState") == "complete"
+                    )
+                job.checar()
+                job.progresso(1, etapas, "rolando a página")
+                # auto-scroll para carregar lazy content
+                with reg.etapa("_auto_scroll"):
+                    self._auto_scroll(driver, pause=0.8, max_steps=20, job=job)
+
+                # user-agent para requests
+                ua = driver.execute_script("return navigator.userAgent") or "Mozilla/5.0"
+
+                # salva HTML (com URLs absolutas, para o .md citar as mesmas URLs do DOM)
+                with reg.etapa("page_source"):
+                    html = driver.page_source
+                base_url = driver.current_url
+            reg.contar("bytes_html", len(html.encode("utf-8")))
+            slug = self._slugify_url(base_url)
+            out_name = slug + ".md"
+            final_assets_dir = self.output_dir / f"{slug}_assets"
+
+            # recaptura incremental: compara com o DOM (e as opções) da última captura
+            dom_hash, opcoes = self._hash_dom(html), self._opcoes_captura()
+            anterior = diario.captura(slug) if diario else None
+            if (anterior and anterior["dom_hash"] == dom_hash and anterior["opcoes"] == opcoes
+                    and (self.output_dir / out_name).exists()):
+                reg.contar("paginas_inalteradas")
+                self._log(f"= Sem mudanças desde a última captura: {out_name}")
+                job.progresso(etapas, etapas, "sem mudanças")
+                reg.status = "ok"
+                return out_name, "inalterada"
+            situacao = "alterada" if anterior else "nova"
+            reg.contar(f"paginas_{situacao}s")
+            # assets já baixados na captura anterior e ainda presentes no disco (revalidados no pipeline)
+            conhecidos = {
+                u: a for u, a in (anterior or {}).get("assets", {}).items()
+                if (final_assets_dir / a["arquivo"]).exists()
+            }
+
+            html_path = tmpdir / "index.html"
+            with reg.etapa("_absolutizar_html"):
+                html_path.write_text(self._absolutizar_html(html, base_url), encoding="utf-8")
+            self._log(f"• HTML salvo: {html_path.name}")
+
+            job.checar()
+            job.progresso(2, etapas, "convertendo e baixando")
+            session = self._nova_sessao(ua, driver=driver) if driver else self._sessao_http()
+            arquivar = self.config.archive_assets
+            legendar = self.config.use_openai and self._legendagem_disponivel()
+            if self.config.use_openai and not legendar:
+                self._log("⚠ OPENAI_API_KEY não definido; pulando descrição de imagens.")
+            legendas_por_sha = {a["sha256"]: a["descricao"]
+                                for a in (anterior or {}).get("assets", {}).values() if a.get("descricao")}
+            assets_dir = tmpdir / "assets"
+            assets_dir.mkdir(exist_ok=True)
+            # conversão, downloads e legendagem sobrepostos (ver _pipeline_captura)
+            with reg.etapa("pipeline"):
+                res = asyncio.run(self._pipeline_captura(
+                    job, etapas, html, base_url, html_path, session, assets_dir, final_assets_dir,
+                    conhecidos, legendas_por_sha if legendar else None))
+            md_text, images, reaproveitados = res["md_text"], res["recursos"], res["reaproveitados"]
+            reg.contar("assets_baixados", len(images["all"]))
+            reg.contar("imagens", len(images["imgs"]))
+            self._log(f"• Recursos baixados: {len(images['all'])} (imagens: {len(images['imgs'])})")
+            evitadas = res["evitadas"]
+            if evitadas:
+                evitados, sem_tamanho = res["estimativa"]
+                reg.contar("assets_evitados", len(evitadas))
+                reg.contar("bytes_evitados", evitados)
+                extra = f"; {sem_tamanho} sem Content-Length" if sem_tamanho else ""
+                self._log(f"• Downloads evitados: {len(evitadas)} recursos, "
+                          f"≈ {evitados / 1024:.1f} KB{extra}")
+
+            job.checar()
+            job.progresso(4, etapas, "organizando assets")
+            # move assets para pasta definitiva ao lado do .md
+            if images["all"]:
+                final_assets_dir.mkdir(exist_ok=True)
+
+            # Atualiza mapa, lista de imagens e metadados para apontar para o destino final
+            updated_img_list = []
+            imgs_baixadas = set(images["imgs"])
+            destino_de, meta = {}, {}
+            # cópias antigas de assets que mudaram no servidor (e que nenhum reaproveitado usa)
+            # são substituídas no lugar, mantendo o nome do arquivo entre recapturas
+            obsoletos = ({final_assets_dir / a["arquivo"] for u, a in conhecidos.items() if u in images["map"]}
+                         - {final_assets_dir / a["arquivo"] for a in reaproveitados.values()})
+            with reg.etapa("mover_assets"):
+                for src_path in images["all"]:
+                    src = Path(src_path)
+                    tgt = final_assets_dir / src.name
+                    i = 1
+                    while tgt.exists() and tgt not in obsoletos:
+                        stem, ext = os.path.splitext(src.name)
+                        tgt = final_assets_dir / f"{stem}_{i}{ext}"
+                        i += 1
+                    if tgt in obsoletos:
+                        tgt.unlink(missing_ok=True)  # no Windows, mover sobre um arquivo existente falha
+                    shutil.move(src, tgt)  # em geral um rename: o arquivo não é relido
+                    destino_de[src_path] = str(tgt)
+                    meta[str(tgt)] = images["meta"].get(src_path, {})
+                    if src_path in imgs_baixadas:
+                        updated_img_list.append(str(tgt))
+
+            # Atualiza map URL → caminho final (duplicatas apontam para o mesmo arquivo)
+            images["map"] = {k: destino_de.get(v, v) for k, v in images["map"].items()}
+            images["meta"] = meta
+            if arquivar:
+                with reg.etapa("_reescrever_css_locais"):
+                    self._reescrever_css_locais(images)
+
+            # assets reaproveitados entram no mapa já no destino final
+            for u, a in reaproveitados.items():
+                local = str(final_assets_dir / a["arquivo"])
+                images["map"][u] = local
+                if Path(local).suffix.lower() in IMG_FORMATS:
+                    updated_img_list.append(local)
+            images["imgs"] = updated_img_list
+
+            # hash de conteúdo: legendas também valem para a mesma imagem sob outra URL
+            sha_por_caminho = {str(final_assets_dir / a["arquivo"]): a["sha256"]
+                               for a in reaproveitados.values()}
+            if diario:
+                for local in images["map"].values():
+                    if local not in sha_por_caminho:
+                        # o hash já veio do download; só recalcula se faltar
+                        sha_por_caminho[local] = (meta.get(local, {}).get("sha256")
+                                                  or self._sha256_arquivo(Path(local)))
+
+            # aponta o Markdown para os assets locais (relativos ao output_dir)
+            with reg.etapa("_relocalizar_markdown"):
+                md_text = self._relocalizar_markdown(md_text, images["map"])
+
+            if arquivar:
+                # guarda também o HTML reescrito, apontando para os assets locais
+                with reg.etapa("_rewrite_html_with_local_assets"):
+                    html_rewritten = self._rewrite_html_with_local_assets(
+                        html=html,
+                        base_url=base_url,
+                        url_map=images["map"],
+                        final_assets_dir=final_assets_dir
+                    )
+                    gravar_atomico(self.output_dir / f"{slug}.html", html_rewritten)
+                self._log(f"• HTML arquivado: {slug}.html")
+
+            # descrições decididas no pipeline (por caminho temporário) → caminho final
+            decisoes = {destino_de.get(c, c): d for c, d in res["decisoes"].items()}
+            textos = {destino_de.get(c, c): t for c, t in res["legendas"].items()}
+            legendas: dict[str, str] = {}  # caminho final → descrição (conhecida ou gerada agora)
+            descricoes = []
+            for p in images["imgs"]:
+                if decisoes.get(p) in ("reaproveitada", "gerada"):
+                    legendas[p] = textos[p]
+                    descricoes.append((p, textos[p]))
+                elif decisoes.get(p) == "lote":
+                    # marcadores agora; o texto entra quando o lote terminar
+                    descricoes.append((p, self._lote_legendas().adicionar(Path(p))))
+            if "lote" in decisoes.values():
+                self._lote_legendas().registrar_markdown(self.output_dir / out_name)
+            if descricoes:
+                modo = "Selenium" if driver else "HTTP"  # como o HTML foi obtido nesta captura
+                md_text += f"\n\n## Descrições de imagens (captura {modo})\n"
+                for pth, txt in descricoes:
+                    md_text += f"- `{Path(pth).name}` — {txt}\n"
+            poupadas = sum(reg.contadores.get(c, 0) for c in
+                           ("legendas_evitadas_pequenas", "legendas_evitadas_triagem", "legendas_via_ocr"))
+            if poupadas:
+                self._log(f"• Chamadas de legendagem evitadas nesta página: {poupadas}")
+
+            md_text = self._pos_processar(md_text, out_name)
+
+            # nome de saída baseado na URL
+            out_path = self.output_dir / out_name
+            with reg.etapa("gravar_md"):
+                gravar_atomico(out_path, md_text)
+            reg.contar("bytes_saida", len(md_text.encode("utf-8")))
+            self._indexar(out_path, md_text, url, "url")
+            self._log(f"✓ URL convertida → {out_name}" + (f" ({situacao})" if diario else ""))
+            with reg.etapa("lote.submeter"):
+                self._submeter_lote()
+            if diario:
+                # validadores HTTP: da resposta desta captura, ou do 304 para os reaproveitados
+                validadores = {**images["validadores"], **reaproveitados}
+                assets = {u: {"arquivo": Path(local).name, "sha256": sha_por_caminho[local],
+                              "descricao": legendas.get(local),
+                              "etag": validadores.get(u, {}).get("etag"),
+                              "modificado": validadores.get(u, {}).get("modificado")}
+                          for u, local in images["map"].items()}
+                diario.gravar_captura(slug, url, dom_hash, opcoes, assets)
+                # remove assets da captura anterior que a página não usa mais
+                atuais = {a["arquivo"] for a in assets.values()}
+                for a in (anterior or {}).get("assets", {}).values():
+                    if a["arquivo"] not in atuais:
+                        (final_assets_dir / a["arquivo"]).unlink(missing_ok=True)
+            self._relatar_legendadores()
+            job.progresso(etapas, etapas, "concluído")
+            reg.status = "ok"
+            return out_name, situacao
+        except JobCancelado:
+            reg.status = "cancelado"
+            raise
+        except (TimeoutException, WebDriverException) as e:
+            reg.status = "erro"
+            self._log(f"✗ Selenium/Firefox: {e}")
+            raise
+        except Exception as e:
+            reg.status = "erro"
+            self._log(f"✗ Erro na captura/conversão: {e}")
+            raise
+        finally:
+            try:
+                if driver and driver_proprio:
+                    with reg.etapa("driver.quit"):
+                        driver.quit()
+            except Exception:
+                pass
+            # limpa temporários
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            self._log("• Temporários removidos.")
+            self._finalizar_execucao(reg)
+
+    # --------------------------- Helpers Selenium/Assets ----------------
+
+    async def _pipeline_captura(self, job: Job, etapas: int, html: str, base_url: str, html_path: Path,
+                                session, assets_dir: Path, final_assets_dir: Path, conhecidos: dict,
+                                legendas_por_sha: dict | None) -> dict:
+        """
+        Conversão, downloads e legendagem de uma captura, sobrepostos. Cada estágio é uma
+        corrotina; o trabalho bloqueante (MarkItDown, requests, backends) roda em threads, e
+        entre os estágios há filas limitadas (CAPTURE_QUEUE_SIZE) — um estágio lento segura
+        o anterior em vez de acumular arquivos:
+
+            md.convert ─────┐
+            coletar URLs ───┴─► plano ─[urls]─► N downloads ─[imagens]─► triagem ─[legendar]─► M legendas
+
+        O plano põe na fila, antes de a conversão terminar, o que não depende do Markdown
+        (imagens de fundo; tudo, ao arquivar); as legendas começam com a 1ª imagem baixada.
+        URLs de `conhecidos` (captura anterior) passam por um GET condicional nos workers de
+        download: com 304 o arquivo e a legenda são reaproveitados, senão são baixadas de novo.
+        Assim o tempo da página fica perto do estágio mais lento, não da soma deles.
+        `legendas_por_sha` None: sem legendagem. Retorna md_text, recursos (formato de
+        `_baixar_recursos`, caminhos temporários), reaproveitados, evitadas, estimativa e,
+        por caminho, a decisão ('pular' | 'reaproveitada' | 'gerada' | 'lote') e a legenda.
+        """
+        reg = self.registro
+        cfg = self.config
+        arquivar = cfg.archive_assets
+        legendar = legendas_por_sha is not None
+        n_baixar = CAPTURE_DOWNLOAD_WORKERS
+        n_legendar = max(1, cfg.max_chamadas_api) if legendar and cfg.desc_mode != "batch" else 0
+        # executor próprio: downloads ocupando todas as threads não podem atrasar a conversão
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(n_baixar + n_legendar + 3, thread_name_prefix="captura"))
+        fila_urls: asyncio.Queue = asyncio.Queue(CAPTURE_QUEUE_SIZE)
+        fila_imgs: asyncio.Queue = asyncio.Queue(CAPTURE_QUEUE_SIZE)
+        fila_legendas: asyncio.Queue = asyncio.Queue(CAPTURE_QUEUE_SIZE)
+        baixador = _BaixadorAssets(assets_dir, session, reg, cfg.download_chunk_bytes, job)
+        res = {"evitadas": set(), "estimativa": (0, 0), "reaproveitados": {}, "decisoes": {}, "legendas": {}}
+        grupos, motivos = Counter(), Counter()  # triagem: destino de cada imagem / por que foi pulada
+        triar_ok = cfg.triagem_imagens
+        feitas = itertools.count(1)
+
+        def converter():
+            with governador.reservar("conversoes", job=job), reg.etapa("md.convert"):
+                return self.md.convert(html_path).markdown
+
+        conversao = asyncio.ensure_future(asyncio.to_thread(converter))
+
+        async def planejar():
+            enviadas = set()
+
+            async def enviar(urls):
+                novas = sorted(urls - enviadas)
+                enviadas.update(novas)
+                # nomes de arquivo reservados na ordem do plano, antes dos downloads (também
+                # os da captura anterior: se mudaram no servidor, são baixados de novo)
+                baixador.reservar(novas)
+                for u in novas:
+                    await fila_urls.put(u)
+
+            with reg.etapa("_coletar_urls_recursos"):
+                candidatas = await asyncio.to_thread(self._coletar_urls_recursos, base_url, html)
+            fundos = imagens_de_fundo(html, base_url)
+            # o que não depende do Markdown já vai para a fila enquanto a conversão roda
+            await enviar(candidatas if arquivar else candidatas & fundos)
+            res["md_text"] = await conversao
+            if not arquivar:
+                # o Markdown diz quais recursos realmente precisam ser baixados
+                baixar, res["evitadas"] = self._planejar_downloads(candidatas, res["md_text"], fundos)
+                await enviar(baixar)
+            revalidar = len(enviadas & conhecidos.keys())
+            reg.contar("assets_candidatos", len(candidatas))
+            reg.contar("assets_planejados", len(enviadas) - revalidar)
+            self._log(f"• Plano de download: {len(enviadas) - revalidar} de {len(candidatas)} recursos"
+                      + (" (arquivamento)" if arquivar else " (referenciados no .md)")
+                      + (f"; {revalidar} da captura anterior a revalidar" if revalidar else ""))
+            estimativa = None
+            if res["evitadas"]:
+                def estimar():
+                    with reg.etapa("_estimar_bytes", urls=len(res["evitadas"])):
+                        return self._estimar_bytes(session, res["evitadas"])
+                estimativa = asyncio.ensure_future(asyncio.to_thread(estimar))
+            await fila_urls.join()
+            if arquivar:
+                # imagens de fundo e @import dos CSS baixados (só depois que eles chegam)
+                lidos = set()
+                for _ in range(CSS_MAX_DEPTH):
+                    faltando = self._urls_faltando_em_css(baixador.resultado(), lidos)
+                    if not faltando:
+                        break
+                    await enviar(faltando)
+                    await fila_urls.join()
+            for _ in range(n_baixar):
+                await fila_urls.put(None)
+            reaproveitados = len(res["reaproveitados"])
+            alterados = len(enviadas & conhecidos.keys()) - reaproveitados
+            if reaproveitados:
+                reg.contar("assets_reaproveitados", reaproveitados)
+            if alterados:
+                reg.contar("assets_alterados", alterados)
+            if reaproveitados or alterados:
+                self._log(f"• Assets da captura anterior: {reaproveitados} inalterado(s) (HTTP 304), "
+                          f"{alterados} baixado(s) de novo")
+            if estimativa:
+                res["estimativa"] = await estimativa
+
+        async def baixar():
+            while (url := await fila_urls.get()) is not None:
+                try:
+                    job.checar()
+                    local = validadores = None
+                    if url in conhecidos:
+                        # já está no disco, da captura anterior: só vale se o servidor confirmar
+                        validadores = await asyncio.to_thread(baixador.revalidar, url, conhecidos[url])
+                    if validadores is not None:
+                        a = res["reaproveitados"][url] = {**conhecidos[url], **validadores}
+                        local = str(final_assets_dir / a["arquivo"])
+                        meta = {"sha256": a["sha256"]}
+                        imagem = Path(local).suffix.lower() in IMG_FORMATS
+                    else:
+                        local = await asyncio.to_thread(baixador.baixar, url)
+                        meta = baixador.meta.get(local)
+                        imagem = local is not None and baixador.e_imagem(local)
+                finally:
+                    fila_urls.task_done()
+                if local and legendar and imagem:
+                    await fila_imgs.put((local, meta))
+
+        async def downloads():
+            with reg.etapa("downloads"):
+                await asyncio.gather(*(baixar() for _ in range(n_baixar)))
+            await fila_imgs.put(None)
+
+        async def triar():
+            nonlocal triar_ok
+            fim = False
+            while not fim:
+                # micro-lote: o que já chegou (até TRIAGE_BATCH) é medido de uma vez
+                lote = [await fila_imgs.get()]
+                while len(lote) < TRIAGE_BATCH and not fila_imgs.empty():
+                    lote.append(fila_imgs.get_nowait())
+                if lote[-1] is None:
+                    fim = True
+                    lote.pop()
+                job.checar()
+                novas = []
+                for caminho, meta in lote:
+                    conhecida = legendas_por_sha.get(meta.get("sha256"))
+                    if pequena_demais(meta):
+                        res["decisoes"][caminho] = "pular"
+                        reg.contar("legendas_evitadas_pequenas")
+                    elif conhecida:
+                        res["decisoes"][caminho], res["legendas"][caminho] = "reaproveitada", conhecida
+                        reg.contar("legendas_reaproveitadas")
+                    else:
+                        novas.append((caminho, meta))
+                decisoes = None
+                if novas and triar_ok:
+                    dims = {c: m["dimensoes"] for c, m in novas if m.get("dimensoes")}
+                    with reg.etapa("triagem_imagens", imagens=len(novas)):
+                        decisoes = await asyncio.to_thread(triar_imagens, [Path(c) for c, _ in novas], dims)
+                    if decisoes is None:
+                        triar_ok = False
+                        self._log("⚠ Triagem de imagens indisponível (pip install numpy pillow); "
+                                  "descrevendo todas.")
+                for (caminho, meta), (decisao, motivo) in zip(novas, decisoes or [("legendar", "")] * len(novas)):
+                    if decisao == "pular":
+                        res["decisoes"][caminho] = "pular"
+                        motivos[motivo] += 1
+                        grupos["pulada"] += 1
+                        continue
+                    # sem o OCR ligado, os prints de texto seguem para o backend configurado
+                    texto = decisao == "ocr" and cfg.ocr_screenshots
+                    grupos["ocr" if texto else "legenda"] += 1
+                    if n_legendar:
+                        await fila_legendas.put((caminho, meta.get("mime"), texto or None))
+                    else:
+                        res["decisoes"][caminho] = "lote"
+            for _ in range(n_legendar):
+                await fila_legendas.put(None)
+
+        async def descrever():
+            while (item := await fila_legendas.get()) is not None:
+                caminho, mime, texto = item
+                job.checar()
+                job.progresso(5, etapas, f"descrevendo imagem {next(feitas)}")
+                try:
+                    descr = await asyncio.to_thread(self._gerar_alt_para_imagem, Path(caminho), mime, texto)
+                except Exception as e:
+                    self._log(f"Erro descrevendo {Path(caminho).name}: {e}")
+                    continue
+                res["decisoes"][caminho], res["legendas"][caminho] = "gerada", descr
+
+        async def legendagem():
+            with reg.etapa("legendagem"):
+                await asyncio.gather(*(descrever() for _ in range(n_legendar)))
+
+        estagios = [planejar(), downloads()] + ([triar(), legendagem()] if legendar else [])
+        tarefas = [conversao] + [asyncio.ensure_future(e) for e in estagios]
+        try:
+            await asyncio.gather(*tarefas)
+        except BaseException:
+            # um estágio falhou (ou o job foi cancelado): os outros param nas filas
+            for t in tarefas:
+                t.cancel()
+            await asyncio.gather(*tarefas, return_exceptions=True)
+            raise
+
+        # duplicatas ficam no arquivo da 1ª URL do plano: decisões seguem o arquivo renomeado
+        renomeados = baixador.consolidar()
+        for chave in ("decisoes", "legendas"):
+            res[chave] = {renomeados.get(c, c): v for c, v in res[chave].items()}
+        res["recursos"] = baixador.resultado()
+        pequenas = reg.contadores.get("legendas_evitadas_pequenas", 0)
+        if pequenas:
+            self._log(f"• Imagens pequenas demais para descrever (< {MIN_CAPTION_PX}px): {pequenas}")
+        if triar_ok and grupos:
+            reg.contar("legendas_evitadas_triagem", grupos["pulada"])
+            self._log(f"• Triagem de imagens: {grupos['pulada']} pulada(s)"
+                      + (f" ({', '.join(f'{m}={n}' for m, n in sorted(motivos.items()))})" if motivos else "")
+                      + f", {grupos['ocr']} só OCR, {grupos['legenda']} para legenda")
+        return res
+
+    @staticmethod
+    def _hash_dom(html: str) -> str:
+        """SHA-256 do DOM sem scripts, estilos, comentários, nonces e espaços repetidos."""
+        # removidos sem deixar espaço: um <script> a mais entre duas tags não muda o hash
+        texto = " ".join(DOM_VOLATILE_RE.sub("", html).split())
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def _opcoes_captura(self) -> str:
+        """Opções que mudam o .md gerado: com elas diferentes, a página é refeita."""
+        c = self.config
+        opcoes = [c.use_openai, c.desc_mode, c.caption_backend, c.model.strip(),
+                  c.ocr_screenshots, c.archive_assets, c.pos_processamento]
+        if not c.triagem_imagens:
+            opcoes.append("sem_triagem")  # com o padrão, o hash das capturas antigas não muda
+        return json.dumps(opcoes)
+
+    @staticmethod
+    def _sha256_arquivo(caminho: Path) -> str:
+        h = hashlib.sha256()
+        with open(caminho, "rb") as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(bloco)
+        return h.hexdigest()
+
+    def _sessao_http(self) -> requests.Session:
+        """Sessão HTTP do conversor, mantida entre capturas estáticas (conexões keep-alive)."""
+        if self._http is None:
+            self._http = requests.Session()
+            adaptador = requests.adapters.HTTPAdapter(pool_connections=STATIC_POOL_SIZE,
+                                                      pool_maxsize=STATIC_POOL_SIZE)
+            self._http.mount("http://", adaptador)
+            self._http.mount("https://", adaptador)
+            self._http.headers.update({
+                "User-Agent": STATIC_USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "pt-BR,pt;q=0.9,en;q=0.8",
+            })
+        return self._http
+
+    def _buscar_estatico(self, url: str) -> tuple[str | None, str, str | None]:
+        """
+        Baixa a página por HTTP, sem navegador. Retorna (html, url final, None), ou
+        (None, url, motivo) quando a página precisa do Firefox (JS, erro HTTP, não-HTML).
+        """
+        try:
+            r = self._sessao_http().get(url, timeout=30, stream=True)
+        except requests.RequestException as e:
+            return None, url, f"falha no HTTP direto ({type(e).__name__})"
+        with r:
+            if r.status_code >= 400:
+                return None, url, f"HTTP {r.status_code}"
+            ctype = r.headers.get("Content-Type", "")
+            if "html" not in ctype.lower():
+                return None, url, f"conteúdo {ctype.split(';')[0] or 'sem tipo'}"
+            bruto = bytearray()
+            for bloco in r.iter_content(chunk_size=max(8192, self.config.download_chunk_bytes)):
+                bruto += bloco
+                if len(bruto) > STATIC_MAX_HTML_BYTES:
+                    return None, url, "HTML grande demais para a captura estática"
+            # charset: cabeçalho, senão <meta charset>, senão UTF-8
+            m = META_CHARSET_RE.search(bytes(bruto[:4096]))
+            charset = (r.encoding if "charset=" in ctype.lower() else None) or (
+                m.group(1).decode("ascii", "ignore") if m else "utf-8")
+            try:
+                html = bruto.decode(charset, errors="replace")
+            except LookupError:
+                html = bruto.decode("utf-8", errors="replace")
+            final = r.url
+        motivo = motivo_para_navegador(html)
+        return (None, url, motivo) if motivo else (html, final, None)
+
+    def _nova_sessao(self, user_agent: str, driver=None) -> requests.Session:
+        """Sessão requests com o user-agent do navegador e (se houver) os cookies do Selenium."""
+        session = requests.Session()
+        session.headers.update({"User-Agent": user_agent})
+        if driver:
+            self._attach_cookies_from_driver(driver, session)
+        return session
+
+    def _coletar_urls_recursos(self, base_url: str, html: str) -> set:
+        """
+        Todas as URLs absolutas de recursos presentes no HTML: img (o candidato
+        escolhido do srcset/<picture>), css, js, source e url() de style/<style>.
+        """
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, "html.parser")
+        found_urls = set()
+
+        # coleta URLs dos atributos alvo
+        for tag, attr in RESOURCE_TAG_ATTRS:
+            for node in soup.find_all(tag):
+                val = self._escolher_img(node, base_url) if tag == "img" else node.get(attr)
+                if not val:
+                    continue
+                abs_url = urljoin(base_url, val)
+                found_urls.add(abs_url)
+
+        # imagens de fundo (atributos style e blocos <style>)
+        found_urls |= imagens_de_fundo(html, base_url)
+        return found_urls
+
+    def _escolher_img(self, node, base_url: str) -> str | None:
+        """
+        URL que a captura usa para um <img>: com srcset (ou <source> de um <picture>),
+        o menor candidato com pelo menos `config.largura_imagem` px — limitado pela
+        largura do slot em `sizes` —, como faria o navegador; sem srcset, o src.
+        """
+        srcset, sizes = node.get("srcset"), node.get("sizes")
+        de_source = False
+        pai = node.parent
+        if pai is not None and pai.name == "picture":
+            # o navegador usa o 1º <source> cujo media casa
+            for fonte in pai.find_all("source"):
+                if fonte.get("srcset") and media_casa(fonte.get("media", "")):
+                    srcset, sizes = fonte["srcset"], fonte.get("sizes") or sizes
+                    de_source = True
+                    break
+        cands = parse_srcset(srcset) if srcset else []
+        if node.get("src") and not de_source and not any(t == "w" for _, _, t in cands):
+            cands.append((node["src"], 1.0, "x"))  # o src do próprio <img> conta como candidato 1x
+        alvo = float(self.config.largura_imagem)
+        slot = largura_de_sizes(sizes) if sizes else None
+        if slot:
+            alvo = min(alvo, slot)
+        escolhido = escolher_candidato(cands, alvo) or node.get("src")
+        return urljoin(base_url, escolhido) if escolhido else None
+
+    def _absolutizar_html(self, html: str, base_url: str) -> str:
+        """
+        Reescreve os atributos de recursos com URLs absolutas, para que o
+        Markdown gerado cite exatamente as mesmas URLs coletadas no DOM.
+        """
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, "html.parser")
+        for tag, attr in RESOURCE_TAG_ATTRS:
+            for node in soup.find_all(tag):
+                # img: o candidato escolhido do srcset vira o src (é ele que o .md cita)
+                val = self._escolher_img(node, base_url) if tag == "img" else node.get(attr)
+                if val:
+                    node[attr] = urljoin(base_url, val)
+        return str(soup)
+
+    def _planejar_downloads(self, candidatas: set, md_text: str, fundos: set = frozenset()):
+        """
+        Separa as URLs candidatas entre as que o Markdown realmente usa, mais as
+        imagens de fundo (a baixar), e as demais (evitadas). Retorna (baixar, evitadas).
+        """
+        referenciadas = set(MD_LINK_TARGET_RE.findall(md_text))
+        baixar = candidatas & (referenciadas | fundos)
+        return baixar, candidatas - baixar
+
+    def _estimar_bytes(self, session: requests.Session, urls) -> tuple:
+        """
+        Soma o Content-Length (via HEAD) das URLs não baixadas.
+        Retorna (bytes, quantidade sem Content-Length).
+        """
+        total, sem_tamanho = 0, 0
+        for url in urls:
+            try:
+                r = session.head(url, timeout=10, allow_redirects=True)
+                size = r.headers.get("Content-Length")
+                if r.ok and size:
+                    total += int(size)
+                else:
+                    sem_tamanho += 1
+            except Exception:
+                sem_tamanho += 1
+        return total, sem_tamanho
+
+    def _relocalizar_markdown(self, md_text: str, url_map: dict) -> str:
+        """Troca, nos links do Markdown, as URLs baixadas pelo caminho relativo ao output_dir."""
+        def _sub(m):
+            url = m.group(1)
+            local = url_map.get(url)
+            if not local:
+                return m.group(0)
+            rel = os.path.relpath(local, start=self.output_dir).replace("\\", "/")
+            return m.group(0).replace(url, rel, 1)
+
+        return MD_LINK_TARGET_RE.sub(_sub, md_text)
+
+    def _baixar_recursos(self, base_url: str, html: str, dest: Path, user_agent: str, driver=None,
+                         urls=None, session=None, job=None):
+        """
+        Baixa, uma a uma, as `urls` informadas (plano de download) ou tudo que achar no DOM
+        (via BeautifulSoup), com cookies do Selenium (se houver) e limites de MIME/tamanho.
+        A captura não passa por aqui (usa `_BaixadorAssets` em paralelo no `_pipeline_captura`);
+        fica como referência sequencial para o bench (cenário `downloads`).
+        Retorna dict com: 'all' (todos salvos), 'imgs' (apenas imagens), 'map' (URL -> caminho local)
+        e 'meta' (caminho local -> {url, sha256, mime, bytes, dimensoes}).
+        """
+        if session is None:
+            session = self._nova_sessao(user_agent, driver=driver)
+
+        found_urls = sorted(set(urls) if urls is not None else self._coletar_urls_recursos(base_url, html))
+        baixador = _BaixadorAssets(dest, session, self.registro, self.config.download_chunk_bytes, job)
+        baixador.reservar(found_urls)
+        for u in found_urls:
+            if job:
+                job.checar()
+            baixador.baixar(u)
+        baixador.consolidar()
+        return baixador.resultado()
+
+    def _rewrite_html_with_local_assets(self, html: str, base_url: str, url_map: dict, final_assets_dir: Path) -> str:
+        """
+        Reescreve o HTML para referenciar os assets locais (em final_assets_dir),
+        usando caminhos relativos ao diretório de saída (self.output_dir).
+        """
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, "html.parser")
+
+        def rel_for(url: str):
+            local = url_map.get(url)
+            if not local:
+                return None
+            # caminho relativo a partir do local do .md (output_dir)
+            return os.path.relpath(local, start=self.output_dir)
+
+        targets = [
+            ("img", "src"),
+            ("source", "src"),
+            ("script", "src"),
+            ("link", "href"),
+        ]
+
+        for tag, attr in targets:
+            for node in soup.find_all(tag):
+                val = self._escolher_img(node, base_url) if tag == "img" else node.get(attr)
+                if not val:
+                    continue
+                abs_url = urljoin(base_url, val)
+                new_rel = rel_for(abs_url)
+                if new_rel:
+                    node[attr] = new_rel.replace("\\", "/")  # normaliza separador p/ Markdown
+                    if tag == "img":
+                        # só o candidato escolhido foi baixado: o navegador deve usar o src local
+                        for extra in ("srcset", "sizes"):
+                            node.attrs.pop(extra, None)
+                        if node.parent is not None and node.parent.name == "picture":
+                            for fonte in node.parent.find_all("source"):
+                                if fonte.get("srcset"):
+                                    fonte.decompose()
+
+        # url() em atributos style e blocos <style>
+        def local_css(url: str):
+            rel = rel_for(url)
+            return rel.replace("\\", "/") if rel else None
+
+        for node in soup.find_all(style=True):
+            node["style"] = reescrever_urls_css(node["style"], base_url, local_css)
+        for bloco in soup.find_all("style"):
+            if bloco.string:
+                bloco.string.replace_with(reescrever_urls_css(bloco.string, base_url, local_css))
+
+        return str(soup)
+
+    @staticmethod
+    def _urls_faltando_em_css(recursos: dict, lidos: set) -> set:
+        """URLs de url()/@import dos CSS ainda não lidos (anota em `lidos`) que não foram baixadas."""
+        faltando = set()
+        for local, meta in list(recursos["meta"].items()):
+            if meta["mime"] != "text/css" or local in lidos:
+                continue
+            lidos.add(local)
+            texto = Path(local).read_text(encoding="utf-8", errors="replace")
+            faltando.update(u for u in urls_css(texto, meta["url"]) if u not in recursos["map"])
+        return faltando
+
+    def _reescrever_css_locais(self, recursos: dict):
+        """Aponta os url()/@import dos CSS arquivados para as cópias locais (caminho relativo)."""
+        for local, meta in recursos["meta"].items():
+            if meta.get("mime") != "text/css":
+                continue
+            css = Path(local)
+
+            def local_para(url: str):
+                destino = recursos["map"].get(url)
+                return os.path.relpath(destino, start=css.parent).replace("\\", "/") if destino else None
+
+            texto = css.read_text(encoding="utf-8", errors="replace")
+            novo = reescrever_urls_css(texto, meta["url"], local_para)
+            if novo != texto:
+                gravar_atomico(css, novo)
+
+    def _attach_cookies_from_driver(self, driver, session: requests.Session):
+        """Copia cookies do Selenium para a sessão requests (útil p/ páginas autenticadas)."""
+        try:
+            cookies = driver.get_cookies()
+        except Exception:
+            cookies = []
+        for c in cookies:
+            try:
+                session.cookies.set(
+                    c.get("name"), c.get("value"),
+                    domain=c.get("domain"), path=c.get("path", "/")
+                )
+            except Exception:
+                pass
+
+    def _auto_scroll(self, driver, pause=0.8, max_steps=20, job=None):
+        """Rola a página até estabilizar a altura (ou atingir max_steps)."""
+        last_h = 0
+        for _ in range(max_steps):
+            if job:
+                job.checar()
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            time.sleep(pause)
+            h = driver.execute_script("return document.body.scrollHeight") or 0
+            if h == last_h:
+                break
+            last_h = h
+
+    def _slugify_url(self, url: str) -> str:
+        parsed = urlparse(url)
+        text = f"{parsed.netloc}{parsed.path}"
+        text = re.sub(r"[^a-zA-Z0-9_-]+", "_", text).strip("_")
+        return text or "pagina"
+
+    # ------------------ Descrição de imagens (backends) ----------------
+
+    def _legendagem_disponivel(self) -> bool:
+        """Backends locais não precisam de chave; o da OpenAI precisa."""
+        if self.config.caption_backend != "openai":
+            return True
+        if not os.getenv("OPENAI_API_KEY"):
+            load_openai_key_from_file()
+        return bool(os.getenv("OPENAI_API_KEY"))
+
+    def _legendador(self, nome: str) -> Legendador:
+        """Instâncias por conversor (clientes reaproveitados e métricas por job)."""
+        with self._legendadores_lock:  # a captura legenda em paralelo
+            leg = self._legendadores.get(nome)
+            if leg is None:
+                model = self.config.model.strip() or DEFAULT_MODEL
+                prompt = self.config.prompt.strip() or DEFAULT_PROMPT
+                if nome == "ocr":
+                    leg = LegendadorOCR()
+                elif nome == "modelo-local":
+                    leg = LegendadorModeloLocal()
+                elif nome == "servidor-local":
+                    leg = LegendadorServidorLocal(model, prompt, self.config.caption_base_url.strip()
+                                                  or LOCAL_SERVER_URL)
+                else:
+                    leg = LegendadorOpenAI(model, prompt)
+                self._legendadores[nome] = leg
+            return leg
+
+    def _legendar_bytes(self, dados: bytes, mime: str, texto: bool | None = None) -> str:
+        """
+        Escolhe o backend pela configuração e pelo tipo de imagem: prints de tela
+        com muito texto vão para o OCR (se ligado); se o OCR achar pouco texto,
+        cai no backend configurado. `texto` é a resposta da triagem, quando já houve
+        uma; None usa a heurística `parece_captura_de_texto`.
+        """
+        if texto is None:
+            texto = parece_captura_de_texto(dados, mime)
+        if self.config.ocr_screenshots and texto:
+            try:
+                legenda = self._legendar_com("ocr", dados, mime)
+                if legenda:
+                    self.registro.contar("legendas_via_ocr")
+                    return legenda
+            except Exception as e:
+                self._log(f"⚠ OCR indisponível ({e}); usando {self.config.caption_backend}.")
+        return self._legendar_com(self.config.caption_backend, dados, mime)
+
+    def _legendar_com(self, nome: str, dados: bytes, mime: str) -> str:
+        with governador.reservar("chamadas_api"):
+            t0 = time.perf_counter()
+            try:
+                return self._legendador(nome).legendar(dados, mime)
+            finally:
+                self.registro.latencia(f"legendagem.{nome}", time.perf_counter() - t0)
+
+    def _relatar_legendadores(self):
+        for leg in self._legendadores.values():
+            if leg.chamadas:
+                self._log(f"• Legendagem {leg.resumo()}")
+
+    def _gerar_alt_para_imagem(self, img_path: Path, mime: str | None = None,
+                               texto: bool | None = None) -> str:
+        """
+        Gera **apenas** o texto ALT (string) pelo backend de legendagem configurado.
+        `mime` (o real, detectado no download) evita adivinhar pela extensão;
+        `texto` vem da triagem (ver `_legendar_bytes`).
+        """
+        mime = mime or mimetypes.guess_type(img_path.name)[0]
+        try:
+            return self._legendar_bytes(img_path.read_bytes(), mime or "image/png", texto)
+        except Exception as e:
+            self._log(f"Erro de legendagem ({self.config.caption_backend}): {e}")
+            return ""
+
+    def _descrever_imagem_via_openai(self, file_path: Path, pasta: Path | None = None) -> str:
+        """
+        Constrói um Markdown simples com ALT + legenda para uma
+        *imagem isolada*, usando o backend de legendagem configurado
+        (por padrão, a Responses API com data URL Base64).
+        """
+        if not self._legendagem_disponivel():
+            raise RuntimeError("OPENAI_API_KEY não definido.")
+
+        alt = self._gerar_alt_para_imagem(file_path)
+        return self._markdown_imagem(file_path, alt, pasta)
+
+    def _markdown_imagem(self, file_path: Path, alt: str, pasta: Path | None = None) -> str:
+        """
+        Markdown de uma imagem isolada: link + descrição + rodapé (ALT pode ser um marcador de lote).
+        `pasta` é onde fica o .md (padrão: output_dir; membros de compactados ficam em subpastas).
+        """
+        target_img = self._copiar_imagem(file_path, pasta)
+        md = []
+        md.append(f"![{alt}]({target_img.name})\n")
+        md.append("**Descrição:** " + (alt or "(sem descrição)") + "\n")
+        md.append(f"\n<sub>Gerado por {self._rotulo_legendagem()} em "
+                  f"{datetime.now().isoformat(timespec='seconds')}</sub>\n")
+        return "".join(md)
+
+    def _copiar_imagem(self, file_path: Path, pasta: Path | None = None) -> Path:
+        """Garante que a imagem exista ao lado do .md (para o link) e devolve o caminho da cópia."""
+        target_img = (pasta or self.output_dir) / file_path.name
+        if not target_img.exists():
+            shutil.copy2(file_path, target_img)
+        return target_img
+
+    def _rotulo_legendagem(self) -> str:
+        backend = self.config.caption_backend
+        if backend == "modelo-local":
+            return f"{LOCAL_CAPTION_MODEL} (modelo local)"
+        if backend == "servidor-local" and self.config.desc_mode != "batch":
+            return f"{self.config.model} (servidor local)"
+        return self.config.model
+
+    # ------------------ OpenAI em lote (Batch API) ---------------------
+
+    def _descrever_imagem_em_lote(self, file_path: Path, out: Path) -> str:
+        """Como `_descrever_imagem_via_openai`, mas com marcador no lugar do ALT (preenchido pelo lote)."""
+        if not os.getenv("OPENAI_API_KEY"):
+            raise RuntimeError("OPENAI_API_KEY não definido.")
+        lote = self._lote_legendas()
+        lote.registrar_markdown(out)
+        # o lote só lê a imagem no envio: enfileira a cópia ao lado do .md, não o original
+        # (membros de compactados vêm de temporários apagados logo após a conversão)
+        copia = self._copiar_imagem(file_path, out.parent)
+        return self._markdown_imagem(file_path, lote.adicionar(copia), out.parent)
+
+    def _lote_legendas(self) -> LoteLegendas:
+        if self._lote is None:
+            self._lote = LoteLegendas(
+                self.output_dir,
+                model=self.config.model.strip() or DEFAULT_MODEL,
+                prompt=self.config.prompt.strip() or DEFAULT_PROMPT,
+                log=self._log,
+            )
+        return self._lote
+
+    def _submeter_lote(self):
+        """Envia o lote acumulado (se houver) e começa um novo na próxima imagem."""
+        if self._lote is None or not self._lote.itens:
+            return
+        if not os.getenv("OPENAI_API_KEY"):
+            load_openai_key_from_file()
+        if not os.getenv("OPENAI_API_KEY"):
+            self._log("⚠ OPENAI_API_KEY não definido; lote de descrições não enviado.")
+        else:
+            try:
+                self._lote.submeter()
+            except Exception as e:
+                self._log(f"✗ Erro enviando lote OpenAI: {e}")
+        self._lote = None
+
+    def aguardar_lotes(self, job: Job | None = None) -> int:
+        """
+        Consulta os lotes pendentes a cada BATCH_POLL_SECONDS e mescla os
+        concluídos nos .md, até não sobrar nenhum (ou o job ser cancelado).
+        Retorna quantos manifestos foram mesclados.
+        """
+        job = job or Job("aguardar_lotes")
+        total = 0
+        while True:
+            job.checar()
+            mesclados, pendentes = LoteLegendas.verificar_pendentes(self.output_dir, log=self._log)
+            total += mesclados
+            if not pendentes:
+                return total
+            job.progresso(0, 1, f"{pendentes} lote(s) em processamento")
+            for _ in range(BATCH_POLL_SECONDS):
+                job.checar()
+                time.sleep(1)
+
+
+# ============== Serviço HTTP (conversão sob demanda) ============
+
+class ErroServico(Exception):
+    """Erro de pedido no serviço HTTP; `status` vira o código da resposta."""
+
+    def __init__(self, status: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+
+
+class ServicoOcupado(ErroServico):
+    def __init__(self):
+        super().__init__(503, "serviço ocupado; tente novamente")
+
+
+class ServicoConversao:
+    """
+    Pool de conversores prontos para o servidor HTTP local.
+    Cada conversor mantém o MarkItDown e os clientes de legendagem entre pedidos;
+    sessões do Firefox (opcionais) também ficam abertas e são reaproveitadas.
+    Pedidos além de `workers + fila` recebem 503 na hora (backpressure).
+    """
+
+    def __init__(self, config: ConfigConversao, workers: int = SERVICE_WORKERS,
+                 fila: int = SERVICE_QUEUE, navegadores: int = 0, log=None):
+        self.config = config
+        self.workers = workers
+        self.navegadores = navegadores
+        self._log = log or print
+        self._vagas = threading.BoundedSemaphore(workers + fila)
+        self._conversores: queue.Queue[ConversorMarkdown] = queue.Queue()
+        self._drivers: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.atendidos = 0
+        self.rejeitados = 0
+        self.falhas = 0
+        self._indice: IndiceMarkdown | None = None
+
+        for _ in range(workers):
+            conv = ConversorMarkdown(config, log=self._log)
+            conv.aquecer()
+            self._conversores.put(conv)
+        for _ in range(navegadores):
+            self._drivers.put(self._novo_driver())
+        self._log(f"Serviço pronto: {workers} conversor(es), {navegadores} sessão(ões) do Firefox.")
+
+    def _novo_driver(self):
+        conv = self._conversores.queue[0]
+        return conv._criar_driver(Path(tempfile.mkdtemp(prefix="mkd_srv_")))
+
+    def _contar(self, campo: str):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    @contextmanager
+    def vaga(self):
+        """Reserva lugar no serviço (em execução ou na fila) ou levanta ServicoOcupado."""
+        if not self._vagas.acquire(blocking=False):
+            self._contar("rejeitados")
+            raise ServicoOcupado()
+        try:
+            yield
+        finally:
+            self._vagas.release()
+
+    @contextmanager
+    def conversor(self):
+        """Empresta um conversor quente; espera até SERVICE_QUEUE_WAIT_S por um livre."""
+        try:
+            conv = self._conversores.get(timeout=SERVICE_QUEUE_WAIT_S)
+        except queue.Empty:
+            self._contar("rejeitados")
+            raise ServicoOcupado()
+        ok = False
+        try:
+            yield conv
+            ok = True
+        finally:
+            self._conversores.put(conv)
+            self._contar("atendidos" if ok else "falhas")
+
+    @contextmanager
+    def _driver(self):
+        """Sessão do Firefox do pool; sem pool (ou sem sessão livre) a captura abre a sua."""
+        driver = None
+        if self.navegadores:
+            try:
+                driver = self._drivers.get(timeout=SERVICE_QUEUE_WAIT_S)
+            except queue.Empty:
+                pass
+        if driver is None:
+            yield None
+            return
+        try:
+            yield driver
+            driver.delete_all_cookies()  # nada de sessão vazando entre pedidos
+        except Exception:
+            # sessão possivelmente quebrada: troca por uma nova
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            try:
+                driver = self._novo_driver()
+            except Exception as e:
+                self._log(f"⚠ Não consegui reabrir o Firefox do pool: {e}")
+                driver = None
+            raise
+        finally:
+            if driver is not None:
+                self._drivers.put(driver)
+
+    def converter_arquivo(self, caminho: Path) -> str:
+        with self.conversor() as conv:
+            return conv.converter_avulso(caminho)
+
+    def capturar_url(self, url: str) -> str:
+        # a sessão do Firefox só sai do pool se a página precisar do navegador
+        with self.conversor() as conv, ExitStack() as pilha:
+            md_nome = conv.capturar_converter_url(
+                url, obter_driver=lambda: pilha.enter_context(self._driver()))
+            return (conv.output_dir / md_nome).read_text(encoding="utf-8")
+
+    def buscar(self, consulta: str, limite: int) -> list[dict]:
+        """Consulta o índice de busca (não ocupa conversor nem vaga: é só leitura no SQLite)."""
+        with self._lock:
+            if self._indice is None:
+                self._indice = IndiceMarkdown(self.config.output_dir)
+        return self._indice.buscar(consulta, limite)
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "conversores_livres": self._conversores.qsize(),
+                "navegadores_livres": self._drivers.qsize(),
+                "atendidos": self.atendidos,
+                "rejeitados": self.rejeitados,
+                "falhas": self.falhas,
+                "recursos": governador.estado(),
+            }
+
+    def fechar(self):
+        while True:
+            try:
+                driver = self._drivers.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+class _ServicoHandler(BaseHTTPRequestHandler):
+    """
+    POST /converter?nome=arquivo.pdf   corpo = bytes do arquivo
+    POST /capturar?url=https://…       (ou corpo JSON {"url": "…"})
+    GET  /saude                        estado do pool (JSON)
+    GET  /buscar?q=termos&limite=20    busca no índice dos .md gerados (JSON)
+    A resposta de sucesso é o Markdown em text/markdown, enviado em blocos (chunked).
+    """
+    servico: ServicoConversao = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        self.servico._log(f"[http] {self.address_string()} {fmt % args}")
+
+    def do_GET(self):
+        rota = urlparse(self.path)
+        if rota.path == "/saude":
+            self._json(200, self.servico.estado())
+        elif rota.path == "/buscar":
+            params = {k: v[-1] for k, v in parse_qs(rota.query).items()}
+            if not params.get("q", "").strip():
+                self._json(400, {"erro": "informe ?q="})
+                return
+            try:
+                limite = max(1, min(200, int(params.get("limite", 20))))
+                t0 = time.perf_counter()
+                hits = self.servico.buscar(params["q"], limite)
+            except (ValueError, sqlite3.Error) as e:
+                self._json(400, {"erro": str(e)})
+                return
+            self._json(200, {"resultados": hits, "ms": round(1000 * (time.perf_counter() - t0), 1)})
+        else:
+            self._json(404, {"erro": "rota desconhecida"})
+
+    def do_POST(self):
+        rota = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(rota.query).items()}
+        try:
+            if rota.path not in ("/converter", "/capturar"):
+                raise ErroServico(404, "rota desconhecida")
+            with self.servico.vaga():
+                if rota.path == "/converter":
+                    markdown = self._converter(params)
+                else:
+                    markdown = self._capturar(params)
+        except ErroServico as e:
+            extra = {"Retry-After": str(SERVICE_RETRY_AFTER_S)} if e.status == 503 else {}
+            self._json(e.status, {"erro": str(e)}, extra)
+        except Exception as e:
+            self._json(500, {"erro": str(e)})
+        else:
+            self._markdown(markdown)
+
+    # --------------------------- pedidos -------------------------------
+
+    def _tamanho_corpo(self) -> int:
+        try:
+            tamanho = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise ErroServico(411, "Content-Length obrigatório")
+        if tamanho > SERVICE_MAX_UPLOAD_BYTES:
+            raise ErroServico(413, f"arquivo maior que {SERVICE_MAX_UPLOAD_BYTES} bytes")
+        return tamanho
+
+    def _converter(self, params: dict) -> str:
+        nome = Path(params.get("nome") or self.headers.get("X-Nome-Arquivo") or "").name
+        if Path(nome).suffix.lower() not in TARGET_FORMATS:
+            raise ErroServico(415, f"extensão não suportada: {nome or '(sem nome)'}")
+        restante = self._tamanho_corpo()
+        with tempfile.TemporaryDirectory(prefix="mkd_srv_") as tmp:
+            # o upload vai para o disco em blocos, antes de ocupar um conversor
+            caminho = Path(tmp) / nome
+            with open(caminho, "wb") as f:
+                while restante > 0:
+                    bloco = self.rfile.read(min(SERVICE_CHUNK_BYTES, restante))
+                    if not bloco:
+                        raise ErroServico(400, "corpo incompleto")
+                    f.write(bloco)
+                    restante -= len(bloco)
+            return self.servico.converter_arquivo(caminho)
+
+    def _capturar(self, params: dict) -> str:
+        url = params.get("url", "")
+        if not url:
+            corpo = self.rfile.read(self._tamanho_corpo()) if self.headers.get("Content-Length") else b""
+            try:
+                url = (json.loads(corpo or b"{}").get("url") or "").strip()
+            except (ValueError, AttributeError):
+                raise ErroServico(400, "corpo JSON inválido")
+        if urlparse(url).scheme not in ("http", "https"):
+            raise ErroServico(400, "informe uma URL http(s)")
+        return self.servico.capturar_url(url)
+
+    # -------------------------- respostas ------------------------------
+
+    def _json(self, status: int, dados: dict, headers: dict | None = None):
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if status >= 400:
+            # o corpo do pedido pode não ter sido lido: não reaproveita a conexão
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _markdown(self, markdown: str):
+        dados = memoryview(markdown.encode("utf-8"))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/markdown; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(dados), SERVICE_CHUNK_BYTES):
+            parte = dados[i:i + SERVICE_CHUNK_BYTES]
+            self.wfile.write(f"{len(parte):X}\r\n".encode("ascii"))
+            self.wfile.write(parte)
+            self.wfile.write(b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def servir(config: ConfigConversao, host: str = SERVICE_HOST, porta: int = SERVICE_PORT,
+           workers: int = SERVICE_WORKERS, fila: int = SERVICE_QUEUE, navegadores: int = 0):
+    """Sobe o servidor HTTP local (bloqueia até Ctrl+C)."""
+    config.output_dir.mkdir(parents=True, exist_ok=True)
+    servico = ServicoConversao(config, workers=workers, fila=fila, navegadores=navegadores)
+    handler = type("ServicoHandler", (_ServicoHandler,), {"servico": servico})
+    httpd = ThreadingHTTPServer((host, porta), handler)
+    httpd.daemon_threads = True
+    print(f"Servindo em http://{host}:{porta} (saída em {config.output_dir}) — Ctrl+C encerra.")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        servico.fechar()
+
+
+# ============ Fila distribuída (produtor / workers) =============
+
+class FilaTrabalho:
+    """
+    Contrato dos backends de fila. Itens são dicts com id, tipo ('arquivo' | 'url'),
+    alvo (caminho absoluto no armazenamento compartilhado ou URL), tentativas,
+    max_tentativas e erro.
+      arrendar()  entrega um item por `lease_s` segundos; vencido o prazo sem
+                  concluir/renovar (worker caiu), o item volta a ficar visível;
+      renovar()   estende o prazo (False se o arrendamento foi perdido);
+      concluir()  / falhar()  encerram o arrendamento; falhar() reagenda com
+                  espera crescente até esgotar as tentativas;
+      devolver()  solta o item sem contar a tentativa (worker encerrado).
+    """
+
+    def enfileirar(self, tipo: str, alvos: list[str], max_tentativas: int = QUEUE_MAX_ATTEMPTS) -> int:
+        raise NotImplementedError
+
+    def arrendar(self, dono: str, lease_s: int = QUEUE_LEASE_S) -> dict | None:
+        raise NotImplementedError
+
+    def renovar(self, item: dict, dono: str, lease_s: int = QUEUE_LEASE_S) -> bool:
+        raise NotImplementedError
+
+    def concluir(self, item: dict, dono: str, resultado: str = ""):
+        raise NotImplementedError
+
+    def falhar(self, item: dict, dono: str, erro: str):
+        raise NotImplementedError
+
+    def devolver(self, item: dict, dono: str):
+        raise NotImplementedError
+
+    def repetir_falhos(self) -> int:
+        raise NotImplementedError
+
+    def estatisticas(self) -> dict:
+        raise NotImplementedError
+
+    def fechar(self):
+        pass
+
+    @staticmethod
+    def _espera(tentativas: int) -> float:
+        return QUEUE_RETRY_BACKOFF_S * 2 ** max(0, tentativas - 1)
+
+
+class FilaSQLite(FilaTrabalho):
+    """
+    Fila em um arquivo SQLite (padrão). Usa o journal clássico (não WAL), que funciona
+    com vários processos — inclusive em outras máquinas, se o compartilhamento de rede
+    tiver travas de arquivo confiáveis; se não tiver, use a FilaDiretorio.
+    """
+
+    def __init__(self, caminho: Path):
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(caminho), timeout=60, isolation_level=None,
+                                   check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=DELETE")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS itens ("
+            " id INTEGER PRIMARY KEY, tipo TEXT NOT NULL, alvo TEXT NOT NULL,"
+            " estado TEXT NOT NULL DEFAULT 'pendente', tentativas INTEGER NOT NULL DEFAULT 0,"
+            " max_tentativas INTEGER NOT NULL, visivel_em REAL NOT NULL, dono TEXT,"
+            " erro TEXT, resultado TEXT, criado TEXT, atualizado TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS itens_visiveis ON itens (estado, visivel_em)")
+
+    @contextmanager
+    def _transacao(self):
+        # BEGIN IMMEDIATE: o arrendamento é atômico entre processos
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _agora_iso() -> str:
+        return datetime.now().isoformat(timespec="seconds")
+
+    def _item(self, row) -> dict:
+        return dict(zip(("id", "tipo", "alvo", "tentativas", "max_tentativas", "erro"), row))
+
+    def enfileirar(self, tipo, alvos, max_tentativas=QUEUE_MAX_ATTEMPTS) -> int:
+        novos = 0
+        with self._transacao() as db:
+            for alvo in alvos:
+                # o mesmo alvo ainda pendente/em andamento não entra de novo
+                cur = db.execute(
+                    "INSERT INTO itens (tipo, alvo, max_tentativas, visivel_em, criado, atualizado)"
+                    " SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM itens"
+                    " WHERE tipo = ? AND alvo = ? AND estado IN ('pendente', 'arrendado'))",
+                    (tipo, alvo, max_tentativas, time.time(), self._agora_iso(), self._agora_iso(), tipo, alvo))
+                novos += cur.rowcount
+        return novos
+
+    def arrendar(self, dono, lease_s=QUEUE_LEASE_S):
+        agora = time.time()
+        with self._transacao() as db:
+            # arrendamentos vencidos de quem já gastou todas as tentativas → falhou
+            db.execute(
+                "UPDATE itens SET estado = 'falhou', erro = 'arrendamento expirou (worker caiu?)',"
+                " atualizado = ? WHERE estado = 'arrendado' AND visivel_em <= ? AND tentativas >= max_tentativas",
+                (self._agora_iso(), agora))
+            row = db.execute(
+                "SELECT id, tipo, alvo, tentativas, max_tentativas, erro FROM itens"
+                " WHERE estado IN ('pendente', 'arrendado') AND visivel_em <= ? ORDER BY visivel_em, id LIMIT 1",
+                (agora,)).fetchone()
+            if not row:
+                return None
+            db.execute(
+                "UPDATE itens SET estado = 'arrendado', dono = ?, visivel_em = ?,"
+                " tentativas = tentativas + 1, atualizado = ? WHERE id = ?",
+                (dono, agora + lease_s, self._agora_iso(), row[0]))
+        item = self._item(row)
+        item["tentativas"] += 1
+        return item
+
+    def renovar(self, item, dono, lease_s=QUEUE_LEASE_S) -> bool:
+        with self._transacao() as db:
+            cur = db.execute(
+                "UPDATE itens SET visivel_em = ? WHERE id = ? AND dono = ? AND estado = 'arrendado'",
+                (time.time() + lease_s, item["id"], dono))
+        return cur.rowcount == 1
+
+    def concluir(self, item, dono, resultado=""):
+        with self._transacao() as db:
+            db.execute(
+                "UPDATE itens SET estado = 'concluido', resultado = ?, erro = NULL, atualizado = ?"
+                " WHERE id = ? AND dono = ? AND estado = 'arrendado'",
+                (resultado, self._agora_iso(), item["id"], dono))
+
+    def falhar(self, item, dono, erro):
+        esgotou = item["tentativas"] >= item["max_tentativas"]
+        with self._transacao() as db:
+            db.execute(
+                "UPDATE itens SET estado = ?, erro = ?, visivel_em = ?, atualizado = ?"
+                " WHERE id = ? AND dono = ? AND estado = 'arrendado'",
+                ("falhou" if esgotou else "pendente", erro, time.time() + self._espera(item["tentativas"]),
+                 self._agora_iso(), item["id"], dono))
+
+    def devolver(self, item, dono):
+        with self._transacao() as db:
+            db.execute(
+                "UPDATE itens SET estado = 'pendente', visivel_em = ?, tentativas = tentativas - 1,"
+                " atualizado = ? WHERE id = ? AND dono = ? AND estado = 'arrendado'",
+                (time.time(), self._agora_iso(), item["id"], dono))
+
+    def repetir_falhos(self) -> int:
+        with self._transacao() as db:
+            cur = db.execute(
+                "UPDATE itens SET estado = 'pendente', tentativas = 0, visivel_em = ?, atualizado = ?"
+                " WHERE estado = 'falhou'", (time.time(), self._agora_iso()))
+        return cur.rowcount
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return dict(self._db.execute("SELECT estado, COUNT(*) FROM itens GROUP BY estado"))
+
+    def fechar(self):
+        with self._lock:
+            self._db.close()
+
+
+class FilaDiretorio(FilaTrabalho):
+    """
+    Fila em diretórios, sem banco: um JSON por item e `os.rename` (atômico) como trava.
+      pendentes/<visível-em>-<id>.json        (o nome ordena por horário de visibilidade)
+      arrendados/<prazo>-<id>-<dono>.json     (o prazo no nome é o visibility timeout)
+      concluidos/<id>.json, falhos/<id>.json
+    Indicada para armazenamento compartilhado (NFS/SMB) sem travas confiáveis para o SQLite.
+    """
+    PASTAS = ("pendentes", "arrendados", "concluidos", "falhos")
+
+    def __init__(self, raiz: Path):
+        self.raiz = raiz
+        for nome in self.PASTAS:
+            (raiz / nome).mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _ts(t: float) -> str:
+        return f"{int(t * 1000):015d}"
+
+    @staticmethod
+    def _dono_seguro(dono: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.]+", "_", dono)
+
+    def _ler(self, caminho: Path) -> dict:
+        return json.loads(caminho.read_text(encoding="utf-8"))
+
+    def _mover(self, origem: Path, destino: Path, dados: dict | None = None) -> bool:
+        """
+        Rename atômico; False se outro processo levou o arquivo antes. Com `dados`, o item
+        é primeiro tomado para um nome oculto (fora dos glob "*.json"), regravado e só então
+        posto em `destino`: ninguém arrenda a versão antiga nem o vê em duas pastas.
+        """
+        if dados is None:
+            try:
+                os.rename(origem, destino)
+            except FileNotFoundError:
+                return False
+            return True
+        privado = origem.with_name(f".{origem.name}.{os.getpid()}.{threading.get_ident()}.mov")
+        try:
+            os.rename(origem, privado)
+        except FileNotFoundError:
+            return False
+        gravar_atomico(privado, json.dumps(dados, ensure_ascii=False))
+        os.rename(privado, destino)
+        return True
+
+    def _arrendado(self, item: dict, dono: str) -> Path | None:
+        """Arquivo do arrendamento do item, só se ainda for deste dono (senão expirou e foi re-arrendado)."""
+        achados = list((self.raiz / "arrendados").glob(f"*-{item['id']}-{self._dono_seguro(dono)}.json"))
+        return achados[0] if achados else None
+
+    def enfileirar(self, tipo, alvos, max_tentativas=QUEUE_MAX_ATTEMPTS) -> int:
+        ativos = {(d.get("tipo"), d.get("alvo")) for pasta in ("pendentes", "arrendados")
+                  for d in self._listar(pasta)}
+        novos = 0
+        for alvo in alvos:
+            if (tipo, alvo) in ativos:
+                continue
+            item = {"id": uuid.uuid4().hex[:16], "tipo": tipo, "alvo": alvo, "tentativas": 0,
+                    "max_tentativas": max_tentativas, "erro": None,
+                    "criado": datetime.now().isoformat(timespec="seconds")}
+            gravar_atomico(self.raiz / "pendentes" / f"{self._ts(time.time())}-{item['id']}.json",
+                           json.dumps(item, ensure_ascii=False))
+            ativos.add((tipo, alvo))
+            novos += 1
+        return novos
+
+    def _listar(self, pasta: str):
+        for arq in (self.raiz / pasta).glob("*.json"):
+            try:
+                yield self._ler(arq)
+            except (OSError, ValueError):
+                continue  # movido/gravado por outro processo neste instante
+
+    def _recuperar_vencidos(self, agora: float):
+        """Arrendamentos vencidos voltam para pendentes (ou falhos, se esgotaram as tentativas)."""
+        for arq in (self.raiz / "arrendados").glob("*.json"):
+            prazo = arq.name.split("-", 1)[0]
+            if not prazo.isdigit() or int(prazo) > agora * 1000:
+                continue
+            try:
+                dados = self._ler(arq)
+            except (OSError, ValueError):
+                continue
+            if dados["tentativas"] >= dados["max_tentativas"]:
+                dados["erro"] = "arrendamento expirou (worker caiu?)"
+                self._mover(arq, self.raiz / "falhos" / f"{dados['id']}.json", dados)
+            else:
+                self._mover(arq, self.raiz / "pendentes" / f"{self._ts(agora)}-{dados['id']}.json")
+
+    def arrendar(self, dono, lease_s=QUEUE_LEASE_S):
+        agora = time.time()
+        self._recuperar_vencidos(agora)
+        limite = self._ts(agora)
+        for arq in sorted((self.raiz / "pendentes").glob("*.json")):
+            visivel, _, resto = arq.name.partition("-")
+            if visivel > limite:
+                break  # os seguintes ficam visíveis ainda mais tarde
+            item_id = resto[:-len(".json")]
+            destino = (self.raiz / "arrendados" /
+                       f"{self._ts(agora + lease_s)}-{item_id}-{self._dono_seguro(dono)}.json")
+            if not self._mover(arq, destino):
+                continue  # outro worker pegou
+            dados = self._ler(destino)
+            dados["tentativas"] += 1
+            dados["dono"] = dono
+            gravar_atomico(destino, json.dumps(dados, ensure_ascii=False))
+            return dados
+        return None
+
+    def renovar(self, item, dono, lease_s=QUEUE_LEASE_S) -> bool:
+        atual = self._arrendado(item, dono)
+        if atual is None:
+            return False
+        novo = atual.with_name(f"{self._ts(time.time() + lease_s)}-{item['id']}-{self._dono_seguro(dono)}.json")
+        return self._mover(atual, novo)
+
+    def concluir(self, item, dono, resultado=""):
+        atual = self._arrendado(item, dono)
+        if atual is not None:
+            dados = dict(item, resultado=resultado, erro=None,
+                         atualizado=datetime.now().isoformat(timespec="seconds"))
+            self._mover(atual, self.raiz / "concluidos" / f"{item['id']}.json", dados)
+
+    def falhar(self, item, dono, erro):
+        atual = self._arrendado(item, dono)
+        if atual is None:
+            return
+        dados = dict(item, erro=erro, atualizado=datetime.now().isoformat(timespec="seconds"))
+        if item["tentativas"] >= item["max_tentativas"]:
+            self._mover(atual, self.raiz / "falhos" / f"{item['id']}.json", dados)
+        else:
+            visivel = time.time() + self._espera(item["tentativas"])
+            self._mover(atual, self.raiz / "pendentes" / f"{self._ts(visivel)}-{item['id']}.json", dados)
+
+    def devolver(self, item, dono):
+        atual = self._arrendado(item, dono)
+        if atual is not None:
+            dados = dict(item, tentativas=max(0, item["tentativas"] - 1))
+            self._mover(atual, self.raiz / "pendentes" / f"{self._ts(time.time())}-{item['id']}.json", dados)
+
+    def repetir_falhos(self) -> int:
+        n = 0
+        for arq in (self.raiz / "falhos").glob("*.json"):
+            dados = self._ler(arq)
+            dados["tentativas"] = 0
+            if self._mover(arq, self.raiz / "pendentes" / f"{self._ts(time.time())}-{dados['id']}.json", dados):
+                n += 1
+        return n
+
+    def estatisticas(self) -> dict:
+        nomes = {"pendentes": "pendente", "arrendados": "arrendado", "concluidos": "concluido", "falhos": "falhou"}
+        return {nomes[p]: sum(1 for _ in (self.raiz / p).glob("*.json")) for p in self.PASTAS}
+
+
+def abrir_fila(spec: str) -> FilaTrabalho:
+    """
+    'sqlite:/caminho/fila.sqlite3' ou 'dir:/caminho/fila'; sem prefixo, arquivos
+    .sqlite3/.sqlite/.db usam SQLite e o resto é tratado como diretório.
+    """
+    tipo, _, caminho = spec.partition(":") if spec.startswith(("sqlite:", "dir:")) else ("", "", spec)
+    caminho = Path(caminho).expanduser().resolve()
+    if tipo == "sqlite" or (not tipo and caminho.suffix in (".sqlite3", ".sqlite", ".db")):
+        return FilaSQLite(caminho)
+    return FilaDiretorio(caminho)
+
+
+def executar_worker(fila: FilaTrabalho, config: ConfigConversao, dono: str,
+                    lease_s: int = QUEUE_LEASE_S, ocioso_s: float = QUEUE_IDLE_S,
+                    sair_quando_vazia: bool = False, log=None) -> dict:
+    """
+    Laço do worker: arrenda um item, converte (arquivo) ou captura (URL) com um
+    ConversorMarkdown mantido entre itens, e conclui/falha o item. Uma thread renova
+    o arrendamento a cada lease_s/3; se ele for perdido, o item em andamento é cancelado.
+    Retorna a contagem de itens concluídos/falhos.
+    """
+    log = log or print
+    conv = ConversorMarkdown(config, log=log)
+    conv.aquecer()
+    contagem = {"concluidos": 0, "falhos": 0}
+    while True:
+        item = fila.arrendar(dono, lease_s)
+        if item is None:
+            if sair_quando_vazia:
+                return contagem
+            time.sleep(ocioso_s)
+            continue
+
+        job = Job(f"{item['tipo']} {item['alvo']}")
+        parar = threading.Event()
+
+        def _renovar():
+            while not parar.wait(lease_s / 3):
+                if not fila.renovar(item, dono, lease_s):
+                    log(f"⚠ Arrendamento perdido: {item['alvo']}; cancelando.")
+                    job.cancelar()
+                    return
+
+        renovador = threading.Thread(target=_renovar, name="renovar-arrendamento", daemon=True)
+        renovador.start()
+        log(f"→ [{dono}] {item['tipo']} {item['alvo']} (tentativa {item['tentativas']}/{item['max_tentativas']})")
+        try:
+            if item["tipo"] == "url":
+                resultado = conv.capturar_converter_url(item["alvo"], job=job)
+            else:
+                falhas = {}
+                caminho = Path(item["alvo"])
+                if not caminho.is_file():
+                    raise FileNotFoundError(f"não encontrado neste host: {caminho}")
+                conv.processar_arquivos([caminho], job=job, falhas=falhas)
+                if falhas:
+                    raise RuntimeError(falhas[caminho])
+                resultado = conv.saida_de(caminho).name
+        except JobCancelado:
+            continue  # arrendamento perdido: outro worker assume o item
+        except KeyboardInterrupt:
+            fila.devolver(item, dono)
+            raise
+        except Exception as e:
+            fila.falhar(item, dono, str(e) or type(e).__name__)
+            contagem["falhos"] += 1
+        else:
+            fila.concluir(item, dono, resultado)
+            contagem["concluidos"] += 1
+        finally:
+            parar.set()
+            renovador.join()
+
+
+# ========================= Aplicação ============================
+
+class MarkItDownApp(TkinterDnD.Tk):
+    def __init__(self):
+        super().__init__()
+        self.title("Conversor p/ Markdown • MarkItDown + OpenAI + Selenium")
+        self.geometry("760x840")
+
+        # saída: mesma pasta do programa
+        self.output_dir = base_dir
+
+        # Estado OpenAI / MarkItDown
+        self.use_openai = tk.BooleanVar(value=False)
+        self.model_name = tk.StringVar(value=DEFAULT_MODEL)
+        self.prompt_text = tk.StringVar(value=DEFAULT_PROMPT)
+        self.desc_mode = tk.StringVar(value="markitdown")  # "markitdown" | "direct" | "batch"
+        self.caption_backend = tk.StringVar(value="openai")
+        self.caption_base_url = tk.StringVar(value=LOCAL_SERVER_URL)
+        self.ocr_screenshots = tk.BooleanVar(value=False)
+        self.triagem_imagens = tk.BooleanVar(value=True)
+
+        # Estado Selenium (Firefox portátil por padrão)
+        self.url_text = tk.StringVar(value="")
+        self.gecko_path = tk.StringVar(value=str(base_dir / "firefox" / "geckodriver.exe"))
+        self.firefox_bin = tk.StringVar(value=str(base_dir / "firefox" / "firefox.exe"))
+        self.headless = tk.BooleanVar(value=True)
+        # Arquivamento: baixa todos os recursos (JS/CSS inclusos), não só os referenciados no .md
+        self.archive_assets = tk.BooleanVar(value=False)
+        # Recaptura incremental: pula páginas sem mudança desde a última captura
+        self.incremental = tk.BooleanVar(value=False)
+        # auto: HTTP direto; o Firefox só abre para páginas que dependem de JavaScript
+        self.modo_captura = tk.StringVar(value="auto")
+        # srcset: menor candidato com pelo menos esta largura
+        self.largura_imagem = tk.IntVar(value=IMG_TARGET_WIDTH)
+
+        # Métricas por execução (JSON lines / Prometheus) em output_dir/_metricas
+        self.metricas = tk.StringVar(value="jsonl")
+        # Pós-processamento do Markdown (nenhum / basico / compacto)
+        self.pos_processamento = tk.StringVar(value="basico")
+        # Diário de jobs: lotes interrompidos continuam de onde pararam
+        self.retomar = tk.BooleanVar(value=True)
+
+        # Jobs em segundo plano: workers → fila de eventos → UI (via after())
+        self.eventos = queue.Queue()
+        self.jobs = GerenciadorJobs(self.eventos, workers=JOB_WORKERS)
+
+        self._criar_interface()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.after(EVENT_POLL_MS, self._consumir_eventos)
+
+    # ----------------------------- UI ---------------------------------
+
+    def _criar_interface(self):
+        info = (
+            "Arraste arquivos abaixo ou use 'Escolher arquivos'.\n"
+            f"Extensões: {', '.join(sorted(TARGET_FORMATS))} (também dentro de .zip/.tar)\n"
+            f"Saída (.md): {self.output_dir}"
+        )
+        tk.Label(self, text=info, justify="center").pack(pady=8)
+
+        # Área de drop
+        self.drop_area = tk.Label(self, text="⬇ Arraste arquivos aqui ⬇",
+                                  relief="ridge", borderwidth=2, width=70, height=4)
+        self.drop_area.pack(pady=6, padx=20, fill="x")
+        self.drop_area.drop_target_register(DND_FILES)
+        self.drop_area.dnd_bind("<<Drop>>", self._on_drop)
+
+        # File picker
+        row_btn = tk.Frame(self); row_btn.pack(pady=4)
+        tk.Button(row_btn, text="Escolher arquivos…", command=self._selecionar_arquivos)\
+            .pack(side="left", padx=5)
+        tk.Checkbutton(row_btn, text="Retomar lote interrompido (pular já convertidos)",
+                       variable=self.retomar).pack(side="left", padx=5)
+
+        # Painel OpenAI
+        p_ai = tk.LabelFrame(self, text="Descrição de imagens (OpenAI)")
+        p_ai.pack(padx=10, pady=8, fill="x")
+
+        tk.Checkbutton(p_ai, text="Descrever imagens (OpenAI)",
+                       variable=self.use_openai).pack(anchor="w", padx=8, pady=4)
+
+        r1 = tk.Frame(p_ai); r1.pack(fill="x", padx=8, pady=2)
+        tk.Label(r1, text="Modelo:").pack(side="left")
+        tk.Entry(r1, textvariable=self.model_name, width=20).pack(side="left", padx=6)
+
+        tk.Label(r1, text="Modo:").pack(side="left", padx=(10,0))
+        mode = ttk.Combobox(r1, state="readonly", width=30,
+                            values=["MarkItDown + OpenAI (recomendado)",
+                                    "OpenAI direto (Responses API)",
+                                    "OpenAI em lote (Batch API, noturno)"])
+        mode.current(0)
+        mode.bind("<<ComboboxSelected>>", lambda e: self._set_desc_mode(mode.current()))
+        mode.pack(side="left", padx=6)
+
+        r1b = tk.Frame(p_ai); r1b.pack(fill="x", padx=8, pady=2)
+        tk.Label(r1b, text="Backend:").pack(side="left")
+        backend = ttk.Combobox(r1b, state="readonly", width=30,
+                               values=["OpenAI (Responses API)",
+                                       "Servidor local (compatível c/ OpenAI)",
+                                       "Modelo local (CPU)"])
+        backend.current(0)
+        backend.bind("<<ComboboxSelected>>", lambda e: self._set_caption_backend(backend.current()))
+        backend.pack(side="left", padx=6)
+        tk.Label(r1b, text="Servidor:").pack(side="left", padx=(10, 0))
+        tk.Entry(r1b, textvariable=self.caption_base_url, width=28).pack(side="left", padx=6)
+
+        tk.Checkbutton(p_ai, text="OCR rápido para prints de tela com texto (Tesseract)",
+                       variable=self.ocr_screenshots).pack(anchor="w", padx=8)
+        tk.Checkbutton(p_ai, text="Triagem: não descrever ícones, blocos lisos e barras (NumPy + Pillow)",
+                       variable=self.triagem_imagens).pack(anchor="w", padx=8)
+
+        r2 = tk.Frame(p_ai); r2.pack(fill="x", padx=8, pady=6)
+        tk.Label(r2, text="Prompt:").pack(anchor="w")
+        tk.Entry(r2, textvariable=self.prompt_text).pack(fill="x")
+        tk.Button(r2, text="Aguardar e mesclar lotes pendentes", command=self._aguardar_lotes)\
+            .pack(anchor="w", pady=(4, 0))
+
+        # Painel Selenium / URL
+        p_sel = tk.LabelFrame(self, text="Capturar página com Selenium (Firefox)")
+        p_sel.pack(padx=10, pady=8, fill="x")
+
+        r3 = tk.Frame(p_sel); r3.pack(fill="x", padx=8, pady=4)
+        tk.Label(r3, text="URL(s):").pack(side="left")
+        tk.Entry(r3, textvariable=self.url_text).pack(side="left", fill="x", expand=True, padx=6)
+        tk.Button(r3, text="Lista…", command=self._carregar_lista_urls).pack(side="left")
+        tk.Button(r3, text="Capturar & Converter URL", command=self._capturar_converter_url)\
+            .pack(side="left", padx=6)
+
+        r4 = tk.Frame(p_sel); r4.pack(fill="x", padx=8, pady=4)
+        tk.Label(r4, text="GeckoDriver:").pack(side="left")
+        tk.Entry(r4, textvariable=self.gecko_path, width=45).pack(side="left", padx=6)
+        tk.Label(r4, text="Firefox bin:").pack(side="left", padx=(10,0))
+        tk.Entry(r4, textvariable=self.firefox_bin, width=34).pack(side="left", padx=6)
+        tk.Label(r4, text="Largura mín. imagens (px):").pack(side="left", padx=(10, 0))
+        tk.Spinbox(r4, from_=160, to=4096, increment=64, width=6,
+                   textvariable=self.largura_imagem).pack(side="left", padx=6)
+
+        r5 = tk.Frame(p_sel); r5.pack(fill="x", padx=8, pady=4)
+        tk.Checkbutton(r5, text="Headless (sem janela)", variable=self.headless)\
+            .pack(side="left")
+        tk.Checkbutton(r5, text="Arquivar página completa (JS/CSS/todas as imagens)",
+                       variable=self.archive_assets).pack(side="left", padx=(12, 0))
+        tk.Checkbutton(r5, text="Incremental (pular páginas sem mudanças)",
+                       variable=self.incremental).pack(side="left", padx=(12, 0))
+        tk.Label(r5, text="Captura:").pack(side="left", padx=(12, 0))
+        ttk.Combobox(r5, state="readonly", width=9, textvariable=self.modo_captura,
+                     values=CAPTURE_MODES).pack(side="left", padx=4)
+
+        # Jobs (fila, progresso e cancelamento)
+        p_jobs = tk.LabelFrame(self, text="Tarefas em segundo plano")
+        p_jobs.pack(padx=10, pady=4, fill="x")
+
+        self.jobs_view = ttk.Treeview(p_jobs, columns=("estado", "progresso"), height=4)
+        self.jobs_view.heading("#0", text="Tarefa")
+        self.jobs_view.heading("estado", text="Estado")
+        self.jobs_view.heading("progresso", text="Progresso")
+        self.jobs_view.column("#0", width=400)
+        self.jobs_view.column("estado", width=100, anchor="center")
+        self.jobs_view.column("progresso", width=200)
+        self.jobs_view.pack(fill="x", padx=8, pady=4)
+
+        r6 = tk.Frame(p_jobs); r6.pack(fill="x", padx=8, pady=4)
+        self.progress = ttk.Progressbar(r6, mode="determinate", length=360)
+        self.progress.pack(side="left", fill="x", expand=True)
+        tk.Button(r6, text="Cancelar selecionada", command=self._cancelar_selecionado)\
+            .pack(side="left", padx=6)
+        tk.Button(r6, text="Cancelar todas", command=self.jobs.cancelar_todos)\
+            .pack(side="left")
+        tk.Label(r6, text="Métricas:").pack(side="left", padx=(10, 0))
+        ttk.Combobox(r6, state="readonly", width=10, textvariable=self.metricas,
+                     values=METRICS_FORMATS).pack(side="left", padx=4)
+        tk.Label(r6, text="Markdown:").pack(side="left", padx=(10, 0))
+        ttk.Combobox(r6, state="readonly", width=10, textvariable=self.pos_processamento,
+                     values=POSTPROC_MODES).pack(side="left", padx=4)
+
+        # Log
+        self.log = tk.Text(self, height=12, state="disabled")
+        self.log.pack(padx=10, pady=10, fill="both", expand=True)
+
+    def _set_desc_mode(self, idx: int):
+        self.desc_mode.set(("markitdown", "direct", "batch")[idx])
+
+    def _set_caption_backend(self, idx: int):
+        self.caption_backend.set(CAPTION_BACKENDS[idx])
+
+    def _on_close(self):
+        self.jobs.encerrar()
+        self.destroy()
+
+    # ------------------------ Infra / Helpers --------------------------
+
+    def _snapshot_config(self) -> ConfigConversao:
+        """Lê as variáveis Tk (só na thread da UI) para entregar aos jobs."""
+        return ConfigConversao(
+            output_dir=self.output_dir,
+            use_openai=self.use_openai.get(),
+            model=self.model_name.get(),
+            prompt=self.prompt_text.get(),
+            desc_mode=self.desc_mode.get(),
+            caption_backend=self.caption_backend.get(),
+            caption_base_url=self.caption_base_url.get(),
+            ocr_screenshots=self.ocr_screenshots.get(),
+            triagem_imagens=self.triagem_imagens.get(),
+            gecko_path=self.gecko_path.get(),
+            firefox_bin=self.firefox_bin.get(),
+            headless=self.headless.get(),
+            archive_assets=self.archive_assets.get(),
+            metricas=self.metricas.get(),
+            retomar=self.retomar.get(),
+            incremental=self.incremental.get(),
+            modo_captura=self.modo_captura.get(),
+            largura_imagem=self._largura_imagem(),
+            pos_processamento=self.pos_processamento.get(),
+        )
+
+    def _largura_imagem(self) -> int:
+        """Valor do Spinbox; texto que não é número (ou largura <= 0) volta ao padrão, com aviso no log."""
+        try:
+            largura = self.largura_imagem.get()
+        except tk.TclError:
+            largura = 0
+        if largura > 0:
+            return largura
+        self._log(f"⚠ Largura mín. de imagens inválida; usando {IMG_TARGET_WIDTH}px.")
+        self.largura_imagem.set(IMG_TARGET_WIDTH)
+        return IMG_TARGET_WIDTH
+
+    def _novo_conversor(self) -> ConversorMarkdown:
+        # um MarkItDown por job: usa as opções do momento e mede a legendagem daquele job
+        return ConversorMarkdown(self._snapshot_config(), log=self._log)
+
+    def _log(self, msg: str):
+        """Pode ser chamado de qualquer thread: a escrita no widget acontece no loop do Tk."""
+        self.eventos.put(("log", None, msg))
+
+    def _escrever_log(self, msg: str):
+        self.log.configure(state="normal")
+        ts = datetime.now().strftime("%H:%M:%S")
+        self.log.insert("end", f"[{ts}] {msg}\n")
+        self.log.see("end")
+        self.log.configure(state="disabled")
+
+    # ------------------------ Jobs / Eventos ---------------------------
+
+    def _submeter(self, titulo: str, fn, *args, ao_concluir=None) -> Job:
+        job = self.jobs.submeter(titulo, fn, *args)
+        job.ao_concluir = ao_concluir
+        self.jobs_view.insert("", "end", iid=str(job.id), text=f"#{job.id} {titulo}",
+                              values=("na fila", ""))
+        return job
+
+    def _cancelar_selecionado(self):
+        for iid in self.jobs_view.selection():
+            self.jobs.cancelar(int(iid))
+
+    def _consumir_eventos(self):
+        """Drena a fila de eventos dos workers (limitado por ciclo, p/ a UI não travar)."""
+        for _ in range(200):
+            try:
+                tipo, job, dado = self.eventos.get_nowait()
+            except queue.Empty:
+                break
+            self._tratar_evento(tipo, job, dado)
+        self.after(EVENT_POLL_MS, self._consumir_eventos)
+
+    def _tratar_evento(self, tipo: str, job: Job | None, dado):
+        if tipo == "log":
+            self._escrever_log(dado)
+            return
+
+        iid = str(job.id)
+        if not self.jobs_view.exists(iid):
+            return
+
+        if tipo == "estado":
+            self.jobs_view.set(iid, "estado", dado)
+        elif tipo == "progresso":
+            atual, total, texto = dado
+            pct = int(100 * atual / total) if total else 0
+            self.jobs_view.set(iid, "progresso", f"{pct}% {texto}")
+            self.progress.configure(maximum=max(total, 1), value=atual)
+        elif tipo == "fim":
+            self.jobs_view.set(iid, "estado", "concluído")
+            self._finalizar_job(job)
+            if job.ao_concluir:
+                job.ao_concluir(dado)
+        elif tipo == "cancelado":
+            self.jobs_view.set(iid, "estado", "cancelado")
+            self._escrever_log(f"⨯ Tarefa #{job.id} cancelada: {job.titulo}")
+            self._finalizar_job(job)
+        elif tipo == "erro":
+            self.jobs_view.set(iid, "estado", "erro")
+            self._finalizar_job(job)
+            if isinstance(dado, (TimeoutException, WebDriverException)):
+                messagebox.showerror("Erro Selenium", str(dado))
+            else:
+                messagebox.showerror("Erro", str(dado))
+
+    def _finalizar_job(self, job: Job):
+        # some da lista após alguns segundos; zera a barra quando não há mais nada rodando
+        self.after(5000, self._remover_job_da_lista, str(job.id))
+        if not self.jobs.jobs:
+            self.progress.configure(value=0)
+
+    def _remover_job_da_lista(self, iid: str):
+        if self.jobs_view.exists(iid):
+            self.jobs_view.delete(iid)
+
+    # ------------------------ Fluxos de Arquivo ------------------------
+
+    def _on_drop(self, event):
+        files = self.tk.splitlist(event.data)
+        caminhos = [Path(f) for f in files if f]
+        self._processar_arquivos(caminhos)
+
+    def _selecionar_arquivos(self):
+        tipos = [
+            ("Todos suportados", " ".join(f"*{ext}" for ext in sorted(TARGET_FORMATS) + list(ARCHIVE_FORMATS))),
+            ("Imagens", "*.png *.jpg *.jpeg *.gif *.webp *.bmp *.tiff *.tif *.svg"),
+            ("HTML", "*.html *.htm"),
+            ("Word", "*.docx"),
+            ("Excel", "*.xlsx"),
+            ("PDF", "*.pdf"),
+            ("Compactados (ZIP/TAR)", " ".join(f"*{ext}" for ext in ARCHIVE_FORMATS)),
+            ("Todos os arquivos", "*.*"),
+        ]
+        paths = filedialog.askopenfilenames(title="Escolher arquivos para converter",
+                                            filetypes=tipos)
+        if not paths: 
+            return
+        self._processar_arquivos([Path(p) for p in paths])
+
+    def _processar_arquivos(self, caminhos: list[Path]):
+        if not caminhos: 
+            return
+        self._submeter(
+            f"Converter {len(caminhos)} arquivo(s)",
+            self._novo_conversor().processar_arquivos, list(caminhos),
+            ao_concluir=lambda ok: messagebox.showinfo(
+                "Concluído", f"Conversão finalizada. {ok} arquivo(s) gerado(s)."),
+        )
+
+    def _aguardar_lotes(self):
+        if not os.getenv("OPENAI_API_KEY"):
+            load_openai_key_from_file()
+        if not os.getenv("OPENAI_API_KEY"):
+            messagebox.showwarning("OpenAI", "OPENAI_API_KEY não definido.")
+            return
+        self._submeter(
+            "Aguardar lotes OpenAI",
+            self._novo_conversor().aguardar_lotes,
+            ao_concluir=lambda n: messagebox.showinfo(
+                "Concluído", f"{n} lote(s) de descrições mesclado(s) nos .md."),
+        )
+
+    # --------------------------- Selenium ------------------------------
+
+    def _carregar_lista_urls(self):
+        caminho = filedialog.askopenfilename(title="Lista de URLs (uma por linha)",
+                                             filetypes=[("Texto", "*.txt"), ("Todos", "*.*")])
+        if caminho:
+            self.url_text.set(" ".join(ler_lista_urls(Path(caminho))))
+
+    def _capturar_converter_url(self):
+        urls = [u for u in URL_LIST_SPLIT_RE.split(self.url_text.get()) if u]
+        if not urls:
+            messagebox.showwarning("URL vazia", "Informe uma URL.")
+            return
+        if len(urls) == 1:
+            self._submeter(
+                f"Capturar {urls[0]}",
+                self._novo_conversor().capturar_converter_url, urls[0],
+                ao_concluir=lambda out_name: messagebox.showinfo(
+                    "Concluído", f"Gerei {out_name} na pasta do programa."),
+            )
+            return
+        self._submeter(
+            f"Capturar {len(urls)} URLs",
+            self._novo_conversor().capturar_urls, urls,
+            ao_concluir=lambda c: messagebox.showinfo(
+                "Concluído", f"Páginas novas: {c['nova']}, alteradas: {c['alterada']}, "
+                             f"inalteradas: {c['inalterada']}, com erro: {c['erro']}."),
+        )
+
+
+def _opcoes_conversao(p: argparse.ArgumentParser, saida: Path, modos=("markitdown", "direct", "batch")):
+    """Opções de conversão comuns aos subcomandos (viram um ConfigConversao)."""
+    p.add_argument("--saida", type=Path, default=saida, help="pasta dos .md, assets e métricas")
+    p.add_argument("--descrever", action="store_true", help="descrever imagens (ALT)")
+    p.add_argument("--modo-legenda", choices=modos, default="markitdown")
+    p.add_argument("--backend", choices=CAPTION_BACKENDS, default="openai")
+    p.add_argument("--url-backend", default=LOCAL_SERVER_URL)
+    p.add_argument("--modelo", default=DEFAULT_MODEL)
+    p.add_argument("--ocr", action="store_true", help="prints de tela com texto vão para o OCR")
+    p.add_argument("--sem-triagem", action="store_true",
+                   help="descreve todas as imagens da captura (sem pular ícones/blocos lisos)")
+    p.add_argument("--gecko", default="")
+    p.add_argument("--firefox", default="")
+    p.add_argument("--metricas", choices=METRICS_FORMATS, default="jsonl")
+    p.add_argument("--chunk-kb", type=int, default=DOWNLOAD_CHUNK_BYTES // 1024,
+                   help="tamanho dos blocos lidos da rede nos downloads de assets")
+    p.add_argument("--largura-imagem", type=int, default=IMG_TARGET_WIDTH,
+                   help="srcset: baixa o menor candidato com pelo menos esta largura (px)")
+    p.add_argument("--markdown", choices=POSTPROC_MODES, default="basico",
+                   help="pós-processamento do Markdown (compacto economiza tokens)")
+    p.add_argument("--captura", choices=CAPTURE_MODES, default="auto",
+                   help="auto: HTTP direto e Firefox só para páginas que dependem de JS")
+    p.add_argument("--max-conversoes", type=int, default=GOV_MAX_CONVERSOES,
+                   help="conversões simultâneas (máximo; o governador reduz sob pressão de memória)")
+    p.add_argument("--max-mb-download", type=int, default=GOV_MAX_BYTES_EM_VOO // (1024 * 1024),
+                   help="MB de assets sendo baixados ao mesmo tempo")
+    p.add_argument("--max-api", type=int, default=GOV_MAX_CHAMADAS_API,
+                   help="chamadas de legendagem simultâneas")
+    p.add_argument("--sem-indice", action="store_true", help="não atualiza o índice de busca dos .md")
+    p.add_argument("--limite-rss-mb", type=int, default=0,
+                   help=f"memória do processo a respeitar (0: {GOV_FRACAO_RAM * 100:.0f}%% da RAM)")
+
+
+def _config_de_args(args, **extra) -> ConfigConversao:
+    return ConfigConversao(
+        output_dir=args.saida.resolve(),
+        use_openai=args.descrever,
+        model=args.modelo,
+        desc_mode=args.modo_legenda,
+        caption_backend=args.backend,
+        caption_base_url=args.url_backend,
+        ocr_screenshots=args.ocr,
+        triagem_imagens=not args.sem_triagem,
+        gecko_path=args.gecko,
+        firefox_bin=args.firefox,
+        metricas=args.metricas,
+        download_chunk_bytes=args.chunk_kb * 1024,
+        largura_imagem=args.largura_imagem,
+        pos_processamento=args.markdown,
+        modo_captura=args.captura,
+        max_conversoes=args.max_conversoes,
+        max_mb_download=args.max_mb_download,
+        max_chamadas_api=args.max_api,
+        limite_rss_mb=args.limite_rss_mb,
+        indexar=not args.sem_indice,
+        **extra,
+    )
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="MarkItDown + captura de páginas (sem argumentos: abre a UI).")
+    sub = parser.add_subparsers(dest="comando")
+
+    srv = sub.add_parser("servir", help="servidor HTTP local de conversão, sem UI")
+    srv.add_argument("--host", default=SERVICE_HOST)
+    srv.add_argument("--porta", type=int, default=SERVICE_PORT)
+    srv.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="conversores prontos em paralelo")
+    srv.add_argument("--fila", type=int, default=SERVICE_QUEUE, help="pedidos em espera antes do 503")
+    srv.add_argument("--navegadores", type=int, default=0, help="sessões do Firefox mantidas abertas")
+    _opcoes_conversao(srv, base_dir / "_servico", modos=("markitdown", "direct"))
+
+    cap = sub.add_parser("capturar", help="captura uma lista de URLs, sem UI (ex.: recaptura agendada)")
+    cap.add_argument("urls", nargs="*", help="URLs a capturar")
+    cap.add_argument("--lista", type=Path, help="arquivo texto com uma URL por linha")
+    cap.add_argument("--incremental", action="store_true",
+                     help="pula páginas sem mudanças e reaproveita assets/descrições")
+    cap.add_argument("--arquivar", action="store_true", help="arquiva a página completa (JS/CSS)")
+    cap.add_argument("--janela", action="store_true", help="abre o Firefox com janela (sem headless)")
+    _opcoes_conversao(cap, base_dir)
+
+    enf = sub.add_parser("enfileirar", help="produtor: põe arquivos/URLs na fila distribuída")
+    enf.add_argument("--fila", required=True, help="sqlite:CAMINHO ou dir:CAMINHO (armazenamento compartilhado)")
+    enf.add_argument("arquivos", nargs="*", type=Path, help="arquivos ou pastas a converter")
+    enf.add_argument("--urls", nargs="*", default=[], help="URLs a capturar")
+    enf.add_argument("--lista", type=Path, help="arquivo texto com uma URL por linha")
+    enf.add_argument("--max-tentativas", type=int, default=QUEUE_MAX_ATTEMPTS)
+
+    wrk = sub.add_parser("worker", help="worker: consome a fila distribuída até ser interrompido")
+    wrk.add_argument("--fila", required=True, help="sqlite:CAMINHO ou dir:CAMINHO")
+    wrk.add_argument("--id", default=f"{socket.gethostname()}-{os.getpid()}", help="identificação do worker")
+    wrk.add_argument("--lease", type=int, default=QUEUE_LEASE_S, help="prazo do arrendamento (s)")
+    wrk.add_argument("--ocioso", type=float, default=QUEUE_IDLE_S, help="espera com a fila vazia (s)")
+    wrk.add_argument("--sair-quando-vazia", action="store_true")
+    wrk.add_argument("--arquivar", action="store_true", help="arquiva a página completa (JS/CSS)")
+    wrk.add_argument("--incremental", action="store_true")
+    _opcoes_conversao(wrk, base_dir, modos=("markitdown", "direct"))
+
+    bus = sub.add_parser("buscar", help="busca nos .md gerados (índice FTS5 da pasta de saída)")
+    bus.add_argument("consulta", nargs="?", default="",
+                     help='termos, "frase exata", prefixo*, OR/NOT, titulo:termo')
+    bus.add_argument("--saida", type=Path, default=base_dir, help="pasta dos .md (onde fica o índice)")
+    bus.add_argument("--limite", type=int, default=20)
+    bus.add_argument("--json", action="store_true", help="resultados em JSON")
+    bus.add_argument("--reindexar", action="store_true",
+                     help="indexa os .md da pasta (ex.: gerados antes do índice) e remove os apagados")
+
+    fil = sub.add_parser("fila", help="mostra o estado da fila distribuída")
+    fil.add_argument("--fila", required=True, help="sqlite:CAMINHO ou dir:CAMINHO")
+    fil.add_argument("--repetir-falhos", action="store_true", help="devolve os itens que falharam à fila")
+    return parser, parser.parse_args()
+
+
+def _expandir_entradas(caminhos: list[Path]) -> list[str]:
+    """Pastas viram os arquivos suportados dentro delas; tudo em caminho absoluto."""
+    alvos = []
+    for c in caminhos:
+        c = c.expanduser().resolve()
+        if c.is_dir():
+            alvos += [str(f) for f in sorted(c.rglob("*"))
+                      if f.is_file() and (f.suffix.lower() in TARGET_FORMATS or formato_compactado(f))]
+        elif c.is_file():
+            alvos.append(str(c))
+    return alvos
+
+
+def main():
+    # carrega a chave da OpenAI do arquivo, antes de criar a UI
+    load_openai_key_from_file()
+    parser, args = _argumentos()
+
+    if args.comando == "servir":
+        servir(_config_de_args(args), args.host, args.porta, args.workers, args.fila, args.navegadores)
+        return
+    if args.comando == "capturar":
+        urls = list(args.urls) + (ler_lista_urls(args.lista) if args.lista else [])
+        if not urls:
+            parser.error("informe URLs ou --lista")
+        config = _config_de_args(args, incremental=args.incremental,
+                                 archive_assets=args.arquivar, headless=not args.janela)
+        config.output_dir.mkdir(parents=True, exist_ok=True)
+        contagem = ConversorMarkdown(config).capturar_urls(urls)
+        raise SystemExit(1 if contagem["erro"] else 0)
+    if args.comando == "enfileirar":
+        fila = abrir_fila(args.fila)
+        urls = list(args.urls) + (ler_lista_urls(args.lista) if args.lista else [])
+        arquivos = _expandir_entradas(args.arquivos)
+        if not urls and not arquivos:
+            parser.error("informe arquivos, pastas, --urls ou --lista")
+        novos = fila.enfileirar("arquivo", arquivos, args.max_tentativas)
+        novos += fila.enfileirar("url", urls, args.max_tentativas)
+        print(f"Enfileirados: {novos} (de {len(arquivos) + len(urls)}). Fila: {fila.estatisticas()}")
+        fila.fechar()
+        return
+    if args.comando == "worker":
+        # retomar=False: quem evita trabalho repetido aqui é a fila, não o diário local
+        config = _config_de_args(args, retomar=False, incremental=args.incremental,
+                                 archive_assets=args.arquivar)
+        config.output_dir.mkdir(parents=True, exist_ok=True)
+        fila = abrir_fila(args.fila)
+        try:
+            contagem = executar_worker(fila, config, args.id, args.lease, args.ocioso, args.sair_quando_vazia)
+            print(f"Worker {args.id}: {contagem['concluidos']} concluídos, {contagem['falhos']} com falha.")
+        except KeyboardInterrupt:
+            print(f"Worker {args.id} interrompido; item em andamento devolvido à fila.")
+        finally:
+            fila.fechar()
+        return
+    if args.comando == "buscar":
+        indice = IndiceMarkdown(args.saida.resolve())
+        try:
+            if args.reindexar:
+                indice.reindexar_pasta()
+            if not args.consulta:
+                if not args.reindexar:
+                    parser.error("informe a consulta (ou --reindexar)")
+                return
+            t0 = time.perf_counter()
+            hits = indice.buscar(args.consulta, args.limite)
+            ms = 1000 * (time.perf_counter() - t0)
+        finally:
+            indice.fechar()
+        if args.json:
+            print(json.dumps(hits, ensure_ascii=False, indent=2))
+            return
+        for h in hits:
+            print(f"{h['md']}:{h['inicio']}-{h['fim']}  [{h['titulo'] or '—'}]  {h['origem'] or ''}")
+            print(f"    {' '.join(h['trecho'].split())}")
+        print(f"{len(hits)} resultado(s) em {ms:.1f} ms.")
+        return
+    if args.comando == "fila":
+        fila = abrir_fila(args.fila)
+        if args.repetir_falhos:
+            print(f"Devolvidos à fila: {fila.repetir_falhos()}")
+        print(json.dumps(fila.estatisticas(), ensure_ascii=False))
+        fila.fechar()
+        return
+
+    app = MarkItDownApp()
+    app.mainloop()
+
+if __name__ == "__main__":
+    main()
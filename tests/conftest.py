@@ -0,0 +1,121 @@
+import struct
+import sys
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# os testes importam o script da raiz do repositório (mdToLLM_2.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import mdToLLM_2 as m  # noqa: E402
+
+
+def png(largura: int = 64, altura: int = 48, cor=(200, 30, 30), ruido: int = 0) -> bytes:
+    """PNG RGB válido sem depender do Pillow; `ruido` muda o conteúdo (e o hash) sem mudar o tamanho."""
+    linha = b"\x00" + bytes(cor) * largura
+    bruto = bytearray(linha * altura)
+    if ruido:
+        bruto[1] = ruido % 256
+
+    def bloco(tipo: bytes, dados: bytes) -> bytes:
+        return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados))
+
+    return (b"\x89PNG\r\n\x1a\n" + bloco(b"IHDR", struct.pack(">IIBBBBB", largura, altura, 8, 2, 0, 0, 0))
+            + bloco(b"IDAT", zlib.compress(bytes(bruto))) + bloco(b"IEND", b""))
+
+
+class SiteLocal:
+    """
+    Servidor HTTP local para capturas e downloads: rotas {caminho: (corpo, content-type, cabeçalhos)}.
+    Responde 304 a GETs condicionais cujo If-None-Match / If-Modified-Since bate com a rota
+    e anota cada pedido em `pedidos` como (método, caminho, condicional?).
+    """
+
+    def __init__(self):
+        self.rotas: dict[str, tuple[bytes, str, dict]] = {}
+        self.pedidos: list[tuple[str, str, bool]] = []
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, corpo_tambem: bool):
+                rota = site.rotas.get(self.path)
+                condicional = bool(self.headers.get("If-None-Match") or self.headers.get("If-Modified-Since"))
+                site.pedidos.append((self.command, self.path, condicional))
+                if rota is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                corpo, tipo, extras = rota
+                etag, modificado = extras.get("ETag"), extras.get("Last-Modified")
+                if ((etag and self.headers.get("If-None-Match") == etag)
+                        or (not etag and modificado and self.headers.get("If-Modified-Since") == modificado)):
+                    self.send_response(304)
+                    for k, v in extras.items():
+                        self.send_header(k, v)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(corpo)))
+                for k, v in extras.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                if corpo_tambem:
+                    self.wfile.write(corpo)
+
+            def do_GET(self):
+                self._responder(True)
+
+            def do_HEAD(self):
+                self._responder(False)
+
+        self._srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._srv.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, caminho: str) -> str:
+        return f"http://127.0.0.1:{self._srv.server_port}{caminho}"
+
+    def rota(self, caminho: str, corpo: bytes | str, tipo: str = "text/html; charset=utf-8", **cabecalhos):
+        if isinstance(corpo, str):
+            corpo = corpo.encode("utf-8")
+        self.rotas[caminho] = (corpo, tipo, {k.replace("_", "-"): v for k, v in cabecalhos.items()})
+
+    def fechar(self):
+        self._srv.shutdown()
+        self._srv.server_close()
+
+
+@pytest.fixture
+def site():
+    s = SiteLocal()
+    yield s
+    s.fechar()
+
+
+@pytest.fixture
+def conversor(tmp_path):
+    """Fábrica de ConversorMarkdown com saída em tmp_path; o log fica em `conv.mensagens`."""
+    def criar(**opcoes):
+        opcoes.setdefault("output_dir", tmp_path / "saida")
+        opcoes.setdefault("metricas", "nenhum")
+        opcoes["output_dir"].mkdir(parents=True, exist_ok=True)
+        mensagens = []
+        conv = m.ConversorMarkdown(m.ConfigConversao(**opcoes), log=mensagens.append)
+        conv.mensagens = mensagens
+        return conv
+
+    return criar
+
+
+def pagina(corpo_html: str, titulo: str = "Página", paragrafos: int = 8) -> str:
+    """HTML renderizado no servidor, com texto suficiente para a captura estática aceitar."""
+    texto = "".join(f"<p>Parágrafo {i} com texto renderizado no servidor, sem JavaScript.</p>"
+                    for i in range(paragrafos))
+    return f"<html><head><title>{titulo}</title></head><body><h1>{titulo}</h1>{texto}{corpo_html}</body></html>"
@@ -0,0 +1,40 @@
+import random
+
+import bench_mdToLLM as bench
+
+
+def metricas(p50=10.0, p95=20.0, vazao=5.0):
+    return {"n": 3, "p50_ms": p50, "p95_ms": p95, "p99_ms": p95, "vazao_s": vazao}
+
+
+def test_comparar_acusa_so_o_que_piorou_alem_da_tolerancia():
+    baseline = {"arquivos": {"rss_pico_mb": 100, "metricas": {"arquivos.pdf": metricas()}}}
+    dentro = {"arquivos": {"rss_pico_mb": 110, "metricas": {"arquivos.pdf": metricas(11, 22, 4.5)}}}
+    assert bench.comparar(dentro, baseline, 0.15) == []
+
+    fora = {"arquivos": {"rss_pico_mb": 200, "metricas": {"arquivos.pdf": metricas(20, 20, 2)}}}
+    regressoes = bench.comparar(fora, baseline, 0.15)
+    assert regressoes == ["arquivos: pico de RSS 100 → 200 MB",
+                          "arquivos.pdf: p50_ms 10.0 → 20",
+                          "arquivos.pdf: vazão 5.0 → 2 /s"]
+
+
+def test_comparar_ignora_cenarios_e_metricas_sem_baseline():
+    atual = {"triagem": {"rss_pico_mb": 999, "metricas": {"triagem.lote": metricas(999)}},
+             "arquivos": {"rss_pico_mb": 1, "metricas": {"arquivos.novo": metricas(999)}}}
+    baseline = {"arquivos": {"rss_pico_mb": 1, "metricas": {}}}
+    assert bench.comparar(atual, baseline, 0.15) == []
+
+
+def test_corpus_e_identico_a_cada_execucao():
+    def amostra():
+        rng = random.Random(bench.SEED)
+        return bench.gerar_png(16, 12, rng), bench.gerar_pdf(1, rng), bench.gerar_docx(3, rng)
+
+    assert amostra() == amostra()
+
+
+def test_pdf_sintetico_aponta_o_xref_certo():
+    pdf = bench.gerar_pdf(2, random.Random(bench.SEED))
+    inicio = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+    assert pdf[inicio:].startswith(b"xref\n0 ")
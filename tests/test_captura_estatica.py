@@ -0,0 +1,89 @@
+import pytest
+
+from conftest import m, pagina
+
+TEXTO = "<p>" + "Conteúdo renderizado no servidor. " * 20 + "</p>"
+
+
+@pytest.mark.parametrize("html, motivo", [
+    (pagina(""), None),
+    ("<html><body>" + TEXTO + "<script src='app.js'></script></body></html>", None),
+    ("<html><body><p>Pouco texto</p></body></html>", None),  # pouco texto, mas sem JS: é o que há
+    ("<html><body><p>Carregando…</p><script src='app.js'></script></body></html>",
+     "pouco texto sem JS (11 caracteres)"),
+    ('<html><body><div id="root"></div>' + TEXTO + "</body></html>", "contêiner de SPA vazio"),
+    ("<html><body><app-root> </app-root>" + TEXTO + "</body></html>", "contêiner de SPA vazio"),
+    ("<html><head><title>Just a moment...</title></head>" + TEXTO + "</html>", "desafio anti-robô"),
+    ("<html><body>" + TEXTO + "<noscript>Please enable JavaScript to view this site.</noscript></body></html>",
+     "aviso de <noscript> pedindo JavaScript"),
+    ("<html><body>" + TEXTO + "<noscript><img src='pixel.gif'></noscript></body></html>", None),
+    ("<html><body>" + TEXTO + '<img data-src="a.jpg"><img data-src="b.jpg" src="data:,">'
+     '<img data-lazy-src="c.jpg"></body></html>', "3 imagens carregadas por JS (lazy-load)"),
+    ("<html><body>" + TEXTO + '<img data-src="a.jpg" src="a.jpg"><img data-src="b.jpg"></body></html>', None),
+])
+def test_motivo_para_navegador(html, motivo):
+    assert m.motivo_para_navegador(html) == motivo
+
+
+def test_texto_volatil_nao_conta_como_conteudo():
+    script = "<script>" + "var x = 1; " * 200 + "</script>"
+    assert m.motivo_para_navegador(f"<html><body><p>Oi</p>{script}</body></html>").startswith("pouco texto")
+
+
+def test_buscar_estatico(conversor, site):
+    conv = conversor(modo_captura="estatico")
+    site.rota("/ok", pagina("<p>Acentuação</p>"))
+    site.rota("/latin1", pagina("<p>Acentuação</p>").replace("<head>", '<head><meta charset="iso-8859-1">')
+              .encode("latin-1"), "text/html")
+    site.rota("/spa", '<html><body><div id="app"></div><script src="a.js"></script></body></html>')
+    site.rota("/json", '{"a": 1}', "application/json")
+
+    html, final, motivo = conv._buscar_estatico(site.url("/ok"))
+    assert "Acentuação" in html and final == site.url("/ok") and motivo is None
+    assert "Acentuação" in conv._buscar_estatico(site.url("/latin1"))[0]
+    assert conv._buscar_estatico(site.url("/spa")) == (None, site.url("/spa"), "contêiner de SPA vazio")
+    assert conv._buscar_estatico(site.url("/json"))[2] == "conteúdo application/json"
+    assert conv._buscar_estatico(site.url("/nada"))[2] == "HTTP 404"
+    # a sessão HTTP (keep-alive) é a mesma entre as páginas
+    assert conv._sessao_http() is conv._sessao_http()
+
+
+def test_html_grande_demais_vai_para_o_navegador(conversor, site, monkeypatch):
+    monkeypatch.setattr(m, "STATIC_MAX_HTML_BYTES", 1000)
+    site.rota("/p", pagina("", paragrafos=40))
+    conv = conversor(modo_captura="estatico")
+    assert conv._buscar_estatico(site.url("/p"))[2] == "HTML grande demais para a captura estática"
+
+
+def test_captura_estatica_nao_abre_o_firefox(conversor, site, monkeypatch):
+    site.rota("/p", pagina("<h2>Seção</h2>", titulo="Estática"))
+    conv = conversor(modo_captura="auto", indexar=False)
+    monkeypatch.setattr(conv, "_criar_driver", lambda *a: pytest.fail("abriu o Firefox"))
+
+    assert conv.capturar_urls([site.url("/p")])["nova"] == 1
+    assert conv.registro.contadores["capturas_estaticas"] == 1
+    assert "# Estática" in next(conv.output_dir.glob("*_p.md")).read_text(encoding="utf-8")
+
+
+def test_pagina_que_depende_de_js(conversor, site, monkeypatch):
+    site.rota("/spa", '<html><body><div id="root"></div><script src="a.js"></script></body></html>')
+
+    # estático: erro, sem tentar o navegador
+    conv = conversor(modo_captura="estatico", indexar=False)
+    monkeypatch.setattr(conv, "_criar_driver", lambda *a: pytest.fail("abriu o Firefox"))
+    assert conv.capturar_urls([site.url("/spa")])["erro"] == 1
+    assert any("a página precisa do navegador (contêiner de SPA vazio)" in msg for msg in conv.mensagens)
+
+    # auto: cai para o Firefox (aqui indisponível)
+    conv = conversor(modo_captura="auto", indexar=False)
+    pedidos = []
+
+    def sem_firefox(*args):
+        pedidos.append(args)
+        raise RuntimeError("Firefox indisponível")
+
+    monkeypatch.setattr(conv, "_criar_driver", sem_firefox)
+    assert conv.capturar_urls([site.url("/spa")])["erro"] == 1
+    assert len(pedidos) == 1
+    assert any("Usando o Firefox: contêiner de SPA vazio" in msg for msg in conv.mensagens)
+    assert conv.registro.contadores["capturas_com_navegador"] == 1
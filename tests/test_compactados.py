@@ -0,0 +1,166 @@
+import io
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from conftest import m
+
+
+def html(titulo):
+    return f"<html><body><h1>{titulo}</h1><p>Texto de {titulo}.</p></body></html>".encode()
+
+
+MEMBROS = {
+    "leia-me.html": html("Raiz"),
+    "docs/manual.html": html("Manual"),
+    "docs/sub/capitulo.htm": html("Capítulo"),
+    "docs/notas.txt": b"formato sem suporte",
+    "../fora.html": html("Fora"),
+}
+
+
+def criar_zip(caminho, membros=MEMBROS):
+    with zipfile.ZipFile(caminho, "w") as zf:
+        zf.writestr("docs/", "")  # diretório: pulado
+        for nome, dados in membros.items():
+            zf.writestr(nome, dados)
+    return caminho
+
+
+def criar_tar(caminho, membros=MEMBROS, modo="w:gz"):
+    with tarfile.open(caminho, modo) as tf:
+        for nome, dados in membros.items():
+            info = tarfile.TarInfo(nome)
+            info.size = len(dados)
+            tf.addfile(info, io.BytesIO(dados))
+        link = tarfile.TarInfo("docs/atalho.html")
+        link.type, link.linkname = tarfile.SYMTYPE, "/etc/passwd"
+        tf.addfile(link)  # link simbólico: pulado
+    return caminho
+
+
+@pytest.mark.parametrize("nome, fmt", [
+    ("a.zip", ".zip"), ("a.TAR.GZ", ".tar.gz"), ("a.tgz", ".tgz"), ("a.tar.xz", ".tar.xz"),
+    ("a.tar", ".tar"), ("a.gz", None), ("a.html", None),
+])
+def test_formato_compactado(nome, fmt):
+    assert m.formato_compactado(Path(nome)) == fmt
+
+
+@pytest.mark.parametrize("nome, esperado", [
+    ("docs/a.html", Path("docs/a.html")),
+    ("./docs//a.html", Path("docs/a.html")),
+    ("docs\\sub\\a.html", Path("docs/sub/a.html")),
+    ("/etc/a.html", Path("etc/a.html")),  # absoluto vira relativo à pasta de saída
+    ('doc:s/a?"b*.html', Path("doc_s/a__b_.html")),
+    ("../a.html", None),
+    ("docs/../../a.html", None),
+    ("docs\\..\\..\\a.html", None),
+    ("C:/Windows/a.html", None),
+    ("", None),
+])
+def test_caminho_seguro_membro(nome, esperado):
+    assert m.caminho_seguro_membro(nome) == esperado
+
+
+@pytest.mark.parametrize("criar", [criar_zip, criar_tar])
+def test_membros_compactados_le_sem_extrair(tmp_path, criar):
+    arquivo = criar(tmp_path / ("a.zip" if criar is criar_zip else "a.tar.gz"))
+    lidos = {nome: (tamanho, leitor.read()) for nome, tamanho, leitor in m.membros_compactados(arquivo)}
+    assert lidos == {nome: (len(dados), dados) for nome, dados in MEMBROS.items()}
+    assert sorted(p.name for p in tmp_path.iterdir()) == [arquivo.name]
+
+
+def test_copiar_limitado(tmp_path, monkeypatch):
+    monkeypatch.setattr(m, "ARCHIVE_CHUNK_BYTES", 10)
+    destino = tmp_path / "x"
+    assert m.copiar_limitado(io.BytesIO(b"a" * 95), destino, limite=100) == 95
+    assert destino.read_bytes() == b"a" * 95
+    # tamanho declarado mentiroso / bomba: o limite vale para o que sai do stream
+    with pytest.raises(ValueError, match="membro maior que"):
+        m.copiar_limitado(io.BytesIO(b"a" * 101), destino, limite=100)
+
+
+@pytest.mark.parametrize("criar, nome", [(criar_zip, "pacote.zip"), (criar_tar, "pacote.tar.gz"),
+                                         (lambda c: criar_tar(c, modo="w:bz2"), "pacote.tar.bz2")])
+def test_compactado_espelha_as_pastas_na_saida(conversor, tmp_path, criar, nome):
+    arquivo = criar(tmp_path / nome)
+    conv = conversor(max_conversoes=2)
+    assert conv.saida_de(arquivo) == conv.output_dir / "pacote"
+    falhas = {}
+    assert conv.processar_arquivos([arquivo], falhas=falhas) == 3
+    assert falhas == {}
+
+    destino = conv.output_dir / "pacote"
+    assert sorted(p.relative_to(destino).as_posix() for p in destino.rglob("*.md")) == \
+        ["docs/manual.md", "docs/sub/capitulo.md", "leia-me.md"]
+    assert "# Capítulo" in (destino / "docs/sub/capitulo.md").read_text(encoding="utf-8")
+    assert not (conv.output_dir / "fora.md").exists() and not (tmp_path / "fora.md").exists()
+    c = conv.registro.contadores
+    assert (c["membros_convertidos"], c["membros_ignorados"]) == (3, 2)
+
+    hits = conv.buscar("manual")
+    assert hits and hits[0]["md"] == "pacote/docs/manual.md"
+    assert hits[0]["origem"] == f"{arquivo.resolve()}!/docs/manual.html"
+
+
+def test_mesmo_nome_com_extensoes_diferentes(conversor, tmp_path):
+    arquivo = criar_zip(tmp_path / "r.zip", {"relatorio.html": html("A"), "relatorio.htm": html("B")})
+    conv = conversor(indexar=False)
+    assert conv.processar_arquivos([arquivo]) == 2
+    assert sorted(p.name for p in (conv.output_dir / "r").iterdir()) == ["relatorio.htm.md", "relatorio.md"]
+
+
+def test_membro_grande_demais_e_pulado(conversor, tmp_path, monkeypatch):
+    monkeypatch.setattr(m, "ARCHIVE_MAX_MEMBER_BYTES", 100)
+    arquivo = criar_zip(tmp_path / "g.zip", {"pequeno.html": b"<h1>ok</h1>", "grande.html": html("x" * 200)})
+    conv = conversor(indexar=False)
+    assert conv.processar_arquivos([arquivo]) == 1
+    assert any("Ignorando g.zip!/grande.html" in msg for msg in conv.mensagens)
+    assert conv.registro.contadores["membros_ignorados"] == 1
+
+
+def test_compactado_truncado_ou_invalido(conversor, tmp_path):
+    membros = {f"parte{i}.html": html(f"Parte {i}") + b" " * 3000 for i in range(3)}
+    bom = criar_tar(tmp_path / "bom.tar", membros, modo="w").read_bytes()
+    truncado = tmp_path / "truncado.tar"
+    truncado.write_bytes(bom[:bom.index(b"Parte 1") + 100])  # corta no meio dos dados de parte1
+    invalido = tmp_path / "invalido.zip"
+    invalido.write_bytes(b"PK isto nao e um zip")
+
+    conv = conversor(indexar=False)
+    falhas = {}
+    assert conv.processar_arquivos([truncado, invalido], falhas=falhas) == 1
+    assert set(falhas) == {truncado, invalido}
+    assert (conv.output_dir / "truncado" / "parte0.md").exists()
+    assert any("Erro lendo truncado.tar!/parte1.html" in msg for msg in conv.mensagens)
+    assert any("Compactado inválido ou truncado invalido.zip" in msg for msg in conv.mensagens)
+
+
+def test_erro_num_membro_nao_para_os_outros(conversor, tmp_path, monkeypatch):
+    arquivo = criar_zip(tmp_path / "erro.zip", {"a.html": html("A"), "quebrado.html": html("Q"),
+                                                "b.html": html("B")})
+    conv = conversor(indexar=False)
+    original = conv.converter_arquivo
+
+    def falha_no_quebrado(caminho, *args, **kwargs):
+        if caminho.name == "quebrado.html":
+            raise RuntimeError("conversor caiu")
+        return original(caminho, *args, **kwargs)
+
+    monkeypatch.setattr(conv, "converter_arquivo", falha_no_quebrado)
+    falhas = {}
+    assert conv.processar_arquivos([arquivo], falhas=falhas) == 2
+    assert falhas == {arquivo: "1 membro(s) com erro"}
+    assert sorted(p.name for p in (conv.output_dir / "erro").iterdir()) == ["a.md", "b.md"]
+    assert any("Erro convertendo erro.zip!/quebrado.html: conversor caiu" in msg for msg in conv.mensagens)
+
+
+def test_retomada_pula_compactado_ja_convertido(conversor, tmp_path):
+    arquivo = criar_zip(tmp_path / "pacote.zip")
+    conv = conversor(indexar=False)
+    assert conv.processar_arquivos([arquivo]) == 3
+    assert conv.processar_arquivos([arquivo]) == 0
+    assert conv.registro.contadores["arquivos_retomados"] == 1
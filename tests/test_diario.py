@@ -0,0 +1,96 @@
+import os
+import sqlite3
+
+import pytest
+
+from conftest import m
+
+
+@pytest.fixture
+def diario(tmp_path):
+    d = m.DiarioJobs(tmp_path / m.JOURNAL_FILE_NAME)
+    yield d
+    d.fechar()
+
+
+def entrada(tmp_path, nome="doc.html", texto="<p>um</p>"):
+    caminho = tmp_path / nome
+    caminho.write_text(texto, encoding="utf-8")
+    return caminho
+
+
+def test_concluida_exige_estado_final_entrada_inalterada_e_md_presente(diario, tmp_path):
+    doc, md = entrada(tmp_path), tmp_path / "doc.md"
+    diario.marcar(doc, "pendente", md)
+    md.write_text("# um", encoding="utf-8")
+    assert not diario.concluida(doc, md)
+
+    diario.marcar(doc, "convertido", md)
+    assert diario.concluida(doc, md)
+    assert not diario.concluida(doc, tmp_path / "outro.md")
+
+    md.unlink()
+    assert not diario.concluida(doc, md)
+    md.write_text("# um", encoding="utf-8")
+
+    doc.write_text("<p>um, editado</p>", encoding="utf-8")
+    assert not diario.concluida(doc, md)
+
+
+def test_tentativas_contam_cada_passagem_por_pendente(diario, tmp_path):
+    doc = entrada(tmp_path)
+    for estado in ("pendente", "falhou", "pendente", "convertido"):
+        diario.marcar(doc, estado, erro="x" if estado == "falhou" else None)
+    with sqlite3.connect(diario.caminho) as db:
+        assert db.execute("SELECT estado, tentativas, erro FROM entradas").fetchone() == ("convertido", 2, None)
+
+
+def test_marcar_legendados_so_promove_os_convertidos(diario, tmp_path):
+    a, b = entrada(tmp_path, "a.png"), entrada(tmp_path, "b.png")
+    diario.marcar(a, "convertido", tmp_path / "a.md")
+    diario.marcar(b, "falhou", tmp_path / "b.md")
+    diario.marcar_legendados([str(tmp_path / "a.md"), str(tmp_path / "b.md")])
+    assert diario.contagem() == {"legendado": 1, "falhou": 1}
+
+
+def test_retomar_pula_o_ja_convertido_e_refaz_o_que_falhou(conversor, tmp_path, monkeypatch):
+    docs = [entrada(tmp_path, f"doc{i}.html", f"<h1>Doc {i}</h1>") for i in range(3)]
+    conv = conversor(indexar=False)
+    original = conv.converter_arquivo
+
+    def falha_no_segundo(caminho, *args, **kwargs):
+        if caminho.name == "doc1.html":
+            raise RuntimeError("conversor caiu")
+        return original(caminho, *args, **kwargs)
+
+    monkeypatch.setattr(conv, "converter_arquivo", falha_no_segundo)
+    falhas = {}
+    assert conv.processar_arquivos(docs, falhas=falhas) == 2
+    assert list(falhas) == [docs[1]]
+
+    monkeypatch.setattr(conv, "converter_arquivo", original)
+    convertidos = []
+    gravar = m.gravar_atomico
+
+    def gravar_anotando(destino, conteudo):
+        convertidos.append(destino.name)
+        gravar(destino, conteudo)
+
+    monkeypatch.setattr(m, "gravar_atomico", gravar_anotando)
+    assert conv.processar_arquivos(docs) == 1
+    assert convertidos == ["doc1.md"]
+    assert conv.registro.contadores["arquivos_retomados"] == 2
+    assert any("2 arquivo(s) já convertido(s)" in msg for msg in conv.mensagens)
+
+    # entrada editada depois da conversão volta para o lote
+    os.utime(docs[0], ns=(0, 0))
+    assert conv.processar_arquivos(docs) == 1
+    assert convertidos[-1] == "doc0.md"
+
+
+def test_sem_retomar_converte_tudo_de_novo(conversor, tmp_path):
+    docs = [entrada(tmp_path, f"doc{i}.html", f"<h1>Doc {i}</h1>") for i in range(2)]
+    conv = conversor(indexar=False, retomar=False)
+    assert conv.processar_arquivos(docs) == 2
+    assert conv.processar_arquivos(docs) == 2
+    assert not (conv.output_dir / m.JOURNAL_FILE_NAME).exists()
@@ -0,0 +1,130 @@
+import hashlib
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from conftest import m, png
+
+
+@pytest.fixture
+def baixador(tmp_path):
+    """_BaixadorAssets em tmp_path/assets, com blocos pequenos (força várias leituras do stream)."""
+    dest = tmp_path / "assets"
+    dest.mkdir()
+    return m._BaixadorAssets(dest, requests.Session(), m.RegistroExecucao("teste", "-"), 8192)
+
+
+def sobra_parcial(baixador) -> bool:
+    return any(p.name.endswith(".part") for p in baixador.dest.iterdir())
+
+
+def test_baixa_em_blocos_com_hash_mime_e_dimensoes(baixador, site):
+    # maior que o bloco e que o SNIFF_BYTES (bytes extras antes do IEND): o hash cobre o arquivo inteiro
+    grande = png(400, 300, ruido=7)[:-12] + random.Random(1).randbytes(100_000) + png()[-12:]
+    site.rota("/img/foto.png", grande, "image/png")
+    local = baixador.baixar(site.url("/img/foto.png"))
+
+    assert local == str(baixador.dest / "foto.png")
+    assert (baixador.dest / "foto.png").read_bytes() == grande
+    assert baixador.meta[local] == {"url": site.url("/img/foto.png"), "sha256": hashlib.sha256(grande).hexdigest(),
+                                    "mime": "image/png", "bytes": len(grande), "dimensoes": (400, 300)}
+    assert baixador.registro.contadores["bytes_baixados"] == len(grande)
+    assert not sobra_parcial(baixador)
+
+
+@pytest.mark.parametrize("corpo, tipo", [
+    (b"<html></html>", "text/html"),               # MIME fora da lista
+    (b"\x00\x01 dados binarios", "application/octet-stream"),  # genérico que não é imagem
+])
+def test_recusa_sem_deixar_arquivo(baixador, site, corpo, tipo):
+    site.rota("/x", corpo, tipo)
+    assert baixador.baixar(site.url("/x")) is None
+    assert list(baixador.dest.iterdir()) == []
+
+
+def test_recusa_acima_do_limite(baixador, site, monkeypatch):
+    monkeypatch.setattr(m, "MAX_ASSET_BYTES", 50)
+    site.rota("/g.png", png(), "image/png")
+    assert baixador.baixar(site.url("/g.png")) is None
+    assert list(baixador.dest.iterdir()) == []
+
+
+def test_octet_stream_decidido_pelo_conteudo_ganha_extensao(baixador, site):
+    site.rota("/avatar", png(40, 40), "application/octet-stream")
+    local = baixador.baixar(site.url("/avatar"))
+    assert local == str(baixador.dest / "avatar.png")
+    assert baixador.meta[local]["mime"] == "image/png"
+
+
+def test_mime_e_dimensoes_pelo_cabecalho():
+    gif = b"GIF89a" + (300).to_bytes(2, "little") + (200).to_bytes(2, "little") + b"\x00" * 10
+    assert m.sniff_mime(gif) == "image/gif"
+    assert m.dimensoes_imagem(gif, "image/gif") == (300, 200)
+    assert m.sniff_mime(b'\xef\xbb\xbf<?xml version="1.0"?><svg/>') == "image/svg+xml"
+    assert m.sniff_mime(b"<html>") is None
+    assert m.pequena_demais({"dimensoes": (16, 400)}) and not m.pequena_demais({"dimensoes": None})
+
+
+def test_nomes_reservados_na_ordem_do_plano(baixador, site):
+    for caminho, ruido in (("/a/x.png", 1), ("/b/x.png", 2), ("/c/x", 3)):
+        site.rota(caminho, png(ruido=ruido), "image/png")
+    urls = [site.url(p) for p in ("/a/x.png", "/b/x.png", "/c/x")]
+    baixador.reservar(urls)
+    for url in reversed(urls):  # terminar fora de ordem não muda os nomes
+        baixador.baixar(url)
+    assert [baixador.url_to_local[u].rsplit("/", 1)[1] for u in urls] == ["x.png", "x_1.png", "x_2.png"]
+
+
+def test_conteudo_repetido_fica_no_arquivo_da_primeira_url_do_plano(baixador, site, monkeypatch):
+    mesmo = png(ruido=5)
+    for caminho in ("/v1/logo.png", "/v2/logo.png", "/cdn/marca.png"):
+        site.rota(caminho, mesmo, "image/png")
+    urls = [site.url(p) for p in ("/cdn/marca.png", "/v1/logo.png", "/v2/logo.png")]
+    baixador.reservar(urls)
+
+    # a última do plano termina primeiro e fica, provisoriamente, com o arquivo
+    get = baixador.session.get
+
+    def atrasa_as_primeiras(url, **kwargs):
+        if "/v2/" not in url:
+            time.sleep(0.2)
+        return get(url, **kwargs)
+
+    monkeypatch.setattr(baixador.session, "get", atrasa_as_primeiras)
+    with ThreadPoolExecutor(3) as ex:
+        salvos = list(ex.map(baixador.baixar, urls))
+    assert salvos.count(None) == 2
+    assert baixador.registro.contadores["assets_duplicados"] == 2
+
+    renomeados = baixador.consolidar()
+    assert renomeados == {str(baixador.dest / "logo_1.png"): str(baixador.dest / "marca.png")}
+    assert sorted(p.name for p in baixador.dest.iterdir()) == ["marca.png"]
+    r = baixador.resultado()
+    assert set(r["map"].values()) == {str(baixador.dest / "marca.png")}
+    assert r["meta"][str(baixador.dest / "marca.png")]["url"] == urls[0]
+
+
+def test_downloads_paralelos_sao_deterministicos(tmp_path, site):
+    caminhos = [f"/{d}/{n}" for d in "abc" for n in ("x.png", "y", "x.png?v=2")]
+    for i, caminho in enumerate(caminhos):
+        site.rota(caminho, png(ruido=i % 4), "image/png")  # conteúdos repetidos entre URLs
+    urls = sorted(site.url(c) for c in caminhos)
+
+    def rodada(semente):
+        dest = tmp_path / f"r{semente}"
+        dest.mkdir()
+        b = m._BaixadorAssets(dest, requests.Session(), m.RegistroExecucao("t", "-"), 8192)
+        b.reservar(urls)
+        ordem = urls[:]
+        random.Random(semente).shuffle(ordem)
+        with ThreadPoolExecutor(6) as ex:
+            list(ex.map(b.baixar, ordem))
+        b.consolidar()
+        r = b.resultado()
+        return (sorted(p.name for p in dest.iterdir()),
+                {u: r["map"][u].rsplit("/", 1)[1] for u in urls})
+
+    assert len({repr(rodada(s)) for s in range(5)}) == 1
@@ -0,0 +1,133 @@
+"""Fila de trabalho distribuída (user-038): arrendamento, repetição e posse do item."""
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+import mdToLLM_2 as m
+
+
+@pytest.fixture(params=["sqlite", "dir"])
+def fila(request, tmp_path):
+    f = m.abrir_fila(f"sqlite:{tmp_path / 'fila.sqlite3'}" if request.param == "sqlite" else f"dir:{tmp_path / 'fila'}")
+    yield f
+    f.fechar()
+
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setattr(m, "QUEUE_RETRY_BACKOFF_S", 0)
+
+
+def test_enfileirar_ignora_alvo_ja_ativo(fila):
+    assert fila.enfileirar("url", ["https://a", "https://b"]) == 2
+    assert fila.enfileirar("url", ["https://a", "https://c"]) == 1
+    assert fila.estatisticas() == {"pendente": 3} | ({} if isinstance(fila, m.FilaSQLite) else
+                                                     {"arrendado": 0, "concluido": 0, "falhou": 0})
+
+
+def test_arrendar_concluir(fila):
+    fila.enfileirar("arquivo", ["/x.pdf"])
+    item = fila.arrendar("w1", lease_s=60)
+    assert item["alvo"] == "/x.pdf" and item["tentativas"] == 1
+    assert fila.arrendar("w2", lease_s=60) is None
+    fila.concluir(item, "w1", "x.md")
+    assert fila.estatisticas().get("concluido") == 1
+
+
+def test_arrendamento_vencido_volta_e_dono_antigo_perde_o_item(fila):
+    fila.enfileirar("arquivo", ["/x.pdf"])
+    velho = fila.arrendar("w1", lease_s=0.05)
+    time.sleep(0.1)
+    novo = fila.arrendar("w2", lease_s=60)
+    assert novo is not None and novo["id"] == velho["id"] and novo["tentativas"] == 2
+    # o primeiro worker não pode mais renovar, concluir, falhar nem devolver
+    assert not fila.renovar(velho, "w1")
+    fila.concluir(velho, "w1")
+    fila.falhar(velho, "w1", "erro")
+    fila.devolver(velho, "w1")
+    assert fila.estatisticas().get("arrendado") == 1
+    assert fila.renovar(novo, "w2")
+    fila.concluir(novo, "w2")
+    assert fila.estatisticas().get("concluido") == 1
+
+
+def test_falhar_repete_ate_esgotar_e_repetir_falhos(fila):
+    fila.enfileirar("arquivo", ["/x.pdf"], max_tentativas=2)
+    item = fila.arrendar("w", lease_s=60)
+    fila.falhar(item, "w", "primeira")
+    item = fila.arrendar("w", lease_s=60)
+    assert item["tentativas"] == 2 and item["erro"] == "primeira"
+    fila.falhar(item, "w", "segunda")
+    assert fila.arrendar("w", lease_s=60) is None
+    assert fila.estatisticas().get("falhou") == 1
+    assert fila.repetir_falhos() == 1
+    assert fila.arrendar("w", lease_s=60)["tentativas"] == 1
+
+
+def test_devolver_nao_conta_tentativa(fila):
+    fila.enfileirar("arquivo", ["/x.pdf"])
+    fila.devolver(fila.arrendar("w", lease_s=60), "w")
+    assert fila.arrendar("w", lease_s=60)["tentativas"] == 1
+
+
+@pytest.mark.parametrize("n_workers", [2, 4])
+def test_workers_processam_cada_item_uma_vez(tmp_path, monkeypatch, n_workers):
+    """
+    Poucos itens, cada um falhando ou sendo devolvido várias vezes antes de concluir:
+    as idas e voltas para pendentes/ (visíveis na hora) não podem deixar outro worker
+    arrendar uma cópia do item. A gravação lenta (como num compartilhamento de rede)
+    alarga a janela entre mover e regravar o JSON.
+    """
+    gravar = m.gravar_atomico
+
+    def gravar_lento(destino, conteudo):
+        time.sleep(0.003)
+        gravar(destino, conteudo)
+
+    monkeypatch.setattr(m, "gravar_atomico", gravar_lento)
+    raiz = tmp_path / "fila"
+    n_itens, voltas = 3, 30
+    m.FilaDiretorio(raiz).enfileirar("arquivo", [f"/doc{i}.pdf" for i in range(n_itens)], max_tentativas=100)
+    lock = threading.Lock()
+    em_andamento, concluidos, passos, erros = set(), Counter(), Counter(), []
+
+    def worker(dono):
+        fila = m.FilaDiretorio(raiz)
+        ociosas = 0
+        while ociosas < 50:
+            item = fila.arrendar(dono, lease_s=60)
+            if item is None:
+                ociosas += 1
+                time.sleep(0.002)
+                continue
+            ociosas = 0
+            with lock:
+                if item["id"] in em_andamento:
+                    erros.append(f"{item['id']} arrendado duas vezes")
+                em_andamento.add(item["id"])
+                passos[item["id"]] += 1
+                passo = passos[item["id"]]
+                em_andamento.discard(item["id"])
+                if passo == voltas:
+                    concluidos[item["id"]] += 1
+            if passo >= voltas:
+                fila.concluir(item, dono)
+            elif passo % 2:
+                fila.falhar(item, dono, "tente de novo")
+            else:
+                fila.devolver(item, dono)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(n_workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not erros
+    assert dict(passos) == {i: voltas for i in passos} and len(passos) == n_itens
+    assert len(concluidos) == n_itens and set(concluidos.values()) == {1}
+    assert m.FilaDiretorio(raiz).estatisticas() == {
+        "pendente": 0, "arrendado": 0, "concluido": n_itens, "falhou": 0}
+    assert not [p for p in raiz.rglob("*") if p.is_file() and not p.name.endswith(".json")]
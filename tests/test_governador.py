@@ -0,0 +1,163 @@
+import threading
+import time
+
+import pytest
+
+from conftest import m
+
+
+@pytest.fixture
+def gov(monkeypatch):
+    """Governador próprio (não o do processo), reavaliando a cada reserva e com RSS controlado pelo teste."""
+    monkeypatch.setattr(m, "GOV_INTERVALO_AJUSTE_S", 0)
+    rss = {"mb": None}
+    monkeypatch.setattr(m, "rss_atual_mb", lambda: rss["mb"])
+    g = m.GovernadorRecursos(conversoes=4, bytes_em_voo=8 * m.MAX_ASSET_BYTES, chamadas_api=4, limite_rss_mb=1000)
+    g.rss = rss
+    return g
+
+
+def test_cota_limita_o_uso_simultaneo():
+    cota = m._Cota(2)
+    ativos, maximo = [], []
+    trava = threading.Lock()
+
+    def trabalhar():
+        cota.adquirir()
+        with trava:
+            ativos.append(1)
+            maximo.append(len(ativos))
+        time.sleep(0.05)
+        with trava:
+            ativos.pop()
+        cota.liberar()
+
+    threads = [threading.Thread(target=trabalhar) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(maximo) == 2 and cota.pico == 2 and cota.em_uso == 0
+    assert cota.esperas >= 1
+
+
+def test_pedido_maior_que_o_limite_passa_sozinho():
+    cota = m._Cota(10)
+    cota.adquirir(50)  # nada em uso: não trava para sempre
+    assert cota.em_uso == 50
+    liberado = threading.Event()
+
+    def outro():
+        cota.adquirir(1)
+        liberado.set()
+
+    threading.Thread(target=outro, daemon=True).start()
+    assert not liberado.wait(0.2)  # ...mas os outros esperam ele sair
+    cota.liberar(50)
+    assert liberado.wait(2)
+
+
+def test_cancelamento_durante_a_espera():
+    cota = m._Cota(1)
+    cota.adquirir()
+    job = m.Job("espera")
+    job.cancelar()
+    with pytest.raises(m.JobCancelado):
+        cota.adquirir(job=job)
+    assert cota.em_uso == 1
+
+
+def test_ajustar_respeita_minimo_e_maximo():
+    cota = m._Cota(8, minimo=2)
+    cota.ajustar(1)
+    assert cota.limite == 2
+    cota.ajustar(100)
+    assert cota.limite == 8
+    cota.redefinir(3)
+    assert (cota.maximo, cota.limite) == (3, 3)
+
+
+def test_reservar_libera_mesmo_com_erro(gov):
+    with pytest.raises(ValueError):
+        with gov.reservar("conversoes"):
+            assert gov.cotas["conversoes"].em_uso == 1
+            raise ValueError
+    assert gov.cotas["conversoes"].em_uso == 0
+
+
+def test_rss_alto_corta_pela_metade_e_baixo_sobe_aos_poucos(gov):
+    conv, bytes_ = gov.cotas["conversoes"], gov.cotas["bytes_download"]
+    gov.rss["mb"] = 950  # acima de 90% do limite
+    with gov.reservar("conversoes"):
+        pass
+    assert conv.limite == 1  # 4 → 2 → 1 (antes e depois da reserva)
+    assert bytes_.limite == 2 * m.MAX_ASSET_BYTES
+    assert gov.reducoes == 2 and "conversoes 4→2 (RSS 950 MB de 1000 MB)" in gov.ajustes[0]
+
+    gov.rss["mb"] = 800  # entre 70% e 90%: fica como está
+    with gov.reservar("conversoes"):
+        pass
+    assert conv.limite == 1
+
+    gov.rss["mb"] = 300  # abaixo de 70%: +1 conversão, +1/8 do máximo de bytes por vez
+    with gov.reservar("conversoes"):
+        pass
+    assert conv.limite == 3 and bytes_.limite == 4 * m.MAX_ASSET_BYTES
+    for _ in range(5):
+        with gov.reservar("conversoes"):
+            pass
+    assert conv.limite == 4 and bytes_.limite == bytes_.maximo  # nunca passa do configurado
+    assert gov.estado()["rss_pico_mb"] == 950
+
+
+def test_bytes_nunca_abaixo_de_um_asset(gov):
+    gov.rss["mb"] = 999
+    for _ in range(10):
+        with gov.reservar("conversoes"):
+            pass
+    assert gov.cotas["bytes_download"].limite == m.MAX_ASSET_BYTES
+    assert gov.cotas["conversoes"].limite == 1
+
+
+def test_latencia_da_api_ajusta_as_chamadas(gov):
+    api = gov.cotas["chamadas_api"]
+    gov.latencia_alvo_s = 0.01
+    with gov.reservar("chamadas_api"):
+        time.sleep(0.05)
+    assert gov.latencia_media_s >= 0.05 and api.limite == 3
+
+    gov.latencia_alvo_s = 100  # rápidas de novo: volta a subir
+    for _ in range(3):
+        with gov.reservar("chamadas_api"):
+            pass
+    assert api.limite == 4
+
+
+def test_memoria_apertada_segura_a_subida_da_api(gov):
+    api = gov.cotas["chamadas_api"]
+    api.ajustar(2)
+    gov.latencia_media_s = 0.0
+    gov.rss["mb"] = 800
+    with gov.reservar("conversoes"):
+        pass
+    assert api.limite == 2
+
+
+def test_configurar_e_estado(gov):
+    gov.configurar(conversoes=6, bytes_em_voo=10 * m.MAX_ASSET_BYTES, chamadas_api=4, limite_rss_mb=2000)
+    estado = gov.estado()
+    assert estado["cotas"]["conversoes"] == {"limite": 6, "maximo": 6, "em_uso": 0, "pico": 0, "esperas": 0}
+    assert estado["cotas"]["bytes_download"]["maximo"] == 10 * m.MAX_ASSET_BYTES
+    assert estado["limite_rss_mb"] == 2000 and estado["latencia_api_media_ms"] is None
+
+
+def test_conversor_aplica_os_limites_da_configuracao(conversor, tmp_path, monkeypatch):
+    proprio = m.GovernadorRecursos()
+    monkeypatch.setattr(m, "governador", proprio)
+    doc = tmp_path / "doc.html"
+    doc.write_text("<h1>Doc</h1>", encoding="utf-8")
+    conv = conversor(indexar=False, max_conversoes=1, max_chamadas_api=2)
+    assert conv.processar_arquivos([doc]) == 1
+    assert proprio.cotas["conversoes"].maximo == 1 and proprio.cotas["chamadas_api"].maximo == 2
+    assert proprio.cotas["conversoes"].pico == 1
+    assert conv.registro.recursos["cotas"]["conversoes"]["pico"] == 1  # o estado vai para o relatório
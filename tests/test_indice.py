@@ -0,0 +1,180 @@
+import sqlite3
+
+import pytest
+
+from conftest import m
+
+
+def _tem_fts5() -> bool:
+    db = sqlite3.connect(":memory:")
+    try:
+        db.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        db.close()
+
+
+pytestmark = pytest.mark.skipif(not _tem_fts5(), reason="SQLite sem FTS5")
+
+JARDIM = """# Jardinagem
+
+Introdução ao cultivo doméstico.
+
+## Girassóis
+
+O plantio de girassóis começa no outono, em solo bem drenado.
+
+```bash
+# Comentário que não é título
+echo plantio
+```
+
+## Regas
+
+Regar pela manhã evita fungos nas folhas.
+"""
+
+
+@pytest.fixture
+def indice(tmp_path):
+    i = m.IndiceMarkdown(tmp_path)
+    yield i
+    i.fechar()
+
+
+def gravar(pasta, nome, texto):
+    md = pasta / nome
+    md.parent.mkdir(parents=True, exist_ok=True)
+    md.write_text(texto, encoding="utf-8")
+    return md
+
+
+def test_trechos_seguem_os_cabecalhos():
+    trechos = m.trechos_markdown(JARDIM)
+    assert [t for t, _, _ in trechos] == ["Jardinagem", "Jardinagem › Girassóis", "Jardinagem › Regas"]
+    _, ini, fim = trechos[1]
+    assert JARDIM[ini:fim].startswith("## Girassóis") and "echo plantio" in JARDIM[ini:fim]
+    assert "".join(JARDIM[a:b] for _, a, b in trechos) == JARDIM  # offsets contíguos, nada perdido
+
+
+def test_secao_longa_e_cortada_em_paragrafos(monkeypatch):
+    monkeypatch.setattr(m, "INDEX_CHUNK_CHARS", 100)
+    paragrafo = "palavra " * 15 + "\n\n"  # 122 caracteres
+    texto = "# Longo\n\n" + paragrafo * 5 + "x" * 450 + "\n"
+    trechos = m.trechos_markdown(texto)
+    assert all(t == "Longo" for t, _, _ in trechos)
+    assert all(b - a < 2 * 100 + len(paragrafo) for _, a, b in trechos[:-2])
+    assert len(trechos) >= 6
+
+
+def test_indexar_e_buscar(indice, tmp_path):
+    md = gravar(tmp_path, "jardim.md", JARDIM)
+    assert indice.indexar(md, JARDIM, "https://jardim.exemplo/", "captura") == 3
+    hits = indice.buscar("girassois outono")  # sem acento casa com acento
+    assert len(hits) == 1
+    h = hits[0]
+    assert (h["md"], h["origem"], h["tipo"], h["titulo"]) == \
+        ("jardim.md", "https://jardim.exemplo/", "captura", "Jardinagem › Girassóis")
+    assert JARDIM[h["inicio"]:h["fim"]].startswith("## Girassóis")
+    assert "**girassóis**" in h["trecho"] and h["pontuacao"] > 0
+
+    assert [h["titulo"] for h in indice.buscar("titulo:regas")] == ["Jardinagem › Regas"]
+    assert len(indice.buscar("plant*")) == 1
+    assert indice.buscar('"folhas nas manhã"') == []
+    assert indice.estatisticas() == {"documentos": 1, "trechos": 3}
+
+
+def test_titulo_pesa_mais_que_o_texto(indice, tmp_path):
+    a = gravar(tmp_path, "a.md", "# Outro assunto\n\nFala de regas de passagem.\n")
+    b = gravar(tmp_path, "b.md", "# Regas\n\nComo fazer em casa.\n")
+    for md in (a, b):
+        indice.indexar(md, md.read_text(encoding="utf-8"))
+    assert [h["md"] for h in indice.buscar("regas")] == ["b.md", "a.md"]
+
+
+def test_sintaxe_invalida_vira_busca_literal(indice, tmp_path):
+    md = gravar(tmp_path, "c.md", "# C\n\nCompilar com c++ e o \"make\" aberto.\n")
+    indice.indexar(md, md.read_text(encoding="utf-8"))
+    assert len(indice.buscar('c++ "make')) == 1
+    assert indice.buscar("  ") == [] and indice.buscar('"') == []
+
+
+def test_reindexar_inalterado_nao_faz_nada_e_alterado_troca_os_trechos(indice, tmp_path):
+    md = gravar(tmp_path, "j.md", JARDIM)
+    indice.indexar(md, JARDIM)
+    assert indice.indexar(md, JARDIM, "origem-nova", "arquivo") == 0
+    assert indice.buscar("girassois")[0]["origem"] == "origem-nova"  # só a origem é atualizada
+
+    novo = JARDIM.replace("girassóis", "tulipas").replace("Girassóis", "Tulipas")
+    assert indice.indexar(md, novo) == 3
+    assert indice.buscar("girassois") == [] and len(indice.buscar("tulipas")) == 1
+    assert indice.buscar("tulipas")[0]["origem"] == "origem-nova"  # COALESCE mantém a anterior
+    assert indice.estatisticas() == {"documentos": 1, "trechos": 3}
+
+
+def test_remover(indice, tmp_path):
+    a, b = gravar(tmp_path, "a.md", "# A\n\nmaçã\n"), gravar(tmp_path, "b.md", "# B\n\nmaçã\n")
+    for md in (a, b):
+        indice.indexar(md, md.read_text(encoding="utf-8"))
+    indice.remover(a)
+    indice.remover(tmp_path / "nunca-indexado.md")
+    assert [h["md"] for h in indice.buscar("maca")] == ["b.md"]
+
+
+def test_reindexar_pasta(indice, tmp_path):
+    gravar(tmp_path, "a.md", "# A\n\nabacate\n")
+    gravar(tmp_path, "sub/b.md", "# B\n\nbanana\n")
+    mensagens = []
+    assert indice.reindexar_pasta(log=mensagens.append) == (2, 0)
+    assert [h["md"] for h in indice.buscar("banana")] == ["sub/b.md"]
+    assert indice.reindexar_pasta(log=mensagens.append) == (0, 0)
+
+    (tmp_path / "a.md").unlink()
+    gravar(tmp_path, "sub/b.md", "# B\n\nbanana nanica\n")
+    assert indice.reindexar_pasta(log=mensagens.append) == (1, 1)
+    assert indice.buscar("abacate") == [] and len(indice.buscar("nanica")) == 1
+    assert mensagens[-1] == "• Índice: 1 documento(s) atualizado(s), 1 removido(s)."
+
+
+def test_indice_persiste_entre_aberturas(tmp_path):
+    md = gravar(tmp_path, "j.md", JARDIM)
+    primeiro = m.IndiceMarkdown(tmp_path)
+    primeiro.indexar(md, JARDIM)
+    primeiro.fechar()
+    segundo = m.IndiceMarkdown(tmp_path)
+    try:
+        assert segundo.indexar(md, JARDIM) == 0 and len(segundo.buscar("regar")) == 1
+    finally:
+        segundo.fechar()
+
+
+def test_conversao_indexa_cada_md_gravado(conversor, tmp_path):
+    doc = tmp_path / "receita.html"
+    doc.write_text("<h1>Receita</h1><h2>Massa</h2><p>Farinha, ovos e açúcar.</p>", encoding="utf-8")
+    conv = conversor()
+    assert conv.processar_arquivos([doc]) == 1
+    hits = conv.buscar("acucar")
+    assert len(hits) == 1 and hits[0]["md"] == "receita.md" and hits[0]["titulo"] == "Receita › Massa"
+    assert hits[0]["origem"] == str(doc)
+    assert conv.registro.contadores["trechos_indexados"] >= 1
+
+
+def test_erro_no_sqlite_desativa_o_indice_sem_derrubar_a_conversao(conversor, tmp_path, monkeypatch):
+    tentativas = []
+
+    def indice_quebrado(pasta):
+        tentativas.append(pasta)
+        raise sqlite3.OperationalError("no such module: fts5")
+
+    monkeypatch.setattr(m, "IndiceMarkdown", indice_quebrado)
+    docs = []
+    for nome in ("a.html", "b.html"):
+        docs.append(tmp_path / nome)
+        docs[-1].write_text(f"<h1>{nome}</h1>", encoding="utf-8")
+    conv = conversor()
+    assert conv.processar_arquivos(docs) == 2
+    assert (conv.output_dir / "b.md").exists()
+    assert len(tentativas) == 1 and conv._indice_desativado
+    assert sum("Índice de busca desativado" in msg for msg in conv.mensagens) == 1
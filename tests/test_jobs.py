@@ -0,0 +1,105 @@
+import queue
+import threading
+
+import pytest
+
+from conftest import m
+
+
+def eventos_ate_o_fim(eventos: queue.Queue, *jobs: m.Job) -> list:
+    """Eventos (tipo, dado) de cada job até o terminal (fim/erro/cancelado); um job só devolve a lista."""
+    vistos = {job: [] for job in jobs}
+    pendentes = set(jobs)
+    while pendentes:
+        tipo, job, dado = eventos.get(timeout=5)
+        vistos[job].append((tipo, dado))
+        if tipo in ("fim", "erro", "cancelado"):
+            pendentes.discard(job)
+    return vistos[jobs[0]] if len(jobs) == 1 else [vistos[job] for job in jobs]
+
+
+@pytest.fixture
+def gerenciador():
+    eventos = queue.Queue()
+    g = m.GerenciadorJobs(eventos, workers=1)
+    yield g
+    g.encerrar()
+
+
+def test_job_emite_estado_progresso_e_resultado(gerenciador):
+    def trabalho(a, b, job):
+        job.progresso(1, 2, "metade")
+        return a + b
+
+    job = gerenciador.submeter("soma", trabalho, 2, 3)
+    assert eventos_ate_o_fim(gerenciador.eventos, job) == [
+        ("estado", "na fila"), ("estado", "executando"), ("progresso", (1, 2, "metade")), ("fim", 5)]
+    assert job.id not in gerenciador.jobs
+
+
+def test_excecao_vira_evento_de_erro(gerenciador):
+    def quebra(job):
+        raise ValueError("ruim")
+
+    tipo, erro = eventos_ate_o_fim(gerenciador.eventos, gerenciador.submeter("x", quebra))[-1]
+    assert tipo == "erro" and isinstance(erro, ValueError)
+
+
+def test_cancelamento_cooperativo_em_execucao(gerenciador):
+    comecou = threading.Event()
+
+    def longo(job):
+        comecou.set()
+        while True:
+            job.checar()
+            job._cancel.wait(0.01)
+
+    job = gerenciador.submeter("longo", longo)
+    assert comecou.wait(5)
+    gerenciador.cancelar(job.id)
+    assert eventos_ate_o_fim(gerenciador.eventos, job)[-1] == ("cancelado", None)
+
+
+def test_job_cancelado_na_fila_nem_comeca(gerenciador):
+    libera = threading.Event()
+    rodou = []
+    primeiro = gerenciador.submeter("bloqueia", lambda job: libera.wait(5))
+    segundo = gerenciador.submeter("na fila", lambda job: rodou.append(job))
+    gerenciador.cancelar(segundo.id)
+    libera.set()
+
+    do_primeiro, do_segundo = eventos_ate_o_fim(gerenciador.eventos, primeiro, segundo)
+    assert do_primeiro[-1] == ("fim", True)
+    assert do_segundo == [("estado", "na fila"), ("cancelado", None)]
+    assert rodou == []
+
+
+def test_job_sem_fila_de_eventos_ignora_progresso():
+    job = m.Job("avulso")
+    job.progresso(1, 1)
+    job.cancelar()
+    with pytest.raises(m.JobCancelado):
+        job.checar()
+
+
+def test_cancelar_lote_de_arquivos_para_entre_arquivos(conversor, tmp_path):
+    entradas = []
+    for i in range(3):
+        html = tmp_path / f"doc{i}.html"
+        html.write_text(f"<html><body><h1>Doc {i}</h1><p>texto</p></body></html>", encoding="utf-8")
+        entradas.append(html)
+    conv = conversor(indexar=False)
+    job = m.Job("lote")
+    avisos = []
+
+    def progresso(atual, total, texto=""):
+        avisos.append(atual)
+        if atual == 1:  # cancela durante o segundo: ele termina, o terceiro não começa
+            job.cancelar()
+
+    job.progresso = progresso
+    with pytest.raises(m.JobCancelado):
+        conv.processar_arquivos(entradas, job=job)
+    assert sorted(p.name for p in conv.output_dir.glob("*.md")) == ["doc0.md", "doc1.md"]
+    assert avisos == [0, 1]
+    assert conv.registro.status == "cancelado"
@@ -0,0 +1,105 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conftest import m, png
+
+pytest.importorskip("openai")
+
+
+class ServidorChat:
+    """Servidor local compatível com Chat Completions (como Ollama/llama.cpp); responde `legenda`."""
+
+    def __init__(self, legenda: str):
+        self.legenda = legenda
+        self.pedidos: list[dict] = []
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                servidor.pedidos.append({"caminho": self.path, "json": json.loads(corpo)})
+                resposta = json.dumps({
+                    "id": "chat-1", "object": "chat.completion", "created": 0, "model": "m",
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": f"  {servidor.legenda}\n"}}],
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(resposta)))
+                self.end_headers()
+                self.wfile.write(resposta)
+
+        self._srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._srv.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._srv.server_port}/v1"
+
+    def fechar(self):
+        self._srv.shutdown()
+        self._srv.server_close()
+
+
+@pytest.fixture
+def servidor_chat():
+    s = ServidorChat("Quadrado vermelho")
+    yield s
+    s.fechar()
+
+
+def test_servidor_local_legenda_imagem_sem_chave_da_openai(conversor, servidor_chat, tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(m, "load_openai_key_from_file", lambda: None)
+    foto = tmp_path / "foto.png"
+    foto.write_bytes(png())
+    conv = conversor(use_openai=True, desc_mode="direct", caption_backend="servidor-local",
+                     caption_base_url=servidor_chat.url, model="llava", indexar=False)
+
+    assert conv.processar_arquivos([foto]) == 1
+
+    md = (conv.output_dir / "foto.md").read_text(encoding="utf-8")
+    assert md.startswith("![Quadrado vermelho](foto.png)")
+    assert "llava (servidor local)" in md
+    pedido, = servidor_chat.pedidos
+    assert pedido["caminho"] == "/v1/chat/completions"
+    assert pedido["json"]["model"] == "llava"
+    conteudo = pedido["json"]["messages"][0]["content"]
+    assert conteudo[1]["image_url"]["url"].startswith("data:image/png;base64,")
+    assert any("servidor-local: 1 imagem(ns)" in msg for msg in conv.mensagens)
+
+
+def test_ocr_sem_texto_cai_no_backend_configurado(conversor, servidor_chat, monkeypatch):
+    monkeypatch.setattr(m.LegendadorOCR, "_legendar", lambda self, dados, mime: "")
+    conv = conversor(caption_backend="servidor-local", caption_base_url=servidor_chat.url,
+                     ocr_screenshots=True)
+
+    assert conv._legendar_bytes(png(), "image/png", texto=True) == "Quadrado vermelho"
+    assert conv._legendador("ocr").chamadas == 1
+    assert conv.registro.contadores["legendas_via_ocr"] == 0
+
+
+def test_ocr_com_texto_dispensa_o_backend(conversor, servidor_chat, monkeypatch):
+    monkeypatch.setattr(m.LegendadorOCR, "_legendar", lambda self, dados, mime: "Captura de tela")
+    conv = conversor(caption_backend="servidor-local", caption_base_url=servidor_chat.url,
+                     ocr_screenshots=True)
+
+    assert conv._legendar_bytes(png(), "image/png", texto=True) == "Captura de tela"
+    assert conv.registro.contadores["legendas_via_ocr"] == 1
+    assert servidor_chat.pedidos == []
+
+
+def test_erro_de_legendagem_vira_alt_vazio_e_conta_falha(conversor, tmp_path):
+    foto = tmp_path / "foto.png"
+    foto.write_bytes(png())
+    # porta fechada: o cliente falha ao conectar
+    conv = conversor(caption_backend="servidor-local", caption_base_url="http://127.0.0.1:9/v1")
+    conv._legendador("servidor-local").client = conv._legendador("servidor-local").client.with_options(
+        max_retries=0, timeout=2)
+
+    assert conv._gerar_alt_para_imagem(foto) == ""
+    assert conv._legendador("servidor-local").falhas == 1
+    assert any("Erro de legendagem (servidor-local)" in msg for msg in conv.mensagens)
@@ -0,0 +1,115 @@
+import json
+from types import SimpleNamespace
+
+from conftest import m, png
+
+
+class ClienteLotes:
+    """Imita o pedaço da API (files/batches) que o LoteLegendas usa; respostas = {custom_id: texto}."""
+
+    def __init__(self, respostas: dict):
+        self.respostas = respostas
+        self.enviados: list[list[dict]] = []
+        self.status = "in_progress"
+        self.files = SimpleNamespace(create=self._enviar_arquivo, content=self._conteudo)
+        self.batches = SimpleNamespace(create=self._criar_lote, retrieve=self._consultar)
+
+    def _enviar_arquivo(self, file, purpose):
+        self.enviados.append([json.loads(linha) for linha in file.read().splitlines()])
+        return SimpleNamespace(id=f"arq-{len(self.enviados)}")
+
+    def _criar_lote(self, input_file_id, **_):
+        return SimpleNamespace(id=f"lote-{input_file_id}", status="validating")
+
+    def _consultar(self, lote_id):
+        return SimpleNamespace(status=self.status, output_file_id=f"saida-{lote_id}", error_file_id=None)
+
+    def _conteudo(self, arquivo_id):
+        linhas = [json.dumps({"custom_id": cid, "response": {"body": {"output_text": texto}}})
+                  for cid, texto in self.respostas.items()]
+        return SimpleNamespace(text="\n".join(linhas))
+
+
+def imagens(tmp_path, n):
+    caminhos = []
+    for i in range(n):
+        caminho = tmp_path / f"img{i}.png"
+        caminho.write_bytes(png(ruido=i + 1))
+        caminhos.append(caminho)
+    return caminhos
+
+
+def test_adicionar_devolve_um_marcador_por_imagem(tmp_path):
+    a, b = imagens(tmp_path, 2)
+    lote = m.LoteLegendas(tmp_path, "modelo", "descreva")
+    assert lote.adicionar(a) == "{{ALT:img-000001}}"
+    assert lote.adicionar(b) == "{{ALT:img-000002}}"
+    assert lote.adicionar(tmp_path / "." / "img0.png") == "{{ALT:img-000001}}"
+    assert len(lote.itens) == 2
+
+
+def test_submeter_grava_jsonl_e_manifesto(tmp_path, monkeypatch):
+    monkeypatch.setattr(m, "BATCH_MAX_REQUESTS", 2)
+    lote = m.LoteLegendas(tmp_path, "modelo", "descreva", log=lambda msg: None)
+    for img in imagens(tmp_path, 3):
+        lote.adicionar(img)
+    cliente = ClienteLotes({})
+
+    manifesto = lote.submeter(client=cliente)
+
+    assert [[p["custom_id"] for p in parte] for parte in cliente.enviados] == \
+        [["img-000001", "img-000002"], ["img-000003"]]
+    pedido = cliente.enviados[0][0]
+    assert pedido["url"] == m.BATCH_ENDPOINT and pedido["body"]["model"] == "modelo"
+    conteudo = pedido["body"]["input"][0]["content"]
+    assert conteudo[0]["text"] == "descreva"
+    assert conteudo[1]["image_url"].startswith("data:image/png;base64,")
+    dados = json.loads(manifesto.read_text(encoding="utf-8"))
+    assert len(dados["lotes"]) == 2 and dados["concluido"] is False
+
+
+def test_submeter_sem_itens_nao_envia(tmp_path):
+    assert m.LoteLegendas(tmp_path, "modelo", "descreva").submeter(client=ClienteLotes({})) is None
+
+
+def test_verificar_pendentes_mescla_so_quando_o_lote_termina(tmp_path):
+    a, b = imagens(tmp_path, 2)
+    lote = m.LoteLegendas(tmp_path, "modelo", "descreva", log=lambda msg: None)
+    md = tmp_path / "doc.md"
+    md.write_text(f"![{lote.adicionar(a)}](img0.png)\n![{lote.adicionar(b)}](img1.png)\n", encoding="utf-8")
+    lote.registrar_markdown(md)
+    cliente = ClienteLotes({"img-000001": "Gato [preto]\nno sofá"})
+    lote.submeter(client=cliente)
+    log = []
+
+    assert m.LoteLegendas.verificar_pendentes(tmp_path, client=cliente, log=log.append) == (0, 1)
+    assert "{{ALT:" in md.read_text(encoding="utf-8")
+
+    cliente.status = "completed"
+    assert m.LoteLegendas.verificar_pendentes(tmp_path, client=cliente, log=log.append) == (1, 0)
+    assert md.read_text(encoding="utf-8") == "![Gato (preto) no sofá](img0.png)\n![(sem descrição)](img1.png)\n"
+    assert any("1 sem resposta" in msg for msg in log)
+    # manifesto concluído não é consultado de novo
+    assert m.LoteLegendas.verificar_pendentes(tmp_path, client=cliente, log=log.append) == (0, 0)
+
+
+def test_conversao_em_modo_lote_envia_e_mescla_no_md(conversor, tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-teste")
+    cliente = ClienteLotes({"img-000001": "Um quadrado vermelho"})
+    monkeypatch.setattr(m, "OpenAI", lambda: cliente)
+    foto, = imagens(tmp_path, 1)
+    conv = conversor(use_openai=True, desc_mode="batch", indexar=False)
+
+    assert conv.processar_arquivos([foto]) == 1
+    md = conv.output_dir / "img0.md"
+    assert "{{ALT:img-000001}}" in md.read_text(encoding="utf-8")
+    assert len(cliente.enviados) == 1
+
+    cliente.status = "completed"
+    assert conv.aguardar_lotes() == 1
+    assert "![Um quadrado vermelho](" in md.read_text(encoding="utf-8")
+    diario = m.DiarioJobs(conv.output_dir / m.JOURNAL_FILE_NAME)
+    try:
+        assert diario.contagem() == {"legendado": 1}
+    finally:
+        diario.fechar()
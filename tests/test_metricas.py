@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from conftest import m
+
+
+def test_percentil_por_posicao_mais_proxima():
+    assert m._percentil([], 50) == 0.0
+    assert m._percentil([3, 1, 2, 4], 50) == 2
+    assert m._percentil([3, 1, 2, 4], 95) == 4
+    assert m._percentil([5], 0) == 5
+
+
+def test_etapa_mede_mesmo_quando_falha():
+    reg = m.RegistroExecucao("teste", "alvo")
+    with reg.etapa("ok", arquivo="a.html"):
+        pass
+    with pytest.raises(ValueError), reg.etapa("quebra"):
+        raise ValueError
+    ok, quebra = reg.spans
+    assert ok["etapa"] == "ok" and ok["attrs"] == {"arquivo": "a.html"} and "erro" not in ok
+    assert quebra["erro"] == "ValueError"
+
+
+def test_resumo_soma_etapas_contadores_e_latencias():
+    reg = m.RegistroExecucao("captura", "exemplo.com")
+    for _ in range(2):
+        with reg.etapa("downloads"):
+            pass
+    reg.contar("imagens")
+    reg.contar("bytes_baixados", 1000)
+    for s in (0.1, 0.2, 0.3):
+        reg.latencia("legendagem.openai", s)
+    reg.status = "ok"
+
+    r = reg.resumo()
+    assert list(r["etapas_ms"]) == ["downloads"]
+    assert r["contadores"] == {"imagens": 1, "bytes_baixados": 1000}
+    assert r["apis"]["legendagem.openai"] == {"chamadas": 3, "p50_ms": 200.0, "p95_ms": 300.0, "max_ms": 300.0}
+    texto = reg.relatorio(r)
+    assert texto.startswith("Relatório captura exemplo.com — ok")
+    assert "bytes_baixados=1000, imagens=1" in texto
+    assert "API legendagem.openai: 3 chamada(s), p50 200 ms, p95 300 ms" in texto
+
+
+@pytest.mark.parametrize("formato, jsonl, prom", [
+    ("jsonl", True, False), ("prometheus", False, True), ("ambos", True, True), ("nenhum", False, False)])
+def test_gravar_respeita_o_formato(tmp_path, formato, jsonl, prom):
+    reg = m.RegistroExecucao("arquivos", "2 arquivos")
+    with reg.etapa("md.convert"):
+        pass
+    reg.contar("arquivos_ok", 2)
+    reg.gravar(tmp_path, formato)
+
+    assert (tmp_path / "metricas.jsonl").exists() == jsonl
+    assert (tmp_path / "prom" / "arquivos_2_arquivos.prom").exists() == prom
+    if jsonl:
+        linhas = [json.loads(x) for x in (tmp_path / "metricas.jsonl").read_text(encoding="utf-8").splitlines()]
+        assert [x["registro"] for x in linhas] == ["span", "resumo"]
+        assert linhas[0]["run"] == reg.id and linhas[1]["contadores"] == {"arquivos_ok": 2}
+    if prom:
+        texto = (tmp_path / "prom" / "arquivos_2_arquivos.prom").read_text(encoding="utf-8")
+        assert 'mdtollm_contador{tipo="arquivos",alvo="2 arquivos",nome="arquivos_ok"} 2' in texto
+        assert 'etapa="md.convert"' in texto
+
+
+def test_conversao_de_arquivos_grava_metricas_da_execucao(conversor, tmp_path):
+    doc = tmp_path / "doc.html"
+    doc.write_text("<html><body><h1>Título</h1><p>texto</p></body></html>", encoding="utf-8")
+    conv = conversor(metricas="jsonl", indexar=False)
+
+    conv.processar_arquivos([doc, tmp_path / "nao_existe.html"])
+
+    linhas = (conv.output_dir / m.METRICS_DIR_NAME / "metricas.jsonl").read_text(encoding="utf-8").splitlines()
+    resumo = json.loads(linhas[-1])
+    assert resumo["tipo"] == "arquivos" and resumo["status"] == "ok"
+    assert resumo["contadores"]["arquivos_ok"] == 1
+    assert {"md.convert", "gravar_md"} <= set(resumo["etapas_ms"])
+    assert "recursos" in resumo  # estado do governador ao final
+    assert any(msg.startswith("Relatório arquivos") for msg in conv.mensagens)
@@ -0,0 +1,136 @@
+import random
+import re
+import threading
+import time
+
+import pytest
+
+from conftest import m, pagina, png
+
+# 8 URLs, 5 conteúdos: logo e marca são a mesma imagem, assim como f0/f3 e f1/f4
+IMAGENS = {
+    "/img/logo.png": png(ruido=1), "/cdn/marca.png": png(ruido=1),
+    **{f"/fotos/f{i}.png": png(ruido=10 + i % 3) for i in range(5)},
+    "/fotos/extra": png(ruido=20),
+}
+HTML = "".join(f'<img src="{u}" alt="Imagem {i}">' for i, u in enumerate(IMAGENS))
+
+
+def montar(site):
+    for caminho, dados in IMAGENS.items():
+        site.rota(caminho, dados, "image/png")
+    site.rota("/p", pagina(HTML, titulo="Galeria"))
+
+
+def novo(conversor, tmp_path, nome, **opcoes):
+    """Conversor com legendagem falsa: anota (momento, imagem) de cada chamada em `conv.chamadas`."""
+    conv = conversor(output_dir=tmp_path / nome, modo_captura="estatico", indexar=False, triagem_imagens=False,
+                     use_openai=True, desc_mode="direct", caption_backend="servidor-local", **opcoes)
+    conv.chamadas = []
+    trava = threading.Lock()
+
+    def legendar(backend, dados, mime):
+        with trava:
+            conv.chamadas.append((time.perf_counter(), dados))
+            return f"legenda {len(conv.chamadas)}"
+
+    conv._legendar_com = legendar
+    return conv
+
+
+def atrasar_downloads(monkeypatch, conv, atrasos):
+    """GETs da sessão HTTP do conversor com atraso por caminho; anota quando cada um terminou."""
+    sessao = conv._sessao_http()
+    get = sessao.get
+    conv.fim_download = {}
+
+    def get_lento(url, **kwargs):
+        caminho = url.split("://", 1)[1].split("/", 1)[-1]
+        time.sleep(atrasos.get("/" + caminho, 0))
+        r = get(url, **kwargs)
+        conv.fim_download["/" + caminho] = time.perf_counter()
+        return r
+
+    monkeypatch.setattr(sessao, "get", get_lento)
+
+
+def md_e_assets(conv):
+    md = next(conv.output_dir.glob("*_p.md"))
+    assets = md.with_name(md.stem + "_assets")
+    return md.read_text(encoding="utf-8"), sorted(p.name for p in assets.iterdir())
+
+
+def test_nomes_e_markdown_nao_dependem_da_ordem_dos_downloads(conversor, site, tmp_path, monkeypatch):
+    montar(site)
+    resultados = set()
+    for rodada in range(4):
+        conv = novo(conversor, tmp_path, f"r{rodada}")
+        ordem = random.Random(rodada)
+        atrasar_downloads(monkeypatch, conv, {c: ordem.uniform(0, 0.05) for c in IMAGENS})
+        assert conv.capturar_urls([site.url("/p")])["nova"] == 1
+        md, assets = md_e_assets(conv)
+        # o texto da legenda varia com a ordem das chamadas: o que precisa ser estável são os arquivos
+        resultados.add((tuple(assets), tuple(re.findall(r"_assets/([^)]+)\)", md)),
+                        tuple(re.findall(r"^- `([^`]+)`", md, re.M))))
+        assert len(conv.chamadas) == 5  # conteúdo repetido é legendado uma vez só
+    assert len(resultados) == 1
+    assets, links, descritas = resultados.pop()
+    assert list(assets) == ["extra.png", "f0.png", "f1.png", "f2.png", "marca.png"]
+    # duplicatas apontam para o arquivo da 1ª URL do plano (ordem alfabética)
+    assert list(links) == ["marca.png", "marca.png", "f0.png", "f1.png", "f2.png", "f0.png", "f1.png", "extra.png"]
+    assert sorted(descritas) == list(assets)
+
+
+def test_legendas_comecam_antes_dos_downloads_acabarem(conversor, site, tmp_path, monkeypatch):
+    montar(site)
+    conv = novo(conversor, tmp_path, "saida")
+    atrasar_downloads(monkeypatch, conv, {"/fotos/extra": 0.8})
+    inicio = time.perf_counter()
+    assert conv.capturar_urls([site.url("/p")])["nova"] == 1
+    primeira_legenda = min(t for t, _ in conv.chamadas)
+    assert primeira_legenda < conv.fim_download["/fotos/extra"]
+    assert primeira_legenda - inicio < 0.8
+
+
+def test_cancelar_durante_a_legendagem_para_o_pipeline(conversor, site, tmp_path, monkeypatch):
+    montar(site)
+    conv = novo(conversor, tmp_path, "saida", max_chamadas_api=1)
+    job = m.Job("captura")
+
+    def legendar_e_cancelar(backend, dados, mime):
+        conv.chamadas.append((time.perf_counter(), dados))
+        job.cancelar()
+        return "legenda"
+
+    conv._legendar_com = legendar_e_cancelar
+    inicio = time.perf_counter()
+    with pytest.raises(m.JobCancelado):
+        conv.capturar_urls([site.url("/p")], job=job)
+    assert time.perf_counter() - inicio < 10
+    assert len(conv.chamadas) == 1  # um só worker de legenda: nenhuma outra chamada depois
+    assert not list(conv.output_dir.glob("*_p.md"))
+
+
+def test_erro_na_conversao_cancela_os_outros_estagios(conversor, site, tmp_path, monkeypatch):
+    montar(site)
+    conv = novo(conversor, tmp_path, "saida")
+
+    def converter_quebrado(*args, **kwargs):
+        raise RuntimeError("MarkItDown caiu")
+
+    monkeypatch.setattr(conv.md, "convert", converter_quebrado)
+    inicio = time.perf_counter()
+    assert conv.capturar_urls([site.url("/p")])["erro"] == 1
+    assert time.perf_counter() - inicio < 10
+    assert not list(conv.output_dir.glob("*_p.md"))
+
+
+def test_filas_limitadas_seguram_o_estagio_anterior(conversor, site, tmp_path, monkeypatch):
+    monkeypatch.setattr(m, "CAPTURE_QUEUE_SIZE", 1)
+    montar(site)
+    conv = novo(conversor, tmp_path, "saida", max_chamadas_api=1)
+    atrasar_downloads(monkeypatch, conv, {c: 0.01 for c in IMAGENS})
+    assert conv.capturar_urls([site.url("/p")])["nova"] == 1
+    md, assets = md_e_assets(conv)
+    assert len(assets) == 5 and len(conv.chamadas) == 5
+    assert all(f"legenda {i}" in md for i in range(1, 6))
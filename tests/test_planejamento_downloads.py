@@ -0,0 +1,45 @@
+from conftest import pagina, png
+
+
+def test_planejar_baixa_so_o_referenciado_e_os_fundos(conversor):
+    conv = conversor()
+    candidatas = {"http://x/a.png", "http://x/b.png", "http://x/fundo.png", "http://x/estilo.css"}
+    md = "texto ![A](http://x/a.png) e [link](http://x/estilo.css)"
+    baixar, evitadas = conv._planejar_downloads(candidatas, md, fundos={"http://x/fundo.png"})
+    assert baixar == {"http://x/a.png", "http://x/estilo.css", "http://x/fundo.png"}
+    assert evitadas == {"http://x/b.png"}
+
+
+def test_planejar_ignora_referencias_fora_das_candidatas(conversor):
+    baixar, evitadas = conversor()._planejar_downloads({"http://x/a.png"}, "![B](http://x/b.png)")
+    assert baixar == set()
+    assert evitadas == {"http://x/a.png"}
+
+
+def test_relocalizar_troca_apenas_urls_baixadas(conversor, tmp_path):
+    conv = conversor()
+    local = conv.output_dir / "pag_assets" / "a.png"
+    md = "![A](http://x/a.png) ![B](http://x/b.png)"
+    assert conv._relocalizar_markdown(md, {"http://x/a.png": str(local)}) == \
+        "![A](pag_assets/a.png) ![B](http://x/b.png)"
+
+
+def test_captura_nao_baixa_recursos_sem_referencia(conversor, site):
+    site.rota("/a.png", png(), "image/png")
+    site.rota("/pre.png", png(ruido=3), "image/png")
+    site.rota("/fundo.png", png(ruido=5), "image/png")
+    site.rota("/p", pagina('<img src="a.png" alt="A">'
+                           '<link rel="preload" as="image" href="pre.png">'
+                           '<div style="background-image:url(fundo.png)">x</div>'))
+    conv = conversor(modo_captura="estatico", indexar=False)
+
+    assert conv.capturar_urls([site.url("/p")])["nova"] == 1
+
+    baixados = {caminho for metodo, caminho, _ in site.pedidos if metodo == "GET"}
+    assert baixados == {"/p", "/a.png", "/fundo.png"}
+    assert ("HEAD", "/pre.png", False) in site.pedidos  # só para estimar os bytes evitados
+    md = next(conv.output_dir.glob("*_p.md"))
+    assets = md.with_name(md.stem + "_assets")
+    assert sorted(p.name for p in assets.iterdir()) == ["a.png", "fundo.png"]
+    assert f"![A]({assets.name}/a.png)" in md.read_text(encoding="utf-8")
+    assert conv.registro.contadores["assets_evitados"] == 1
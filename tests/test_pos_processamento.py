@@ -0,0 +1,136 @@
+import time
+
+import pytest
+
+from conftest import m
+
+
+def basico(texto):
+    return m.PosProcessadorMarkdown("basico").processar(texto)
+
+
+def compacto(texto):
+    return m.PosProcessadorMarkdown("compacto").processar(texto)
+
+
+def test_nenhum_devolve_o_texto_como_veio():
+    texto = "#  Título  \n\n\n\n[x](https://s/?utm_source=n)\r\n"
+    assert m.PosProcessadorMarkdown("nenhum").processar(texto) == texto
+
+
+def test_basico_normaliza_espacos_e_linhas_em_branco():
+    assert basico("\n\n# Título  \n\n\n\nTexto   com \t espaços\nIn\u200bvisível\r\n\n\n") == \
+        "# Título\n\nTexto com espaços\nInvisível\n"
+    # dois espaços no fim da linha são quebra forçada (exceto em título)
+    assert basico("linha um  \nlinha dois") == "linha um  \nlinha dois\n"
+    assert basico("   \n\t\n") == ""
+
+
+@pytest.mark.parametrize("cerca", ["```", "~~~"])
+@pytest.mark.parametrize("processar", [basico, compacto])
+def test_blocos_cercados_passam_intactos(processar, cerca):
+    bloco = f"{cerca}python\nx  =  [a](https://s/?utm_source=n)\n\n\n\n| a |  b |\n   `c`   \n{cerca}\n"
+    assert processar(f"Antes   disso\n{bloco}Depois   disso\n") == f"Antes disso\n{bloco}Depois disso\n"
+
+
+def test_cerca_de_outro_tipo_nao_fecha_o_bloco():
+    texto = "```\n~~~\n  dentro   ainda\n```\nfora   agora\n"
+    assert basico(texto) == "```\n~~~\n  dentro   ainda\n```\nfora agora\n"
+
+
+def test_codigo_indentado_passa_intacto_e_listas_aninhadas_sao_limpas():
+    texto = "Texto:\n\n    x  =  1\n\tf(  y )\n\n- item\n    - aninhado   com   espaço\n    1. numerado   também\n"
+    assert basico(texto) == \
+        "Texto:\n\n    x  =  1\n\tf(  y )\n\n- item\n    - aninhado com espaço\n    1. numerado também\n"
+
+
+def test_code_spans_ficam_intactos():
+    assert basico("Use   `a    b`  e ``x ` [l](javascript:y)``   aqui") == \
+        "Use `a    b` e ``x ` [l](javascript:y)`` aqui\n"
+    # link fora do code span na mesma linha ainda é tratado
+    assert compacto("`[a](#)`   e   [b](#)  `c  d`") == "`[a](#)` e b `c  d`\n"
+    # crase sem par é literal: os espaços depois dela são colapsados
+    assert basico("um ` dois    três") == "um ` dois três\n"
+
+
+def test_trechos_codigo():
+    assert m.trechos_codigo("a `b` ``c ` d`` ```e") == [(2, 5), (6, 15)]
+    assert m.trechos_codigo("``a`b``") == [(0, 7)]
+    assert m.trechos_codigo("sem código") == [] and m.trechos_codigo("`` só abre") == []
+
+
+@pytest.mark.parametrize("url, esperada", [
+    ("https://s/p?a=1&utm_source=x&fbclid=y&b=c+d#f", "https://s/p?a=1&b=c+d#f"),
+    ("https://s/p?UTM_Medium=x&q=a%20b&_ga=1", "https://s/p?q=a%20b"),  # o resto não é recodificado
+    ("https://s/p?utm_campaign=x#secao", "https://s/p#secao"),
+    ("https://s/p?mtm_kwd=x&pk_source=y&gclid=z", "https://s/p"),
+    ("https://s/p?ref=home&id=3", "https://s/p?ref=home&id=3"),
+    ("https://s/p#utm_source=x", "https://s/p#utm_source=x"),        # fragmento não é query
+    ("https://s/p", "https://s/p"),
+])
+def test_limpar_url_rastreamento(url, esperada):
+    assert m.limpar_url_rastreamento(url) == esperada
+
+
+def test_links_no_basico():
+    texto = ('Veja [doc](https://s/d?utm_source=n&id=1 "Título") e ![foto](data:image/png;base64,AAAA)\n'
+             "e [](https://s/) e [v](javascript:void(0))")
+    assert basico(texto) == ('Veja [doc](https://s/d?id=1 "Título") e foto\n'
+                             "e [](https://s/) e [v](javascript:void(0))\n")
+
+
+def test_links_no_compacto():
+    texto = ('[doc](https://s/d?fbclid=1 "Título") [](https://s/) [v](javascript:void(0)) [topo](#) '
+             '[nada]() ![](img.png) ![capa](capa.png "t")')
+    assert compacto(texto) == "[doc](https://s/d) v topo nada ![](img.png) ![capa](capa.png)\n"
+
+
+def test_tabela_compacta_colunas_e_linhas_vazias():
+    tabela = ("| Nome |  | Preço  |\n"
+              "|:-----|--|------:|\n"
+              "| Café   [moído](https://s/c?utm_source=x) |  | 10 |\n"
+              "|  |  |  |\n"
+              "| Chá | | 7 |\n")
+    assert compacto("Antes\n" + tabela + "Depois") == \
+        "Antes\n|Nome|Preço|\n|:--|--:|\n|Café [moído](https://s/c)|10|\n|Chá|7|\nDepois\n"
+    # no básico a tabela só tem as linhas limpas
+    assert basico(tabela).splitlines()[0] == "| Nome | | Preço |"
+
+
+def test_tabela_de_uma_coluna_vira_paragrafos():
+    # sem as linhas em branco o Markdown juntaria tudo num parágrafo só
+    assert compacto("Texto\n| Menu |\n|---|\n| Início |\n|  |\n| Contato |\nFim") == \
+        "Texto\n\nMenu\n\nInício\n\nContato\n\nFim\n"
+    assert compacto("| |\n|---|\n| |\n") == ""
+
+
+def test_pipes_que_nao_sao_tabela_so_sao_limpos():
+    assert compacto("|  a  |  b  |\n|  c  |  d  |\n") == "| a | b |\n| c | d |\n"
+    assert compacto("| a | b |\n|---|---|\n```\n| x |\n```") == "|a|b|\n|---|---|\n```\n| x |\n```\n"
+
+
+@pytest.mark.parametrize("nome, texto", [
+    ("muitas crases", " ".join("`" * i for i in range(1, 2000))),
+    ("parênteses abertos", "[a](" + "(b" * 50_000),
+    ("colchetes abertos", "[" * 100_000 + "](x)"),
+    ("linha longa com code span", " a  " * 100_000 + "`x`"),
+    ("muitas linhas", "[x](https://s/?utm_source=1)  `c`   d  \n| a | [b](c) |\n|---|---|\n" * 20_000),
+])
+def test_tempo_linear_em_entradas_grandes(nome, texto):
+    inicio = time.perf_counter()
+    compacto(texto)
+    assert time.perf_counter() - inicio < 5, nome
+
+
+def test_conversao_aplica_o_modo_e_conta_a_reducao(conversor, tmp_path):
+    doc = tmp_path / "doc.html"
+    doc.write_text('<p><a href="https://s/p?utm_source=x&amp;id=2">Link</a></p>'
+                   "<table><tr><th>A</th><th></th></tr><tr><td>1</td><td></td></tr></table>",
+                   encoding="utf-8")
+    conv = conversor(indexar=False, pos_processamento="compacto")
+    assert conv.processar_arquivos([doc]) == 1
+    md = (conv.output_dir / "doc.md").read_text(encoding="utf-8")
+    assert "[Link](https://s/p?id=2)" in md and "utm_source" not in md
+    assert "A\n\n1" in md  # a coluna vazia sumiu e a tabela de uma coluna virou texto
+    contadores = conv.registro.contadores
+    assert contadores["bytes_md_final"] < contadores["bytes_md_bruto"]
@@ -0,0 +1,137 @@
+import sqlite3
+
+import pytest
+
+from conftest import m, pagina, png
+
+IMAGENS = '<img src="a.png" alt="A"><img src="b.png" alt="B"><img src="c.png" alt="C">'
+LM = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+@pytest.fixture
+def recaptura(conversor, site):
+    """Site com 3 imagens (a: ETag, b: Last-Modified, c: sem validadores) e um conversor incremental."""
+    site.rota("/a.png", png(ruido=1), "image/png", ETag='"a1"')
+    site.rota("/b.png", png(ruido=2), "image/png", Last_Modified=LM)
+    site.rota("/c.png", png(ruido=3), "image/png")
+    site.rota("/p", pagina(IMAGENS, titulo="Versão 1"))
+    conv = conversor(modo_captura="estatico", incremental=True, indexar=False, triagem_imagens=False,
+                     use_openai=True, desc_mode="direct", caption_backend="servidor-local")
+    conv.legendadas = []
+
+    def legendar(nome, dados, mime):
+        conv.legendadas.append(dados)
+        return f"imagem {len(conv.legendadas)}"
+
+    conv._legendar_com = legendar
+    return conv, site
+
+
+def capturar(conv, site) -> str:
+    """Captura /p e devolve a situação ('nova' | 'alterada' | 'inalterada')."""
+    site.pedidos.clear()
+    contagem = conv.capturar_urls([site.url("/p")])
+    assert contagem["erro"] == 0, conv.mensagens
+    return next(s for s, n in contagem.items() if n)
+
+
+def pedidos_de_assets(site) -> set:
+    return {(caminho, condicional) for metodo, caminho, condicional in site.pedidos
+            if metodo == "GET" and caminho != "/p"}
+
+
+def md_de(conv):
+    return next(conv.output_dir.glob("*_p.md"))
+
+
+def test_hash_dom_ignora_o_volatil():
+    base = m.ConversorMarkdown._hash_dom('<p nonce="1">Texto</p><script>var t=1</script>')
+    assert m.ConversorMarkdown._hash_dom(
+        '<p nonce="2">Texto</p>\n\n<script>var t=2</script><!-- gerado às 10h --><style>p{}</style>') == base
+    assert m.ConversorMarkdown._hash_dom('<p nonce="1">Texto</p><script src="rastreio.js"></script>') == \
+        m.ConversorMarkdown._hash_dom('<p nonce="1">Texto</p>')
+    assert m.ConversorMarkdown._hash_dom('<p nonce="1">Outro texto</p>') != base
+
+
+def test_pagina_sem_mudanca_no_dom_e_pulada(recaptura):
+    conv, site = recaptura
+    assert capturar(conv, site) == "nova"
+    antes = md_de(conv).read_text(encoding="utf-8")
+
+    # só scripts e nonces mudaram: o DOM "de conteúdo" é o mesmo
+    site.rota("/p", pagina(IMAGENS + '<script nonce="x9">var agora = 2;</script>', titulo="Versão 1"))
+    assert capturar(conv, site) == "inalterada"
+    assert pedidos_de_assets(site) == set()
+    assert md_de(conv).read_text(encoding="utf-8") == antes
+    assert len(conv.legendadas) == 3
+
+
+def test_dom_alterado_revalida_assets_e_reaproveita_legendas(recaptura):
+    conv, site = recaptura
+    capturar(conv, site)
+    assert pedidos_de_assets(site) == {("/a.png", False), ("/b.png", False), ("/c.png", False)}
+
+    site.rota("/p", pagina(IMAGENS, titulo="Versão 2"))
+    assert capturar(conv, site) == "alterada"
+    # a (ETag) e b (Last-Modified) respondem 304; c, sem validadores, é baixada de novo
+    assert pedidos_de_assets(site) == {("/a.png", True), ("/b.png", True), ("/c.png", False)}
+    assert conv.registro.contadores["assets_reaproveitados"] == 2
+    # c não mudou de conteúdo: a legenda é achada pelo hash, sem chamar o backend
+    assert len(conv.legendadas) == 3
+    md = md_de(conv).read_text(encoding="utf-8")
+    assert "Versão 2" in md
+    assert all(f"`{nome}` — imagem" in md for nome in ("a.png", "b.png", "c.png"))
+
+    # b muda no servidor: baixada de novo, no mesmo arquivo, e só ela é legendada outra vez
+    site.rota("/b.png", png(ruido=9), "image/png", Last_Modified="Tue, 02 Jan 2024 00:00:00 GMT")
+    site.rota("/p", pagina(IMAGENS, titulo="Versão 3"))
+    assert capturar(conv, site) == "alterada"
+    assert ("/b.png", True) in pedidos_de_assets(site) and ("/b.png", False) in pedidos_de_assets(site)
+    assert len(conv.legendadas) == 4 and conv.legendadas[-1] == png(ruido=9)
+    assets = md_de(conv).with_name(md_de(conv).stem + "_assets")
+    assert sorted(p.name for p in assets.iterdir()) == ["a.png", "b.png", "c.png"]
+    assert (assets / "b.png").read_bytes() == png(ruido=9)
+
+    diario = m.DiarioJobs(conv.output_dir / m.JOURNAL_FILE_NAME)
+    try:
+        validadores = {u.rsplit("/", 1)[1]: (a["etag"], a["modificado"])
+                       for u, a in diario.captura(md_de(conv).stem)["assets"].items()}
+    finally:
+        diario.fechar()
+    assert validadores == {"a.png": ('"a1"', None),
+                           "b.png": (None, "Tue, 02 Jan 2024 00:00:00 GMT"),
+                           "c.png": (None, None)}
+
+
+def test_opcoes_diferentes_refazem_a_pagina(recaptura, conversor):
+    conv, site = recaptura
+    capturar(conv, site)
+    outro = conversor(modo_captura="estatico", incremental=True, indexar=False, triagem_imagens=False,
+                      pos_processamento="compacto")
+    assert capturar(outro, site) == "alterada"
+
+
+def test_md_apagado_forca_nova_captura(recaptura):
+    conv, site = recaptura
+    capturar(conv, site)
+    md_de(conv).unlink()
+    assert capturar(conv, site) == "alterada"
+    assert md_de(conv).exists()
+
+
+def test_diario_antigo_ganha_colunas_dos_validadores(tmp_path):
+    caminho = tmp_path / m.JOURNAL_FILE_NAME
+    with sqlite3.connect(caminho) as db:
+        db.execute("CREATE TABLE capturas_assets (slug TEXT, url TEXT, arquivo TEXT, sha256 TEXT,"
+                   " descricao TEXT, PRIMARY KEY (slug, url))")
+        db.execute("CREATE TABLE capturas (slug TEXT PRIMARY KEY, url TEXT, dom_hash TEXT, opcoes TEXT,"
+                   " capturado TEXT)")
+        db.execute("INSERT INTO capturas VALUES ('s', 'http://x/', 'h', '[]', '')")
+        db.execute("INSERT INTO capturas_assets VALUES ('s', 'http://x/a.png', 'a.png', 'abc', 'desc')")
+
+    diario = m.DiarioJobs(caminho)
+    try:
+        assert diario.captura("s")["assets"] == {"http://x/a.png": {
+            "arquivo": "a.png", "sha256": "abc", "descricao": "desc", "etag": None, "modificado": None}}
+    finally:
+        diario.fechar()
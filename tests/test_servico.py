@@ -0,0 +1,78 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+from conftest import m, pagina
+
+HTML = "<html><body><h1>Relatório</h1><p>Conteúdo do arquivo enviado.</p></body></html>"
+
+
+@pytest.fixture
+def servico(tmp_path):
+    """O servidor de `servir()`, em porta livre e numa thread; devolve (ServicoConversao, url base)."""
+    saida = tmp_path / "saida"
+    saida.mkdir()
+    config = m.ConfigConversao(output_dir=saida, metricas="nenhum", modo_captura="estatico")
+    srv = m.ServicoConversao(config, workers=1, fila=0, log=lambda msg: None)
+    handler = type("ServicoHandler", (m._ServicoHandler,), {"servico": srv})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield srv, f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+    srv.fechar()
+
+
+def test_converter_devolve_markdown(servico):
+    srv, url = servico
+    r = requests.post(f"{url}/converter?nome=relatorio.html", data=HTML.encode(), timeout=30)
+    assert r.status_code == 200
+    assert r.headers["Content-Type"] == "text/markdown; charset=utf-8"
+    assert r.headers["Transfer-Encoding"] == "chunked"
+    assert "# Relatório" in r.text and "Conteúdo do arquivo enviado." in r.text
+    estado = requests.get(f"{url}/saude", timeout=30).json()
+    assert estado["atendidos"] == 1 and estado["conversores_livres"] == 1
+
+
+@pytest.mark.parametrize("rota, status", [
+    ("/converter?nome=planilha.exe", 415),
+    ("/converter", 415),
+    ("/capturar?url=ftp://x/y", 400),
+    ("/outra", 404),
+])
+def test_pedidos_invalidos(servico, rota, status):
+    _, url = servico
+    r = requests.post(url + rota, data=b"x", timeout=30)
+    assert r.status_code == status
+    assert r.json()["erro"]
+
+
+def test_upload_acima_do_limite_recebe_413(servico, monkeypatch):
+    monkeypatch.setattr(m, "SERVICE_MAX_UPLOAD_BYTES", 10)
+    _, url = servico
+    r = requests.post(f"{url}/converter?nome=a.html", data=HTML.encode(), timeout=30)
+    assert r.status_code == 413
+
+
+def test_sem_vaga_responde_503_com_retry_after(servico):
+    srv, url = servico
+    with srv.vaga():  # workers=1, fila=0: a única vaga está ocupada
+        r = requests.post(f"{url}/converter?nome=a.html", data=HTML.encode(), timeout=30)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == str(m.SERVICE_RETRY_AFTER_S)
+    assert requests.get(f"{url}/saude", timeout=30).json()["rejeitados"] == 1
+
+
+def test_capturar_por_json_e_buscar_no_indice(servico, site):
+    _, url = servico
+    site.rota("/artigo", pagina("<h2>Girassóis</h2><p>Plantio de girassóis no outono.</p>", titulo="Jardim"))
+    r = requests.post(f"{url}/capturar", json={"url": site.url("/artigo")}, timeout=60)
+    assert r.status_code == 200 and "Plantio de girassóis" in r.text
+
+    assert requests.get(f"{url}/buscar", timeout=30).status_code == 400
+    hits = requests.get(f"{url}/buscar", params={"q": "girassois"}, timeout=30).json()["resultados"]
+    assert hits and hits[0]["origem"] == site.url("/artigo")
+    assert "**girassóis**" in hits[0]["trecho"].lower()
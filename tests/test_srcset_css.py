@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+
+import pytest
+from bs4 import BeautifulSoup
+
+from conftest import m, pagina, png
+
+BASE = "https://site.exemplo/artigos/pagina.html"
+
+
+def test_parse_srcset():
+    assert m.parse_srcset("a.jpg 480w, b.jpg 960w") == [("a.jpg", 480.0, "w"), ("b.jpg", 960.0, "w")]
+    assert m.parse_srcset("a.jpg, b.jpg 2x") == [("a.jpg", 1.0, "x"), ("b.jpg", 2.0, "x")]
+    # vírgula dentro da URL (CDNs de imagem) e descritor inválido descartado
+    assert m.parse_srcset("/img/f_auto,w_400/x.jpg 400w, c.jpg 1.5q, d.jpg 1.5x") == \
+        [("/img/f_auto,w_400/x.jpg", 400.0, "w"), ("d.jpg", 1.5, "x")]
+    assert m.parse_srcset("  ") == []
+
+
+@pytest.mark.parametrize("cands, alvo, esperado", [
+    ([("p.jpg", 320, "w"), ("m.jpg", 800, "w"), ("g.jpg", 1600, "w")], 700, "m.jpg"),
+    ([("p.jpg", 320, "w"), ("m.jpg", 800, "w")], 1024, "m.jpg"),       # nenhum atinge: o maior
+    ([("b.jpg", 2, "x"), ("a.jpg", 1, "x")], 1024, "a.jpg"),           # densidade: o 1x
+    ([("b.jpg", 2, "x"), ("c.jpg", 3, "x")], 1024, "b.jpg"),
+    ([], 1024, None),
+])
+def test_escolher_candidato(cands, alvo, esperado):
+    assert m.escolher_candidato(cands, alvo) == esperado
+
+
+def test_media_e_sizes():
+    assert m.media_casa("(min-width: 1024px)", 1366) and not m.media_casa("(max-width: 40em)", 1366)
+    assert not m.media_casa("print", 1366)  # o que não sabemos avaliar não casa
+    assert m.largura_de_sizes("(max-width: 600px) 100vw, 50vw", 1366) == 683
+    assert m.largura_de_sizes("(min-width: 1200px) 25rem, 100vw", 1366) == 400
+    assert m.largura_de_sizes("(min-width: 900px) calc(50vw - 2rem), 100vw", 1366) == 1366
+    assert m.largura_de_sizes("", 1366) is None
+
+
+def escolher(conversor, html, **opcoes):
+    conv = conversor(**opcoes)
+    return conv._escolher_img(BeautifulSoup(html, "html.parser").find("img"), BASE)
+
+
+def test_img_usa_o_menor_candidato_que_cobre_a_largura(conversor):
+    html = '<img src="p.jpg" srcset="p.jpg 320w, m.jpg 800w, g.jpg 1600w, xg.jpg 3200w">'
+    assert escolher(conversor, html) == "https://site.exemplo/artigos/g.jpg"
+    assert escolher(conversor, html, largura_imagem=600) == "https://site.exemplo/artigos/m.jpg"
+
+
+def test_sizes_limita_a_largura_alvo(conversor):
+    html = '<img src="p.jpg" sizes="(min-width: 1000px) 300px, 100vw" srcset="p.jpg 320w, g.jpg 1600w">'
+    assert escolher(conversor, html) == "https://site.exemplo/artigos/p.jpg"
+
+
+def test_img_sem_srcset_e_com_densidades(conversor):
+    assert escolher(conversor, '<img src="/a.png">') == "https://site.exemplo/a.png"
+    assert escolher(conversor, '<img src="a.png" srcset="a@2x.png 2x">') == "https://site.exemplo/artigos/a.png"
+
+
+def test_picture_usa_o_primeiro_source_cujo_media_casa(conversor):
+    html = ('<picture><source media="(max-width: 600px)" srcset="celular.webp 600w">'
+            '<source media="(min-width: 601px)" srcset="tela.webp 1200w, tela-4k.webp 3840w">'
+            '<img src="reserva.jpg"></picture>')
+    assert escolher(conversor, html) == "https://site.exemplo/artigos/tela.webp"
+
+
+def test_urls_css_resolve_relativas_e_pula_fontes_e_data():
+    css = ('@import url("base.css"); @import "tema.css";\n'
+           '.a{background:url(../img/fundo.png)} .b{background:url("data:image/png;base64,AA")}\n'
+           '.c{background-image:url( \'/img/fundo.png\' )} @font-face{src:url(f.woff2)}\n'
+           '.d{mask:url(#m)} .e{background:url(//cdn.exemplo/x.svg)}')
+    assert m.urls_css(css, "https://site.exemplo/static/css/app.css") == [
+        "https://site.exemplo/static/css/base.css",  # @import url(...) também é um url()
+        "https://site.exemplo/static/img/fundo.png",
+        "https://site.exemplo/img/fundo.png",
+        "https://cdn.exemplo/x.svg",
+        "https://site.exemplo/static/css/tema.css",
+    ]
+
+
+def test_reescrever_urls_css_troca_so_o_que_foi_baixado():
+    css = '@import "tema.css"; .a{background:url(a.png)} .b{background:url(b.png)} .c{x:url(data:,)}'
+    locais = {"https://s/css/a.png": "a.png", "https://s/css/tema.css": "tema.css"}
+    assert m.reescrever_urls_css(css, "https://s/css/app.css", locais.get) == \
+        '@import "tema.css"; .a{background:url("a.png")} .b{background:url(b.png)} .c{x:url(data:,)}'
+
+
+def test_imagens_de_fundo_de_atributos_e_blocos_style():
+    html = ('<div style="background-image: url(&quot;banner.jpg&quot;)"></div>'
+            "<section style='background:url(/fundo.png) no-repeat'></section>"
+            '<style>@import "extra.css"; .x{background:url(textura.png)}</style>')
+    assert m.imagens_de_fundo(html, BASE) == {
+        "https://site.exemplo/artigos/banner.jpg",
+        "https://site.exemplo/fundo.png",
+        "https://site.exemplo/artigos/textura.png",
+    }
+
+
+def test_captura_baixa_so_o_candidato_escolhido(conversor, site):
+    for nome, largura in (("p.png", 320), ("m.png", 800), ("g.png", 1600)):
+        site.rota(f"/{nome}", png(largura, 10), "image/png")
+    site.rota("/p", pagina('<img alt="Foto" src="p.png" srcset="p.png 320w, m.png 800w, g.png 1600w">'))
+    conv = conversor(modo_captura="estatico", indexar=False, largura_imagem=700)
+
+    assert conv.capturar_urls([site.url("/p")])["nova"] == 1
+    assert {c for metodo, c, _ in site.pedidos if metodo == "GET"} == {"/p", "/m.png"}
+    md = next(conv.output_dir.glob("*_p.md"))
+    assert f"![Foto]({md.stem}_assets/m.png)" in md.read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("texto, esperado", [("1280", 1280), ("abc", None), ("", None), ("0", None)])
+def test_largura_da_ui_invalida_volta_ao_padrao(texto, esperado):
+    # o Spinbox aceita qualquer texto; IntVar.get() levantaria TclError no _snapshot_config
+    tcl = m.tk.Tcl()  # interpretador sem janela: dispensa display
+    var = m.tk.IntVar(master=tcl)
+    var.set(texto)
+    avisos = []
+    app = SimpleNamespace(largura_imagem=var, _log=avisos.append)
+    assert m.MarkItDownApp._largura_imagem(app) == (esperado or m.IMG_TARGET_WIDTH)
+    assert var.get() == (esperado or m.IMG_TARGET_WIDTH)
+    assert bool(avisos) == (esperado is None)
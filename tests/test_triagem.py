@@ -0,0 +1,134 @@
+import io
+
+import pytest
+
+from conftest import m, pagina
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+
+def _bytes(img, formato="PNG") -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, formato)
+    return buf.getvalue()
+
+
+def lisa():
+    return Image.new("RGB", (300, 200), (30, 120, 200))
+
+
+def dois_tons():
+    img = Image.new("RGB", (300, 200), "white")
+    ImageDraw.Draw(img).rectangle((0, 0, 60, 60), fill="black")
+    return img
+
+
+def barra():
+    return Image.fromarray(np.random.default_rng(1).integers(0, 255, (40, 800, 3), dtype=np.uint8))
+
+
+def print_de_texto():
+    img = Image.new("RGB", (600, 400), "white")
+    desenho = ImageDraw.Draw(img)
+    for i in range(25):
+        desenho.text((10, 5 + 15 * i), "Lorem ipsum dolor sit amet, consectetur adipiscing elit sed do", fill="black")
+    return img
+
+
+def foto():
+    y, x = np.mgrid[0:200, 0:300]
+    base = np.stack([x * 255 / 300, y * 255 / 200, (x + y) % 97 * 2.6], axis=-1)
+    ruido = np.random.default_rng(2).integers(-20, 20, base.shape)
+    return Image.fromarray((base + ruido).clip(0, 255).astype(np.uint8))
+
+
+def transparente():
+    return Image.new("RGBA", (200, 200), (0, 0, 0, 0))
+
+
+CASOS = [
+    ("lisa.png", lisa, ("pular", "lisa")),
+    ("dois.png", dois_tons, ("pular", "pouca_informacao")),
+    ("barra.png", barra, ("pular", "proporcao")),
+    ("texto.png", print_de_texto, ("ocr", "texto")),
+    ("foto.jpg", foto, ("legendar", "conteudo")),
+    ("transparente.png", transparente, ("pular", "lisa")),  # composta sobre branco
+]
+
+
+@pytest.fixture
+def imagens(tmp_path):
+    caminhos = []
+    for nome, criar, _ in CASOS:
+        caminhos.append(tmp_path / nome)
+        criar().save(caminhos[-1])
+    svg = tmp_path / "vetor.svg"
+    svg.write_text("<svg xmlns='http://www.w3.org/2000/svg'/>", encoding="utf-8")
+    truncada = tmp_path / "truncada.png"
+    truncada.write_bytes((tmp_path / "foto.jpg").read_bytes()[:20])
+    return caminhos + [svg, truncada]
+
+
+def test_classifica_cada_tipo_de_imagem(imagens):
+    esperado = [decisao for _, _, decisao in CASOS] + [("legendar", "ilegivel")] * 2
+    assert m.triar_imagens(imagens) == esperado
+
+
+@pytest.mark.parametrize("lote", [1, 3, 32])
+def test_lote_nao_muda_as_decisoes(imagens, lote):
+    assert m.triar_imagens(imagens, lote=lote) == m.triar_imagens(imagens)
+
+
+def test_dimensoes_do_download_valem_para_a_proporcao(imagens):
+    foto_ = next(c for c in imagens if c.name == "foto.jpg")
+    assert m.triar_imagens([foto_], {str(foto_): (3000, 200)}) == [("pular", "proporcao")]
+
+
+def test_metricas_miniaturas_vetorizadas():
+    lote = np.stack([np.asarray(img.convert("RGB").resize((m.TRIAGE_THUMB_PX,) * 2))
+                     for img in (lisa(), print_de_texto(), foto())])
+    metricas = m.metricas_miniaturas(lote)
+    assert all(len(v) == 3 for v in metricas.values())
+    assert metricas["variacao"][0] == pytest.approx(0, abs=0.01) and metricas["entropia"][0] == pytest.approx(0)
+    assert metricas["texto"].tolist() == [False, True, False]
+    assert metricas["saturacao"][2] > m.TRIAGE_MAX_SAT_TEXTO > metricas["saturacao"][1]
+    assert metricas["bordas"][1] > m.TRIAGE_MIN_BORDAS_TEXTO
+
+
+def test_captura_so_legenda_o_que_passou_na_triagem(conversor, site):
+    for nome, criar, _ in CASOS[:5]:
+        site.rota(f"/{nome}", _bytes(criar(), "JPEG" if nome.endswith(".jpg") else "PNG"),
+                  "image/jpeg" if nome.endswith(".jpg") else "image/png")
+    site.rota("/p", pagina("".join(f'<img src="{nome}" alt="">' for nome, _, _ in CASOS[:5])))
+    conv = conversor(modo_captura="estatico", indexar=False, use_openai=True, desc_mode="direct",
+                     caption_backend="servidor-local", ocr_screenshots=True)
+    chamadas = []
+
+    def legendar(backend, dados, mime):
+        chamadas.append(backend)
+        return f"legenda via {backend}"
+
+    conv._legendar_com = legendar
+    assert conv.capturar_urls([site.url("/p")])["nova"] == 1
+    assert sorted(chamadas) == ["ocr", "servidor-local"]
+
+    c = conv.registro.contadores
+    assert c["legendas_evitadas_triagem"] == 3 and c["legendas_via_ocr"] == 1
+    assert any(msg.startswith("• Triagem de imagens: 3 pulada(s) (lisa=1, pouca_informacao=1, proporcao=1), "
+                              "1 só OCR, 1 para legenda") for msg in conv.mensagens)
+    md = next(conv.output_dir.glob("*_p.md")).read_text(encoding="utf-8")
+    assert "legenda via ocr" in md and "legenda via servidor-local" in md
+
+
+def test_sem_numpy_ou_pillow_legenda_tudo(conversor, site, monkeypatch):
+    monkeypatch.setattr(m, "triar_imagens", lambda *args, **kwargs: None)
+    site.rota("/lisa.png", _bytes(lisa()), "image/png")
+    site.rota("/p", pagina('<img src="lisa.png" alt="">'))
+    conv = conversor(modo_captura="estatico", indexar=False, use_openai=True, desc_mode="direct",
+                     caption_backend="servidor-local")
+    conv._legendar_com = lambda backend, dados, mime: "legenda"
+    assert conv.capturar_urls([site.url("/p")])["nova"] == 1
+    assert any("Triagem de imagens indisponível" in msg for msg in conv.mensagens)
+    assert "`lisa.png` — legenda" in next(conv.output_dir.glob("*_p.md")).read_text(encoding="utf-8")